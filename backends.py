@@ -0,0 +1,752 @@
+import datetime
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+
+import pymysql
+
+import db_connection
+from schema_catalog import METADATA_TABLE_PREFIX, get_connection_database
+
+# Database engines ChatDB can run on; "duckdb" and "csv" (CSV files queried in place) need the optional duckdb package
+BACKENDS = ["mysql", "sqlite", "duckdb", "csv"]
+DEFAULT_BACKEND = "mysql"
+
+# Directory holding the database files of the embedded engines
+DEFAULT_DATA_DIR = ".chatdb_data"
+
+# String literals and backtick-quoted identifiers, which SQL rewriting must leave alone or requote
+SQL_LITERAL_PATTERN = re.compile(r"('(?:[^'\\]|\\.|'')*'|`[^`]*`)", re.DOTALL)
+
+DESCRIBE_PATTERN = re.compile(r'^(?:DESCRIBE|DESC)\s+["`]?([^"`\s]+)["`]?$', re.IGNORECASE)
+SHOW_TABLES_PATTERN = re.compile(r"^SHOW\s+TABLES$", re.IGNORECASE)
+FOREIGN_KEY_CHECKS_PATTERN = re.compile(r"^SET\s+FOREIGN_KEY_CHECKS\s*=\s*([01])$", re.IGNORECASE)
+SET_PATTERN = re.compile(r"^SET\s", re.IGNORECASE)
+REPLACE_INTO_PATTERN = re.compile(r"^REPLACE\s+INTO\b", re.IGNORECASE)
+
+# A backslash escape in a MySQL string literal
+STRING_ESCAPE_PATTERN = re.compile(r"\\(.)", re.DOTALL)
+
+# What MySQL's backslash escapes stand for, spelled for a standard SQL literal; \% and \_ keep
+# their backslash for LIKE, and any other escaped character stands for itself
+MYSQL_STRING_ESCAPES = {
+    "0": "\0", "'": "''", '"': '"', "b": "\b", "n": "\n", "r": "\r", "t": "\t", "Z": "\x1a", "\\": "\\",
+    "%": "\\%", "_": "\\_",
+}
+
+# sqlite3's built-in date adapters are deprecated, so dates are bound as ISO text explicitly
+sqlite3.register_adapter(datetime.date, datetime.date.isoformat)
+sqlite3.register_adapter(datetime.datetime, lambda value: value.isoformat(" "))
+
+
+@lru_cache(maxsize=None)
+def duckdb_available():
+    """
+    Return True if the optional duckdb package is installed.
+    """
+    try:
+        import duckdb  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+# Function to quote an identifier for the embedded engines
+def quote_identifier(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+# Function to quote a string literal for the embedded engines
+def sql_string(value):
+    return "'" + value.replace("'", "''") + "'"
+
+
+# Function to rewrite MySQL-dialect SQL for an embedded engine
+def translate_sql(query, has_params=False, requote_identifiers=True):
+    """
+    Rewrite the parts of a MySQL query that SQLite and DuckDB spell differently: backslash escapes
+    in string literals become standard SQL, RAND() becomes RANDOM(), with has_params the %s
+    placeholders become ? (and %% becomes %), and with requote_identifiers backtick-quoted
+    identifiers become double-quoted.
+    Statement-level differences (DESCRIBE, SHOW TABLES, SET) are left to the backend.
+    """
+    parts = SQL_LITERAL_PATTERN.split(query)
+    for i, part in enumerate(parts):
+        if i % 2:
+            if part.startswith("`"):
+                if requote_identifiers:
+                    parts[i] = quote_identifier(part[1:-1])
+            else:
+                # One left-to-right pass, so an escaped backslash never pairs with the character after it
+                parts[i] = STRING_ESCAPE_PATTERN.sub(lambda match: MYSQL_STRING_ESCAPES.get(match.group(1), match.group(1)), part)
+            continue
+        part = re.sub(r"\bRAND\(\)", "RANDOM()", part, flags=re.IGNORECASE)
+        if has_params:
+            part = part.replace("%s", "?").replace("%%", "%")
+        parts[i] = part
+    return "".join(parts)
+
+
+class EmbeddedCursor:
+    """
+    DB-API cursor over an embedded engine that accepts the MySQL-dialect SQL the rest of ChatDB writes.
+    Statements the engine has no use for (MySQL session settings) are skipped, and engine errors are
+    raised as the pymysql exception classes the callers already handle.
+    """
+
+    def __init__(self, connection, cursor):
+        self.connection = connection
+        self.cursor = cursor
+        self.skipped = False
+
+    @property
+    def description(self):
+        return None if self.skipped else self.cursor.description
+
+    @property
+    def rowcount(self):
+        return -1 if self.skipped else self.cursor.rowcount
+
+    def execute(self, query, args=None):
+        backend = self.connection.backend
+        sql = backend.translate_statement(translate_sql(query, args is not None, backend.requote_identifiers))
+        self.skipped = sql is None
+        if self.skipped:
+            return 0
+        with self.connection.backend.mapped_errors():
+            self.cursor.execute(sql, tuple(args) if args is not None else ())
+        return self.rowcount
+
+    def executemany(self, query, args):
+        backend = self.connection.backend
+        sql = backend.translate_statement(translate_sql(query, True, backend.requote_identifiers))
+        self.skipped = sql is None
+        args = list(args)
+        if self.skipped or not args:
+            return 0
+        with self.connection.backend.mapped_errors():
+            self.cursor.executemany(sql, args)
+        return len(args)
+
+    def fetchone(self):
+        if self.skipped:
+            return None
+        with self.connection.backend.mapped_errors():
+            return self.cursor.fetchone()
+
+    def fetchmany(self, size=None):
+        if self.skipped:
+            return []
+        with self.connection.backend.mapped_errors():
+            return self.cursor.fetchmany(size or 1)
+
+    def fetchall(self):
+        if self.skipped:
+            return []
+        with self.connection.backend.mapped_errors():
+            return self.cursor.fetchall()
+
+    def close(self):
+        self.cursor.close()
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+
+class EmbeddedConnection:
+    """
+    Connection to an embedded database file, used wherever ChatDB expects a pymysql connection.
+    db names the database for the schema catalog and the statistics and result caches.
+    """
+
+    # Checked by code paths that differ from MySQL, e.g. stopping a streamed query
+    embedded = True
+
+    def __init__(self, backend, raw, db_name):
+        self.backend = backend
+        self.raw = raw
+        self.db_name = db_name
+        self.db = f"{backend.name}:{db_name}"
+
+    def cursor(self, cursorclass=None):
+        # pymysql cursor classes only choose buffering and row format; embedded cursors always
+        # stream tuples, which is what the streaming and tuple cursors provide
+        return EmbeddedCursor(self, self.backend.open_cursor(self.raw))
+
+    def commit(self):
+        with self.backend.mapped_errors():
+            self.raw.commit()
+
+    def rollback(self):
+        with self.backend.mapped_errors():
+            self.backend.rollback(self.raw)
+
+    def catalog_tables(self):
+        """
+        Return {table: [(column, type, key)]} for every table except ChatDB's metadata tables,
+        the same shape as the MySQL schema catalog.
+        """
+        with self.backend.mapped_errors():
+            rows = self.backend.open_cursor(self.raw).execute(
+                self.backend.CATALOG_QUERY, (METADATA_TABLE_PREFIX.replace("_", "\\_") + "%",)
+            ).fetchall()
+        tables = {}
+        for table_name, column_name, column_type, is_primary in rows:
+            tables.setdefault(table_name, []).append((column_name, column_type, "PRI" if is_primary else ""))
+        return tables
+
+    def close(self):
+        self.raw.close()
+
+
+class EmbeddedPool:
+    """
+    Pool of connections to one embedded database with the interface of db_connection.ConnectionPool.
+    """
+
+    def __init__(self, backend, db_name):
+        self.backend = backend
+        self.db_name = db_name
+        self.idle = queue.LifoQueue()
+
+    def acquire(self):
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            return EmbeddedConnection(self.backend, self.backend.open_connection(self.db_name), self.db_name)
+
+    def release(self, connection, broken=False):
+        try:
+            connection.rollback()
+        except pymysql.Error:
+            broken = True
+        if broken:
+            connection.close()
+        else:
+            self.idle.put(connection)
+
+    @contextmanager
+    def connection(self):
+        connection = self.acquire()
+        try:
+            yield connection
+        finally:
+            self.release(connection)
+
+    def close(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+class MySQLBackend:
+    """
+    The MySQL server backend: pooled pymysql connections and every ingestion mode.
+    """
+
+    name = "mysql"
+
+    def ingestion_modes(self):
+        from mysql_functions import INGESTION_MODES
+        return INGESTION_MODES
+
+    def ensure_database(self, db_name):
+        db_connection.ensure_database(db_name)
+
+    def get_pool(self, db_name=None, local_infile=False):
+        return db_connection.get_pool(db_name, local_infile)
+
+    def process_csv_folder(self, folder_path, connection, mode="insert", memory_budget_mb=None, add_indexes=True):
+        from mysql_functions import DEFAULT_MEMORY_BUDGET_MB, process_csv_folder
+        return process_csv_folder(folder_path, connection, mode, memory_budget_mb or DEFAULT_MEMORY_BUDGET_MB, add_indexes=add_indexes)
+
+    def close(self):
+        db_connection.close_pools()
+
+
+class EmbeddedBackend:
+    """
+    Base class of the in-process engines, which keep each database in one file under data_dir
+    and need no server. Subclasses open connections, rewrite statements and bulk-load tables.
+    """
+
+    name = None
+    file_extension = None
+    CATALOG_QUERY = None
+
+    # Whether backtick-quoted identifiers must be rewritten as double-quoted ones
+    requote_identifiers = True
+
+    # Engine exception classes and the pymysql classes they are raised as, most specific first
+    error_classes = []
+
+    def __init__(self, data_dir=None):
+        self.data_dir = data_dir or os.environ.get("CHATDB_DATA_DIR", DEFAULT_DATA_DIR)
+        self.pools = {}
+        self.pools_lock = threading.Lock()
+
+    def ingestion_modes(self):
+        return ["insert"]
+
+    def database_path(self, db_name):
+        return os.path.join(self.data_dir, f"{db_name}.{self.file_extension}")
+
+    def ensure_database(self, db_name):
+        os.makedirs(self.data_dir, exist_ok=True)
+
+    def get_pool(self, db_name=None, local_infile=False):
+        db_name = db_name or db_connection.DEFAULT_DB_NAME
+        with self.pools_lock:
+            if db_name not in self.pools:
+                self.pools[db_name] = EmbeddedPool(self, db_name)
+            return self.pools[db_name]
+
+    def close(self):
+        with self.pools_lock:
+            for pool in self.pools.values():
+                pool.close()
+            self.pools.clear()
+
+    @contextmanager
+    def mapped_errors(self):
+        try:
+            yield
+        except tuple(engine_error for engine_error, _ in self.error_classes) as e:
+            mapped = next(error for engine_error, error in self.error_classes if isinstance(e, engine_error))
+            raise mapped(str(e)) from e
+
+    def open_cursor(self, raw):
+        return raw.cursor()
+
+    def rollback(self, raw):
+        raw.rollback()
+
+    def translate_statement(self, sql):
+        """
+        Rewrite a whole statement for the engine, or return None to skip it.
+        """
+        return sql
+
+    def column_type(self, column_type):
+        """
+        Return the engine's spelling of an inferred MySQL column type.
+        """
+        return column_type
+
+    def load_dataframe(self, connection, table_name, df, date_formats):
+        """
+        Insert the rows of a DataFrame into an existing table. Returns the number of rows inserted.
+        """
+        from mysql_functions import insert_dataframe
+        return insert_dataframe(connection.cursor(), table_name, df, date_formats=date_formats)
+
+    def create_indexes(self, connection, table_column_types, foreign_keys, table_stats):
+        """
+        Index the columns mysql_functions.choose_index_columns picks. Returns {table: seconds spent}.
+        """
+        return {}
+
+    def process_csv_folder(self, folder_path, connection, mode="insert", memory_budget_mb=None, add_indexes=True):
+        """
+        Load every CSV file in a folder into the embedded database, with the column types, key
+        detection and column statistics of the MySQL loader. Tables are created with their primary
+        key; foreign keys are only recorded in the statistics-driven indexes, since neither engine
+        can add them to existing tables. With add_indexes, those indexes are created after the load.
+        Returns a per-table load report.
+        """
+        from csv_cache import load_parsed_csv
+        from column_stats import ColumnStatsCollector, invalidate_column_stats, store_column_stats
+        from mysql_functions import (
+            align_key_column_types, add_index_times, build_create_table_query, find_foreign_keys,
+            normalize_column_name, print_load_report, RssSampler,
+        )
+        from result_cache import invalidate_result_cache
+        from schema_catalog import get_connection_database, invalidate_schema_catalog
+        from translation_cache import invalidate_translation_cache
+
+        parsed_files = {}
+        for file_name in sorted(os.listdir(folder_path)):
+            if file_name.endswith(".csv"):
+                parsed_files[os.path.splitext(file_name)[0]] = load_parsed_csv(os.path.join(folder_path, file_name))
+        all_dataframes = {table: parsed["df"] for table, parsed in parsed_files.items()}
+        foreign_keys = find_foreign_keys(all_dataframes)
+        table_column_types = align_key_column_types(
+            {table: parsed["column_types"] for table, parsed in parsed_files.items()}, foreign_keys
+        )
+
+        db_name = get_connection_database(connection)
+        cursor = connection.cursor()
+        load_report = []
+        table_stats = {}
+        for table, parsed in parsed_files.items():
+            column_types, date_formats = table_column_types[table], parsed["date_formats"]
+            start = time.perf_counter()
+            with RssSampler() as rss:
+                try:
+                    engine_types = {col: self.column_type(col_type) for col, col_type in column_types.items()}
+                    cursor.execute(build_create_table_query(table, engine_types, foreign_keys))
+                    invalidate_result_cache(db_name, [table])
+                    rows = self.load_dataframe(connection, table, parsed["df"], date_formats)
+                    connection.commit()
+                    print(f"Data from `{table}.csv` inserted into `{table}`.")
+                except pymysql.Error as e:
+                    print(f"Error processing `{table}.csv`: {e}")
+                    rows = None
+            load_report.append({"table": table, "encoding": parsed["encoding"], "mode": self.name, "rows": rows,
+                                "seconds": time.perf_counter() - start, **rss.report()})
+            if rows is not None:
+                stats = ColumnStatsCollector(column_types, date_formats).update(parsed["df"])
+                table_stats[table] = stats.table_stats(normalize_column_name)
+
+        # New tables are visible only after the cached schema catalog is reloaded
+        invalidate_schema_catalog()
+        invalidate_column_stats()
+        invalidate_translation_cache()
+        store_column_stats(connection, table_stats)
+        if add_indexes:
+            add_index_times(load_report, self.create_indexes(connection, table_column_types, foreign_keys, table_stats))
+        print_load_report(load_report)
+        return load_report
+
+
+class SQLiteBackend(EmbeddedBackend):
+    """
+    SQLite through the standard library's sqlite3 module. Always available.
+    """
+
+    name = "sqlite"
+    file_extension = "sqlite"
+
+    # SQLite reads backticks natively and rejects unknown names, while an unknown double-quoted
+    # name would silently be read as a string literal
+    requote_identifiers = False
+    error_classes = [(sqlite3.IntegrityError, pymysql.err.IntegrityError), (sqlite3.Error, pymysql.err.ProgrammingError)]
+
+    # One query for every column of every table, like the MySQL information_schema catalog
+    CATALOG_QUERY = """
+        SELECT m.name, p.name, p.type, p.pk
+        FROM sqlite_master AS m JOIN pragma_table_info(m.name) AS p
+        WHERE m.type = 'table' AND m.name NOT LIKE 'sqlite\\_%' ESCAPE '\\' AND m.name NOT LIKE ? ESCAPE '\\'
+        ORDER BY m.name, p.cid
+    """
+
+    def open_connection(self, db_name):
+        # Pooled connections move between threads, but only one thread uses each at a time
+        return sqlite3.connect(self.database_path(db_name), check_same_thread=False)
+
+    def translate_statement(self, sql):
+        statement = sql.strip().rstrip(";").strip()
+        match = DESCRIBE_PATTERN.match(statement)
+        if match:
+            table = match.group(1).replace("'", "''")
+            return ("SELECT name AS Field, type AS Type, CASE WHEN \"notnull\" THEN 'NO' ELSE 'YES' END AS \"Null\", "
+                    "CASE WHEN pk THEN 'PRI' ELSE '' END AS \"Key\", dflt_value AS \"Default\", '' AS Extra "
+                    f"FROM pragma_table_info('{table}') ORDER BY cid")
+        if SHOW_TABLES_PATTERN.match(statement):
+            return "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite\\_%' ESCAPE '\\' ORDER BY name"
+        match = FOREIGN_KEY_CHECKS_PATTERN.match(statement)
+        if match:
+            return f"PRAGMA foreign_keys = {'ON' if match.group(1) == '1' else 'OFF'}"
+        if SET_PATTERN.match(statement):
+            return None
+        return sql
+
+    def create_indexes(self, connection, table_column_types, foreign_keys, table_stats):
+        from mysql_functions import choose_index_columns, index_name, normalize_column_name
+
+        cursor = connection.cursor()
+        timings = {}
+        for table, stats in table_stats.items():
+            column_types = {normalize_column_name(col): col_type for col, col_type in table_column_types[table].items()}
+            index_columns = choose_index_columns(table, column_types, foreign_keys, stats)
+            if not index_columns:
+                continue
+            start = time.perf_counter()
+            try:
+                for column in index_columns:
+                    cursor.execute(f"CREATE INDEX `{index_name('idx', table, column)}` ON `{table}` (`{column}`);")
+                connection.commit()
+                print(f"Indexed `{table}` on {', '.join(index_columns)}.")
+            except pymysql.Error as e:
+                print(f"Error indexing `{table}`: {e}")
+            timings[table] = time.perf_counter() - start
+        return timings
+
+
+class DuckDBBackend(EmbeddedBackend):
+    """
+    DuckDB, a columnar engine that runs the GROUP BY and aggregate queries ChatDB generates
+    much faster than a row store on one machine. Needs the optional duckdb package.
+    """
+
+    name = "duckdb"
+    file_extension = "duckdb"
+
+    CATALOG_QUERY = """
+        SELECT c.table_name, c.column_name, c.data_type, k.column_name IS NOT NULL
+        FROM information_schema.columns AS c
+        LEFT JOIN (
+            SELECT table_name, UNNEST(constraint_column_names) AS column_name
+            FROM duckdb_constraints() WHERE constraint_type = 'PRIMARY KEY'
+        ) AS k ON k.table_name = c.table_name AND k.column_name = c.column_name
+        WHERE c.table_schema = 'main' AND c.table_name NOT LIKE ? ESCAPE '\\'
+        ORDER BY c.table_name, c.ordinal_position
+    """
+
+    # MySQL types DuckDB does not know
+    TYPE_NAMES = {"MEDIUMINT": "INTEGER"}
+
+    def __init__(self, data_dir=None):
+        import duckdb
+        super().__init__(data_dir)
+        self.duckdb = duckdb
+        self.error_classes = [(duckdb.IntegrityError, pymysql.err.IntegrityError), (duckdb.Error, pymysql.err.ProgrammingError)]
+        self.databases = {}
+
+    def open_connection(self, db_name):
+        # One database instance per file; every pooled connection is a cursor on it
+        with self.pools_lock:
+            if db_name not in self.databases:
+                self.databases[db_name] = self.duckdb.connect(self.database_path(db_name))
+            return self.databases[db_name].cursor()
+
+    def rollback(self, raw):
+        # DuckDB autocommits outside explicit transactions and refuses to roll back without one
+        try:
+            raw.rollback()
+        except self.duckdb.TransactionException:
+            pass
+
+    def close(self):
+        super().close()
+        with self.pools_lock:
+            for database in self.databases.values():
+                database.close()
+            self.databases.clear()
+
+    def translate_statement(self, sql):
+        statement = sql.strip().rstrip(";").strip()
+        # DuckDB has no MySQL session settings, and does not enforce foreign keys of ChatDB's tables
+        if SET_PATTERN.match(statement):
+            return None
+        if REPLACE_INTO_PATTERN.match(statement):
+            return REPLACE_INTO_PATTERN.sub("INSERT OR REPLACE INTO", statement, count=1)
+        return sql
+
+    def column_type(self, column_type):
+        base = column_type.split("(")[0]
+        return self.TYPE_NAMES.get(base, column_type)
+
+    def column_expression(self, column, is_text, date_format=None, column_type=None, null_markers=None):
+        """
+        Return the SQL converting a source column to the value ChatDB stores: null_markers in text
+        (NULL_MARKERS by default) become NULL, text dates are parsed in their detected format, and
+        with column_type the result is cast to that (MySQL) type, NULL where a value does not convert.
+        """
+        from type_inference import DATE_FORMATS, NULL_MARKERS
+
+        expression = quote_identifier(column)
+        if is_text:
+            null_markers = ", ".join(sql_string(marker) for marker in dict.fromkeys(null_markers or NULL_MARKERS))
+            expression = f"CASE WHEN {expression} IN ({null_markers}) THEN NULL ELSE {expression} END"
+        if date_format:
+            expression = f"TRY_STRPTIME({expression}, '{date_format}')"
+            if "%y" in date_format:
+                # Two-digit years that would land in the future are moved back a century
+                expression = f"CASE WHEN {expression} > NOW() THEN {expression} - INTERVAL 100 YEAR ELSE {expression} END"
+            if date_format in DATE_FORMATS:
+                expression = f"CAST({expression} AS DATE)"
+        elif column_type:
+            expression = f"TRY_CAST({expression} AS {self.column_type(column_type)})"
+        return expression
+
+    def load_dataframe(self, connection, table_name, df, date_formats):
+        """
+        Insert a DataFrame with one INSERT ... SELECT over the registered frame, so DuckDB converts
+        the columns in bulk: NULL markers become NULL and text dates are parsed in their detected format.
+        """
+        from mysql_functions import normalize_column_name
+
+        expressions = [self.column_expression(column, df[column].dtype == object, date_formats.get(column)) for column in df.columns]
+        columns = ", ".join(quote_identifier(normalize_column_name(column)) for column in df.columns)
+        view_name = f"{METADATA_TABLE_PREFIX}load_{table_name}"
+        with self.mapped_errors():
+            connection.raw.register(view_name, df)
+            try:
+                connection.raw.execute(f"INSERT INTO {quote_identifier(table_name)} ({columns}) SELECT {', '.join(expressions)} FROM {quote_identifier(view_name)}")
+            finally:
+                connection.raw.unregister(view_name)
+        return len(df)
+
+
+class CSVBackend(DuckDBBackend):
+    """
+    Queries a folder of CSV files in place instead of uploading them. Each file becomes a view over
+    DuckDB's read_csv() that converts the text to the inferred column types, so nothing is loaded
+    until a query runs and the first question can be asked as soon as the types are known, which
+    for unchanged files only takes reading the parsed-data cache metadata. Every query scans the
+    files again; DuckDB parses only the columns a query reads and filters rows during the scan.
+    """
+
+    name = "csv"
+
+    def ingestion_modes(self):
+        return ["attach"]
+
+    def ensure_database(self, db_name):
+        pass
+
+    def open_connection(self, db_name):
+        # The views live in an in-memory database shared by every pooled connection
+        with self.pools_lock:
+            if db_name not in self.databases:
+                self.databases[db_name] = self.duckdb.connect(":memory:")
+            return self.databases[db_name].cursor()
+
+    def process_csv_folder(self, folder_path, connection, mode="attach", memory_budget_mb=None, add_indexes=True):
+        """
+        Create a view for every CSV file in a folder, replacing the views of a previously attached
+        folder. Views have no indexes, so add_indexes is ignored. Returns a per-table report of the time spent.
+        """
+        from tabulate import tabulate
+        from csv_cache import load_csv_schema, utf8_csv_path
+        from column_stats import invalidate_column_stats
+        from mysql_functions import CSV_NA_VALUES, normalize_column_name
+        from result_cache import invalidate_result_cache
+        from schema_catalog import get_connection_database, invalidate_schema_catalog
+        from translation_cache import invalidate_translation_cache
+        from type_inference import NULL_MARKERS
+
+        with self.mapped_errors():
+            existing_views = {row[0] for row in connection.raw.execute(
+                "SELECT table_name FROM information_schema.tables WHERE table_schema = 'main' AND table_type = 'VIEW'"
+            ).fetchall()}
+        report = []
+        for file_name in sorted(os.listdir(folder_path)):
+            if not file_name.endswith(".csv"):
+                continue
+            table = os.path.splitext(file_name)[0]
+            file_path = os.path.abspath(os.path.join(folder_path, file_name))
+            start = time.perf_counter()
+            schema = load_csv_schema(file_path)
+            column_types = schema["column_types"]
+            # The raw text holds every value pandas reads as missing when the file is uploaded
+            expressions = [
+                f"{self.column_expression(column, True, schema['date_formats'].get(column), column_type, CSV_NA_VALUES + NULL_MARKERS)} "
+                f"AS {quote_identifier(normalize_column_name(column))}"
+                for column, column_type in column_types.items()
+            ]
+            # DuckDB reads only UTF-8 strictly, so other files are read from a converted copy
+            scan_path = utf8_csv_path(file_path, schema["encoding"])
+            # The dialect and columns are known, so DuckDB does not sniff the file on every scan
+            # (which takes most of the time of a query over a small file)
+            columns = ", ".join(f"{sql_string(column)}: 'VARCHAR'" for column in column_types)
+            source = (f"read_csv({sql_string(scan_path)}, header = true, auto_detect = false, delim = ',', "
+                      f"quote = '\"', escape = '\"', columns = {{{columns}}})")
+            try:
+                with self.mapped_errors():
+                    connection.raw.execute(f"CREATE OR REPLACE VIEW {quote_identifier(table)} AS SELECT {', '.join(expressions)} FROM {source}")
+                existing_views.discard(table)
+            except pymysql.Error as e:
+                print(f"Error attaching `{file_path}`: {e}")
+                continue
+            report.append({"table": table, "encoding": schema["encoding"], "columns": len(expressions),
+                           "seconds": time.perf_counter() - start})
+        for table in existing_views:
+            connection.raw.execute(f"DROP VIEW {quote_identifier(table)}")
+
+        invalidate_schema_catalog()
+        invalidate_column_stats()
+        invalidate_translation_cache()
+        invalidate_result_cache(get_connection_database(connection))
+        print(tabulate([[entry["table"], entry["encoding"], entry["columns"], f"{entry['seconds']:.3f}"] for entry in report],
+                       headers=["Table", "Encoding", "Columns", "Seconds"], tablefmt="outline"))
+        print(f"Attached {len(report)} CSV files from `{folder_path}`; they are read when queried.")
+        return report
+
+
+class MemorySQLiteBackend(SQLiteBackend):
+    """
+    Stand-in for the csv backend when DuckDB is not installed: the CSV files are loaded into an
+    in-memory SQLite database, which still needs no server and no database files.
+    """
+
+    name = "csv"
+
+    def __init__(self, data_dir=None):
+        super().__init__(data_dir)
+        self.keepers = {}
+
+    def ingestion_modes(self):
+        return ["attach"]
+
+    def ensure_database(self, db_name):
+        pass
+
+    def open_connection(self, db_name):
+        uri = f"file:chatdb_{db_name}?mode=memory&cache=shared"
+        with self.pools_lock:
+            # An in-memory database lasts as long as one connection to it is open
+            if db_name not in self.keepers:
+                self.keepers[db_name] = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        return sqlite3.connect(uri, uri=True, check_same_thread=False)
+
+    def close(self):
+        super().close()
+        with self.pools_lock:
+            for keeper in self.keepers.values():
+                keeper.close()
+            self.keepers.clear()
+
+    def process_csv_folder(self, folder_path, connection, mode="attach", memory_budget_mb=None, add_indexes=True):
+        from mysql_functions import reset_database
+        reset_database(connection)
+        return super().process_csv_folder(folder_path, connection, mode, memory_budget_mb, add_indexes)
+
+
+# Backend classes by name, and the ones used when DuckDB is not installed
+BACKEND_CLASSES = {"mysql": MySQLBackend, "sqlite": SQLiteBackend, "duckdb": DuckDBBackend, "csv": CSVBackend}
+DUCKDB_FALLBACKS = {
+    "duckdb": (SQLiteBackend, "DuckDB is not installed (pip install duckdb); using SQLite instead."),
+    "csv": (MemorySQLiteBackend, "DuckDB is not installed (pip install duckdb); CSV files are loaded into an in-memory SQLite database instead."),
+}
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+# Function to get the database backend
+def get_backend(name=None):
+    """
+    Return the process-wide backend called name, or CHATDB_BACKEND, or DEFAULT_BACKEND.
+    The duckdb and csv backends fall back to SQLite when the duckdb package is not installed.
+    """
+    name = (name or os.environ.get("CHATDB_BACKEND", DEFAULT_BACKEND)).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend `{name}`; choose one of {', '.join(BACKENDS)}.")
+    with _backends_lock:
+        if name not in _backends:
+            backend_class = BACKEND_CLASSES[name]
+            if name in DUCKDB_FALLBACKS and not duckdb_available():
+                backend_class, message = DUCKDB_FALLBACKS[name]
+                print(message)
+            _backends[name] = backend_class()
+        return _backends[name]
+
+
+# Function to get a pool of connections to the database a connection uses
+def get_connection_pool(connection):
+    """
+    Return the pool of further connections to the database of connection, on the same backend,
+    so work on that database can be spread over threads.
+    """
+    if getattr(connection, "embedded", False):
+        return connection.backend.get_pool(connection.db_name)
+    return db_connection.get_pool(get_connection_database(connection))
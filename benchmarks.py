@@ -0,0 +1,915 @@
+"""
+Benchmarks for ChatDB.
+
+Usage:
+    python benchmarks.py loader [--dry-run] [folders...]
+    python benchmarks.py types [folders...]
+    python benchmarks.py encoding [--repeat N] [folders...]
+    python benchmarks.py ingest [--workers N ...] [folders...]
+    python benchmarks.py joins [--repeat N] [--backend NAME] [folders...]
+    python benchmarks.py direct [--backends NAME ...] [folders...]
+    python benchmarks.py engine [--backend NAME] [--rounds N] [folders...]
+    python benchmarks.py generation [--backend NAME] [--workers N ...] [--rounds N] [folders...]
+    python benchmarks.py schema [--repeat N] [folders...]
+    python benchmarks.py nlp [--repeat N] [folders...]
+    python benchmarks.py startup [--repeat N] [--budget-ms MS]
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import math
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from decimal import Decimal
+
+import pandas as pd
+import pymysql
+
+from mysql_functions import (
+    connect_to_mysql, create_database, reset_database, infer_column_types, process_csv_folder, INGESTION_MODES,
+    DEFAULT_UPLOAD_WORKERS,
+    normalize_column_name, insert_dataframe, dataframe_to_rows, find_foreign_keys,
+    estimate_row_bytes, iter_batches_by_bytes, align_key_column_types, stop_streaming_query
+)
+from query_generation import (
+    find_related_tables_with_common_columns, extract_columns_by_type, generate_sample_queries, generate_sample_queries_with_keyword,
+    DEFAULT_GENERATION_WORKERS, SAMPLE_KEYWORDS
+)
+from query_interpreter import get_database_schema, preprocess_query, NL_TO_SQL_OPERATOR, find_related_tables, translate_user_query
+from nlp_resources import get_lemmatizer, get_stop_words, lemmatize
+from nltk.tokenize import word_tokenize
+from schema_catalog import get_connection_database, get_schema_catalog, invalidate_schema_catalog
+from csv_cache import load_parsed_csv, read_csv_file
+from csv_encoding import detect_encoding
+from backends import get_backend
+from type_inference import TIME_PATTERN
+from dataframe_engine import execute_on_dataframes, store_dataframes
+from result_cache import invalidate_result_cache
+
+BENCH_DB_NAME = "chatdb_bench"
+DEFAULT_FOLDERS = [os.path.join("input", name) for name in ["db1", "db2", "db3", "db4"]]
+
+
+def read_folder(folder_path):
+    """
+    Read every CSV in a folder the same way process_csv_folder does.
+    """
+    all_dataframes = {}
+    for file_name in sorted(os.listdir(folder_path)):
+        if file_name.endswith(".csv"):
+            all_dataframes[os.path.splitext(file_name)[0]] = read_csv_file(os.path.join(folder_path, file_name))[0]
+    return all_dataframes
+
+
+def legacy_infer_column_types(df):
+    """
+    The INT/FLOAT/DATETIME/VARCHAR inference ChatDB used before ColumnTypeInferrer.
+    """
+    column_types = {}
+    for column in df.columns:
+        dtype = df[column].dtype
+        if pd.api.types.is_integer_dtype(dtype):
+            column_types[column] = "INT"
+        elif pd.api.types.is_float_dtype(dtype):
+            column_types[column] = "FLOAT"
+        elif pd.api.types.is_datetime64_any_dtype(dtype):
+            column_types[column] = "DATETIME"
+        else:
+            max_length = df[column].astype(str).map(len).max()
+            column_types[column] = f"VARCHAR({max_length if max_length > 0 else 255})"
+    return column_types
+
+
+def create_plain_table(cursor, table_name, df):
+    columns_def = ", ".join([
+        f"`{normalize_column_name(col)}` {dtype}" for col, dtype in legacy_infer_column_types(df).items()
+    ])
+    cursor.execute(f"DROP TABLE IF EXISTS `{table_name}`;")
+    cursor.execute(f"CREATE TABLE `{table_name}` ({columns_def});")
+
+
+# ---------------------------------------------------------------------------
+# Loader: previous iterrows()/literal INSERT path vs vectorized executemany()
+# ---------------------------------------------------------------------------
+
+def legacy_insert_statements(table_name, df, batch_size=1000):
+    """
+    Build the literal multi-row INSERT statements the iterrows() loader used to send.
+    """
+    column_types = legacy_infer_column_types(df)
+    columns_list = ", ".join([f"`{normalize_column_name(col)}`" for col in df.columns])
+    rows = []
+    for _, row in df.iterrows():
+        values = []
+        for col, value in zip(df.columns, row.values):
+            column_type = column_types[col]
+            if pd.isna(value) or value == "NULL":
+                values.append("NULL")
+            elif column_type in ["INT", "FLOAT"]:
+                values.append(str(value))
+            else:
+                escaped_value = str(value).replace("'", "''")
+                values.append(f"'{escaped_value}'")
+        rows.append(f"({', '.join(values)})")
+        if len(rows) >= batch_size:
+            yield f"INSERT INTO `{table_name}` ({columns_list}) VALUES {', '.join(rows)};"
+            rows = []
+    if rows:
+        yield f"INSERT INTO `{table_name}` ({columns_list}) VALUES {', '.join(rows)};"
+
+
+def vectorized_batches(df):
+    for start, end in iter_batches_by_bytes(estimate_row_bytes(df)):
+        yield dataframe_to_rows(df.iloc[start:end])
+
+
+def time_loader(label, total_rows, run):
+    start = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<12} {elapsed:8.3f}s  {total_rows / elapsed if elapsed else float('inf'):12,.0f} rows/s")
+    return elapsed
+
+
+def benchmark_loader(folders, dry_run=False):
+    """
+    Compare rows/sec of the legacy literal INSERT path and insert_dataframe().
+    With dry_run, only statement/row preparation is timed and no server is needed.
+    """
+    connection = None
+    if not dry_run:
+        create_database(BENCH_DB_NAME)
+        connection = connect_to_mysql(db_name=BENCH_DB_NAME)
+
+    for folder in folders:
+        all_dataframes = read_folder(folder)
+        total_rows = sum(len(df) for df in all_dataframes.values())
+        print(f"\n{folder}: {len(all_dataframes)} tables, {total_rows:,} rows")
+
+        if dry_run:
+            def run_legacy():
+                for table_name, df in all_dataframes.items():
+                    for _ in legacy_insert_statements(table_name, df):
+                        pass
+
+            def run_vectorized():
+                for df in all_dataframes.values():
+                    for _ in vectorized_batches(df):
+                        pass
+        else:
+            cursor = connection.cursor()
+
+            def run_legacy():
+                for table_name, df in all_dataframes.items():
+                    create_plain_table(cursor, table_name, df)
+                    for statement in legacy_insert_statements(table_name, df):
+                        cursor.execute(statement)
+                    connection.commit()
+
+            def run_vectorized():
+                for table_name, df in all_dataframes.items():
+                    create_plain_table(cursor, table_name, df)
+                    insert_dataframe(cursor, table_name, df)
+                    connection.commit()
+
+        legacy = time_loader("iterrows", total_rows, run_legacy)
+        vectorized = time_loader("executemany", total_rows, run_vectorized)
+        print(f"  speedup      {legacy / vectorized:8.1f}x")
+
+    if connection is not None:
+        reset_database(connection)
+        connection.close()
+
+
+# ---------------------------------------------------------------------------
+# Column type inference: inference time and stored row width
+# ---------------------------------------------------------------------------
+
+# Approximate stored bytes per value of each MySQL type (text assumes full-length ASCII)
+FIXED_TYPE_BYTES = {
+    "BOOLEAN": 1, "TINYINT": 1, "SMALLINT": 2, "MEDIUMINT": 3, "INT": 4, "BIGINT": 8,
+    "FLOAT": 4, "DOUBLE": 8, "DATE": 3, "TIME": 3, "DATETIME": 5,
+}
+
+
+def type_bytes(column_type):
+    if column_type in FIXED_TYPE_BYTES:
+        return FIXED_TYPE_BYTES[column_type]
+    if column_type.startswith("DECIMAL("):
+        precision = int(column_type[len("DECIMAL("):].split(",")[0])
+        return (precision + 1) // 2 + 1
+    if column_type.startswith("VARCHAR("):
+        return int(column_type[len("VARCHAR("):-1]) + 1
+    return 256  # TEXT: off-page, counted as a pointer plus a typical value
+
+
+def benchmark_types(folders):
+    """
+    Compare inference time and maximum row width of the legacy and current type inference.
+    """
+    for folder in folders:
+        print(f"\n{folder}")
+        print(f"  {'table':<24} {'legacy ms':>10} {'new ms':>8} {'legacy B/row':>13} {'new B/row':>10}")
+        for table_name, df in read_folder(folder).items():
+            start = time.perf_counter()
+            legacy_types = legacy_infer_column_types(df)
+            legacy_ms = (time.perf_counter() - start) * 1000
+            start = time.perf_counter()
+            new_types = infer_column_types(df)
+            new_ms = (time.perf_counter() - start) * 1000
+            legacy_width = sum(type_bytes(column_type) for column_type in legacy_types.values())
+            new_width = sum(type_bytes(column_type) for column_type in new_types.values())
+            print(f"  {table_name:<24} {legacy_ms:10.1f} {new_ms:8.1f} {legacy_width:13} {new_width:10}")
+
+
+# ---------------------------------------------------------------------------
+# Ingestion modes and concurrent uploads
+# ---------------------------------------------------------------------------
+
+def benchmark_ingest(folders, max_workers_options=(1, DEFAULT_UPLOAD_WORKERS)):
+    """
+    Load each folder with every ingestion mode, sequentially and with concurrent levels,
+    and compare wall-clock load time.
+    """
+    create_database(BENCH_DB_NAME)
+    connection = connect_to_mysql(db_name=BENCH_DB_NAME, local_infile=True)
+    for folder in folders:
+        totals = {}
+        for mode in INGESTION_MODES:
+            for max_workers in max_workers_options:
+                print(f"\n{folder} [{mode}, {max_workers} workers]")
+                reset_database(connection)
+                start = time.perf_counter()
+                load_report = process_csv_folder(folder, connection, mode, max_workers=max_workers)
+                wall_clock = time.perf_counter() - start
+                slowest = max(entry["seconds"] for entry in load_report)
+                totals[(mode, max_workers)] = (sum(entry["rows"] or 0 for entry in load_report), wall_clock, slowest)
+        for (mode, max_workers), (rows, wall_clock, slowest) in totals.items():
+            print(f"  {mode:<8} {max_workers:2} workers  {rows:10,} rows  {wall_clock:8.3f}s wall-clock  "
+                  f"{rows / wall_clock if wall_clock else 0:12,.0f} rows/s  (largest table {slowest:.3f}s)")
+    reset_database(connection)
+    connection.close()
+
+
+# ---------------------------------------------------------------------------
+# Encoding detection: parse as UTF-8 and retry vs sniff once and parse once
+# ---------------------------------------------------------------------------
+
+def legacy_read_csv(file_path):
+    """
+    The previous reader: parse as UTF-8 and parse again as ISO-8859-1 after a UnicodeDecodeError.
+    """
+    try:
+        return pd.read_csv(file_path, encoding="utf-8"), "utf-8"
+    except UnicodeDecodeError:
+        return pd.read_csv(file_path, encoding="ISO-8859-1"), "ISO-8859-1"
+
+
+def benchmark_encoding(folders, repeat=5):
+    """
+    Compare per-file read time of the parse-and-retry reader with encoding detection plus a single parse.
+    No MySQL server is needed.
+    """
+    for folder in folders:
+        print(f"\n{folder}")
+        for file_name in sorted(os.listdir(folder)):
+            if not file_name.endswith(".csv"):
+                continue
+            file_path = os.path.join(folder, file_name)
+            timings = {}
+            for label, read in [("retry", legacy_read_csv), ("sniff", read_csv_file)]:
+                samples = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    df, encoding = read(file_path)
+                    samples.append((time.perf_counter() - start) * 1000)
+                timings[label] = (sorted(samples)[len(samples) // 2], encoding)
+            start = time.perf_counter()
+            detect_encoding(file_path)
+            sniff_ms = (time.perf_counter() - start) * 1000
+            print(f"  {file_name:<28} {timings['retry'][1]:<11} -> {timings['sniff'][1]:<11} "
+                  f"retry {timings['retry'][0]:8.2f} ms  sniff+parse {timings['sniff'][0]:8.2f} ms  (sniff alone {sniff_ms:.2f} ms)")
+
+
+# ---------------------------------------------------------------------------
+# Joins: foreign key joins without and with the indexes added after loading
+# ---------------------------------------------------------------------------
+
+def join_queries(foreign_keys):
+    """
+    For each inferred foreign key, a full join and a join that looks up the rows of one referenced key,
+    the two shapes of the joins in generated queries.
+    """
+    queries = []
+    for table, references in sorted(foreign_keys.items()):
+        for column, referenced_table in references:
+            on = f"`{referenced_table}`.`{column}` = `{table}`.`{column}`"
+            queries.append(f"SELECT COUNT(*) FROM `{referenced_table}` JOIN `{table}` ON {on}")
+            queries.append(
+                f"SELECT `{table}`.* FROM `{referenced_table}` JOIN `{table}` ON {on} "
+                f"WHERE `{referenced_table}`.`{column}` = (SELECT MAX(`{column}`) FROM `{referenced_table}`)"
+            )
+    return queries
+
+
+def benchmark_joins(folders, repeat=5, backend_name="mysql"):
+    """
+    Load each folder without and with the foreign keys and secondary indexes of create_indexes,
+    and compare the median time of every foreign key join. backend_name "sqlite" runs without a
+    MySQL server; SQLite gets the same indexes but no foreign key constraints.
+    """
+    if backend_name != "mysql":
+        os.environ["CHATDB_DATA_DIR"] = tempfile.mkdtemp(prefix="chatdb_bench_")
+    backend = get_backend(backend_name)
+    backend.ensure_database(BENCH_DB_NAME)
+    for folder in folders:
+        schema = read_folder_schema(folder)
+        queries = join_queries(find_foreign_keys({table: pd.DataFrame(columns=columns) for table, columns in schema.items()}))
+        timings = {}
+        for add_indexes in (False, True):
+            with backend.get_pool(BENCH_DB_NAME).connection() as connection:
+                # The loader prints per-table progress and a summary
+                with contextlib.redirect_stdout(io.StringIO()):
+                    reset_database(connection)
+                    backend.process_csv_folder(folder, connection, add_indexes=add_indexes)
+                cursor = connection.cursor()
+                for query in queries:
+                    samples = []
+                    for _ in range(repeat):
+                        start = time.perf_counter()
+                        cursor.execute(query)
+                        cursor.fetchall()
+                        samples.append((time.perf_counter() - start) * 1000)
+                    timings[(query, add_indexes)] = sorted(samples)[len(samples) // 2]
+        print(f"\n{folder}: {len(queries)} join queries (median of {repeat} runs)")
+        for query in queries:
+            before, after = timings[(query, False)], timings[(query, True)]
+            print(f"  {before:9.2f} ms -> {after:9.2f} ms  ({before / after if after else 0:6.1f}x)  {query}")
+        total_before = sum(timings[(query, False)] for query in queries)
+        total_after = sum(timings[(query, True)] for query in queries)
+        print(f"  total {total_before:,.1f} ms -> {total_after:,.1f} ms")
+    with backend.get_pool(BENCH_DB_NAME).connection() as connection, contextlib.redirect_stdout(io.StringIO()):
+        reset_database(connection)
+    backend.close()
+
+
+# ---------------------------------------------------------------------------
+# Schema reads: SHOW TABLES / DESCRIBE per call vs the cached schema catalog
+# ---------------------------------------------------------------------------
+
+class CountingConnection:
+    """
+    Wrap a connection and count the statements sent through its cursors.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.round_trips = 0
+
+    def cursor(self, *args):
+        cursor = self.connection.cursor(*args)
+        execute = cursor.execute
+
+        def counted_execute(query, args=None):
+            self.round_trips += 1
+            return execute(query, args)
+
+        cursor.execute = counted_execute
+        return cursor
+
+    def __getattr__(self, name):
+        return getattr(self.connection, name)
+
+
+def legacy_schema_reads(connection):
+    """
+    The schema reads of one sample-query run plus one natural language question before the catalog:
+    DESCRIBE for every table pair in find_related_tables_with_common_columns, then SHOW TABLES and
+    DESCRIBE for every table in get_database_schema.
+    """
+    cursor = connection.cursor()
+    cursor.execute("SHOW TABLES;")
+    tables = [table[0] for table in cursor.fetchall()]
+    for table1 in tables:
+        cursor.execute(f"DESCRIBE `{table1}`;")
+        cursor.fetchall()
+        for table2 in tables:
+            if table1 != table2:
+                cursor.execute(f"DESCRIBE `{table2}`;")
+                cursor.fetchall()
+    cursor.execute("SHOW TABLES;")
+    for table in [table[0] for table in cursor.fetchall()]:
+        cursor.execute(f"DESCRIBE `{table}`;")
+        cursor.fetchall()
+
+
+def catalog_schema_reads(connection):
+    """
+    The same schema reads served from the schema catalog.
+    """
+    tables = get_schema_catalog(connection).table_names()
+    find_related_tables_with_common_columns(connection, tables)
+    for table in tables:
+        extract_columns_by_type(connection, table)
+    get_database_schema(connection)
+
+
+def benchmark_schema(folders, repeat=5):
+    """
+    Compare round trips and latency of schema reads with and without the cached catalog.
+    """
+    create_database(BENCH_DB_NAME)
+    connection = connect_to_mysql(db_name=BENCH_DB_NAME)
+    for folder in folders:
+        reset_database(connection)
+        process_csv_folder(folder, connection)
+        print(f"\n{folder}")
+
+        def measure(label, run, before_each=None):
+            timings, round_trips = [], 0
+            for _ in range(repeat):
+                if before_each:
+                    before_each()
+                counting = CountingConnection(connection)
+                start = time.perf_counter()
+                run(counting)
+                timings.append((time.perf_counter() - start) * 1000)
+                round_trips = counting.round_trips
+            print(f"  {label:<16} {round_trips:6} round trips  {sorted(timings)[len(timings) // 2]:9.2f} ms (median of {repeat})")
+
+        measure("SHOW/DESCRIBE", legacy_schema_reads)
+        measure("catalog (cold)", catalog_schema_reads, before_each=invalidate_schema_catalog)
+        measure("catalog (warm)", catalog_schema_reads)
+    reset_database(connection)
+    connection.close()
+
+
+# ---------------------------------------------------------------------------
+# Direct CSV queries: time to the first answer without and with an upload
+# ---------------------------------------------------------------------------
+
+def benchmark_direct(folders, backend_names=("csv", "duckdb", "sqlite")):
+    """
+    Time how long each backend takes to make a folder queryable (attaching the CSV files in place
+    for "csv", a full upload otherwise) and then to answer a first sample query.
+    The embedded databases are created in a temporary directory; no MySQL server is needed.
+    """
+    os.environ["CHATDB_DATA_DIR"] = tempfile.mkdtemp(prefix="chatdb_bench_")
+    for folder in folders:
+        print(f"\n{folder}")
+        for name in backend_names:
+            backend = get_backend(name)
+            backend.ensure_database(BENCH_DB_NAME)
+            start = time.perf_counter()
+            # The loaders print per-table progress and summaries
+            with contextlib.redirect_stdout(io.StringIO()), backend.get_pool(BENCH_DB_NAME).connection() as connection:
+                if "attach" not in backend.ingestion_modes():
+                    reset_database(connection)
+                backend.process_csv_folder(folder, connection)
+                ready = time.perf_counter()
+                random.seed(0)
+                _, query = generate_sample_queries(connection)[0]
+                cursor = connection.cursor()
+                cursor.execute(query)
+                cursor.fetchall()
+            answered = time.perf_counter()
+            print(f"  {name:<8} ready after {(ready - start) * 1000:9.1f} ms  first answer after {(answered - start) * 1000:9.1f} ms")
+
+
+# ---------------------------------------------------------------------------
+# In-process engine: generated queries on the in-memory tables vs the database
+# ---------------------------------------------------------------------------
+
+# A trailing LIMIT clause, removed to get the complete result of a query
+LIMIT_CLAUSE_PATTERN = re.compile(r"\s+LIMIT\s+\d+(\s*,\s*\d+|\s+OFFSET\s+\d+)?\s*;?\s*$", re.IGNORECASE)
+
+
+def comparable_value(value):
+    """
+    Normalize a result value, so that engines returning the same data in different Python types
+    (Decimal or float, date and time objects or text) compare equal. Numbers are compared to 4 decimals,
+    the precision of MySQL's AVG.
+    """
+    if value is None:
+        return value
+    if isinstance(value, str):
+        # SQLite keeps TIME values as the CSV text, e.g. "9:00:00"
+        if re.fullmatch(TIME_PATTERN, value):
+            value = pd.to_timedelta(value).to_pytimedelta()
+        else:
+            return value
+    if isinstance(value, (bool, int, float, Decimal)):
+        return round(float(value), 4)
+    if isinstance(value, datetime.datetime):
+        return value.isoformat(sep=" ")
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    if isinstance(value, datetime.time):
+        return value.isoformat()
+    if isinstance(value, datetime.timedelta):
+        seconds = int(value.total_seconds())
+        hours, seconds = divmod(abs(seconds), 3600)
+        return f"{'-' if value.total_seconds() < 0 else ''}{hours:02d}:{seconds // 60:02d}:{seconds % 60:02d}"
+    return str(value)
+
+
+def comparable_rows(rows):
+    return Counter(tuple(comparable_value(value) for value in row) for row in rows)
+
+
+# Most rows of a complete result read to confirm a LIMIT tie; joins without a LIMIT can be huge
+TIE_CHECK_ROWS = 200000
+
+
+def rows_in_result(connection, query, wanted, max_rows=TIE_CHECK_ROWS):
+    """
+    Return True if the result of query contains all of the wanted rows (a Counter of comparable rows),
+    False if it does not, or None if that is still open after max_rows rows. The result is streamed
+    and abandoned as soon as the answer is known.
+    """
+    missing = Counter(wanted)
+    cursor = connection.cursor(pymysql.cursors.SSCursor)
+    cursor.execute(query)
+    read = 0
+    while missing and read < max_rows:
+        batch = cursor.fetchmany(10000)
+        if not batch:
+            cursor.close()
+            return False
+        read += len(batch)
+        missing -= comparable_rows(batch)
+    stop_streaming_query(connection, cursor)
+    return None if missing else True
+
+
+def store_folder_dataframes(folder, connection):
+    """
+    Keep a folder's tables in memory for the engine, as process_csv_folder does after a MySQL load.
+    """
+    parsed_files = {
+        os.path.splitext(file_name)[0]: load_parsed_csv(os.path.join(folder, file_name))
+        for file_name in sorted(os.listdir(folder)) if file_name.endswith(".csv")
+    }
+    all_dataframes = {table: parsed["df"] for table, parsed in parsed_files.items()}
+    table_column_types = align_key_column_types(
+        {table: parsed["column_types"] for table, parsed in parsed_files.items()}, find_foreign_keys(all_dataframes)
+    )
+    store_dataframes(connection, all_dataframes, table_column_types, {table: parsed["date_formats"] for table, parsed in parsed_files.items()})
+
+
+def collect_engine_queries(connection, rounds):
+    """
+    Return the distinct queries of rounds of sample query generation (plain and for every keyword)
+    plus the translations of NLP_QUESTIONS that fit the schema.
+    """
+    queries = set()
+    for round_number in range(rounds):
+        random.seed(round_number)
+        queries.update(query for _, query in generate_sample_queries(connection))
+        for keyword in ["group by", "where", "order by", "join"]:
+            queries.update(query for _, query in generate_sample_queries_with_keyword(connection, keyword))
+    schema = get_database_schema(connection)
+    related_tables = find_related_tables(connection, schema)
+    for question in NLP_QUESTIONS:
+        sql_query = translate_user_query(question, schema, related_tables)
+        if "Error" not in sql_query:
+            queries.add(sql_query)
+    return sorted(queries)
+
+
+def benchmark_engine(folders, backend_name="mysql", rounds=10):
+    """
+    Correctness harness and timing for the in-process engine (dataframe_engine): run every generated
+    query on the in-memory tables and on the database and compare the results as multisets of rows.
+
+    A LIMIT may choose among rows with equal ORDER BY values, or among all rows without an ORDER BY,
+    where either answer is right; such results count as ties when they have the right size and are
+    part of the complete (unlimited) result.
+    Against SQLite or DuckDB, text comparisons and ordering are case-sensitive while the engine
+    follows MySQL, so mixed-case data can show differences that MySQL would not.
+    """
+    if backend_name != "mysql":
+        os.environ["CHATDB_DATA_DIR"] = tempfile.mkdtemp(prefix="chatdb_bench_")
+    backend = get_backend(backend_name)
+    backend.ensure_database(BENCH_DB_NAME)
+    for folder in folders:
+        with backend.get_pool(BENCH_DB_NAME).connection() as connection:
+            # The loaders and the query generator print progress and rejected queries
+            with contextlib.redirect_stdout(io.StringIO()):
+                reset_database(connection)
+                backend.process_csv_folder(folder, connection)
+                if backend_name != "mysql":
+                    store_folder_dataframes(folder, connection)
+                queries = collect_engine_queries(connection, rounds)
+            db_name = get_connection_database(connection)
+            cursor = connection.cursor()
+            outcomes = Counter()
+            engine_ms = database_ms = 0.0
+            for query in queries:
+                start = time.perf_counter()
+                answered = execute_on_dataframes(db_name, query)
+                elapsed_engine = (time.perf_counter() - start) * 1000
+                start = time.perf_counter()
+                try:
+                    cursor.execute(query)
+                    expected = cursor.fetchall()
+                except pymysql.Error as e:
+                    # The engine must leave queries the database rejects to the database
+                    outcomes["rejected" if answered is None else "mismatch"] += 1
+                    if answered is not None:
+                        print(f"  answered a query {backend_name} rejects ({e}): {query}")
+                    continue
+                elapsed_database = (time.perf_counter() - start) * 1000
+                if answered is None:
+                    outcomes["not covered"] += 1
+                    continue
+                engine_ms += elapsed_engine
+                database_ms += elapsed_database
+                engine_rows = comparable_rows(answered["rows"])
+                if engine_rows == comparable_rows(expected):
+                    outcomes["match"] += 1
+                    continue
+                complete_query = LIMIT_CLAUSE_PATTERN.sub("", query)
+                if complete_query != query and len(answered["rows"]) == len(expected):
+                    contained = rows_in_result(connection, complete_query, engine_rows)
+                    if contained is not False:
+                        outcomes["tie" if contained else "unverified"] += 1
+                        continue
+                outcomes["mismatch"] += 1
+                print(f"  mismatch: {query}")
+                print(f"    engine  : {answered['rows'][:5]}")
+                print(f"    {backend_name:<8}: {list(expected)[:5]}")
+        covered = outcomes["match"] + outcomes["tie"] + outcomes["mismatch"]
+        print(f"\n{folder} ({backend_name}): {len(queries)} queries, {covered} answered by the engine "
+              f"({outcomes['match']} identical, {outcomes['tie']} equal up to LIMIT ties, {outcomes['mismatch']} different, "
+              f"{outcomes['unverified']} ties too large to check), "
+              f"{outcomes['not covered']} left to the database, {outcomes['rejected']} rejected by it")
+        if covered:
+            print(f"  engine {engine_ms:,.1f} ms vs {backend_name} {database_ms:,.1f} ms for the covered queries "
+                  f"({database_ms / engine_ms if engine_ms else 0:.1f}x)")
+    backend.close()
+
+
+# ---------------------------------------------------------------------------
+# Sample query generation: latency of menu options 2 and 3 by worker count
+# ---------------------------------------------------------------------------
+
+def percentile(timings, share):
+    """
+    Return the value below which share of the timings fall (nearest rank).
+    """
+    ordered = sorted(timings)
+    return ordered[max(0, math.ceil(len(ordered) * share) - 1)]
+
+
+def benchmark_generation(folders, backend_name="mysql", max_workers_options=(1, DEFAULT_GENERATION_WORKERS), rounds=20):
+    """
+    Time menu option 2 (example queries) and option 3 (queries with each keyword) with every worker
+    count and report p50/p95 latency. The result cache is cleared before each run, so every probe
+    goes to the database as on a first request.
+    """
+    if backend_name != "mysql":
+        os.environ["CHATDB_DATA_DIR"] = tempfile.mkdtemp(prefix="chatdb_bench_")
+    backend = get_backend(backend_name)
+    backend.ensure_database(BENCH_DB_NAME)
+    options = [("option 2", None)] + [(f"option 3 ({keyword})", keyword) for keyword in SAMPLE_KEYWORDS]
+    for folder in folders:
+        with backend.get_pool(BENCH_DB_NAME).connection() as connection:
+            with contextlib.redirect_stdout(io.StringIO()):
+                reset_database(connection)
+                backend.process_csv_folder(folder, connection)
+            db_name = get_connection_database(connection)
+            print(f"\n{folder} ({backend_name}, {rounds} runs each)")
+            for label, keyword in options:
+                for max_workers in max_workers_options:
+                    timings, found = [], 0
+                    for round_number in range(rounds):
+                        random.seed(round_number)
+                        invalidate_result_cache(db_name)
+                        start = time.perf_counter()
+                        # Rejected candidate queries are printed
+                        with contextlib.redirect_stdout(io.StringIO()):
+                            if keyword is None:
+                                queries = generate_sample_queries(connection, max_workers=max_workers)
+                            else:
+                                queries = generate_sample_queries_with_keyword(connection, keyword, max_workers=max_workers)
+                        timings.append((time.perf_counter() - start) * 1000)
+                        found += len(queries)
+                    print(f"  {label:<22} workers={max_workers:<3} p50 {percentile(timings, 0.5):8.1f} ms  "
+                          f"p95 {percentile(timings, 0.95):8.1f} ms  {found / rounds:4.1f} queries")
+    backend.close()
+
+
+# ---------------------------------------------------------------------------
+# NL preprocessing: per-call loops and regex compiles vs the compiled pipeline
+# ---------------------------------------------------------------------------
+
+NLP_QUESTIONS = [
+    "Show the name and nationality of drivers where driver id is less than or equal 20",
+    "List races where year is greater than or equal to 2010 sorted by date",
+    "Find the average points of results grouped by constructor id",
+    "Show the top 5 circuits where country is equal to \"Italy\"",
+    "Count the number of pit stops where duration is at least 30",
+    "Get lap times where milliseconds is not equal to 90000 along with drivers",
+    "What is the maximum fastest lap speed in results where race id is more than 1000",
+    "List constructor standings where points is at most 10 limit 10 offset 5",
+]
+
+
+def legacy_preprocess_query(query, schema):
+    """
+    preprocess_query as it was before the compiled pipeline.
+    """
+    all_columns = [col for cols in schema.values() for col in cols]
+    for column in all_columns:
+        column_with_spaces = column.replace("_", " ")
+        if column_with_spaces in query:
+            query = query.replace(column_with_spaces, column)
+    for phrase in NL_TO_SQL_OPERATOR.keys():
+        query = re.sub(rf'\b{re.escape(phrase)}\b', phrase.replace(" ", "_"), query, flags=re.IGNORECASE)
+    quoted_strings = re.findall(r'"(.*?)"', query)
+    quoted_replacements = {}
+    for idx, quoted in enumerate(quoted_strings):
+        placeholder = f"_QUOTED_{idx}_"
+        quoted_replacements[placeholder] = quoted
+        query = query.replace(f'"{quoted}"', placeholder)
+    tokens = word_tokenize(query, language='english', preserve_line=True)
+    filtered_tokens = []
+    for token in tokens:
+        if token in quoted_replacements:
+            filtered_tokens.append(quoted_replacements[token])
+        else:
+            token_lower = get_lemmatizer().lemmatize(token.lower())
+            if token_lower not in get_stop_words() or token_lower in all_columns:
+                filtered_tokens.append(token_lower)
+    filtered_tokens = [
+        token.replace("_", " ") if "_QUOTED_" not in token and token not in all_columns else token
+        for token in filtered_tokens
+    ]
+    return query, filtered_tokens
+
+
+def read_folder_schema(folder_path):
+    """
+    Return {table: [columns]} as the tables of a folder are created in MySQL, reading only the CSV headers.
+    """
+    schema = {}
+    for file_name in sorted(os.listdir(folder_path)):
+        if file_name.endswith(".csv"):
+            header = pd.read_csv(os.path.join(folder_path, file_name), nrows=0, encoding="ISO-8859-1")
+            schema[os.path.splitext(file_name)[0]] = [normalize_column_name(col) for col in header.columns]
+    return schema
+
+
+def benchmark_nlp(folders, repeat=200):
+    """
+    Compare questions/sec of the legacy and the compiled preprocess_query. No MySQL server is needed.
+    """
+    for folder in folders:
+        schema = read_folder_schema(folder)
+        print(f"\n{folder}: {len(schema)} tables, {sum(len(cols) for cols in schema.values())} columns")
+        results = {}
+        for label, preprocess in [("legacy", legacy_preprocess_query), ("compiled", preprocess_query)]:
+            lemmatize.cache_clear()
+            start = time.perf_counter()
+            for _ in range(repeat):
+                outputs = [preprocess(question, schema) for question in NLP_QUESTIONS]
+            elapsed = time.perf_counter() - start
+            results[label] = outputs
+            print(f"  {label:<10} {repeat * len(NLP_QUESTIONS) / elapsed:10,.0f} questions/s")
+        changed = [
+            (question, legacy[1], compiled[1])
+            for question, legacy, compiled in zip(NLP_QUESTIONS, results["legacy"], results["compiled"])
+            if legacy[1] != compiled[1]
+        ]
+        for question, legacy_tokens, compiled_tokens in changed:
+            print(f"  tokens differ for {question!r}:\n    legacy   {legacy_tokens}\n    compiled {compiled_tokens}")
+
+
+# ---------------------------------------------------------------------------
+# Startup: import time of the CLI and its modules
+# ---------------------------------------------------------------------------
+
+STARTUP_MODULES = ["chatdb", "mysql_functions", "query_generation", "query_interpreter"]
+
+# Modules the CLI must not import before a menu option needs them
+DEFERRED_MODULES = ["pandas", "numpy", "tabulate", "nltk"]
+
+IMPORT_PROBE = """
+import sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(elapsed * 1000, ",".join(name for name in {deferred!r} if name in sys.modules))
+"""
+
+
+def benchmark_startup(repeat=5, budget_ms=None):
+    """
+    Time a fresh-interpreter import of each module and list the heavy modules it pulled in.
+    With budget_ms, exit with an error if importing chatdb is slower or imports a deferred module.
+    """
+    failed = False
+    for module in STARTUP_MODULES:
+        timings = []
+        for _ in range(repeat):
+            output = subprocess.run(
+                [sys.executable, "-c", IMPORT_PROBE.format(module=module, deferred=DEFERRED_MODULES)],
+                capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+            ).stdout.split()
+            timings.append(float(output[0]))
+        median = sorted(timings)[len(timings) // 2]
+        loaded = output[1] if len(output) > 1 else "-"
+        print(f"  import {module:<18} {median:8.1f} ms (median of {repeat})  heavy modules loaded: {loaded}")
+        if module == "chatdb" and budget_ms is not None and (median > budget_ms or loaded != "-"):
+            failed = True
+    if failed:
+        print(f"chatdb startup exceeds the {budget_ms} ms budget or imports a deferred module.")
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ChatDB benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    loader_parser = subparsers.add_parser("loader", help="CSV loader rows/sec")
+    loader_parser.add_argument("folders", nargs="*", default=DEFAULT_FOLDERS)
+    loader_parser.add_argument("--dry-run", action="store_true", help="time row preparation only, no MySQL server needed")
+
+    types_parser = subparsers.add_parser("types", help="column type inference time and row width")
+    types_parser.add_argument("folders", nargs="*", default=DEFAULT_FOLDERS)
+
+    encoding_parser = subparsers.add_parser("encoding", help="CSV read time with and without encoding detection")
+    encoding_parser.add_argument("folders", nargs="*", default=[os.path.join("input", "db1")])
+    encoding_parser.add_argument("--repeat", type=int, default=5)
+
+    ingest_parser = subparsers.add_parser("ingest", help="per-table load time of each ingestion mode")
+    ingest_parser.add_argument("folders", nargs="*", default=DEFAULT_FOLDERS)
+    ingest_parser.add_argument("--workers", type=int, nargs="+", default=[1, DEFAULT_UPLOAD_WORKERS], help="upload worker counts to compare")
+
+    joins_parser = subparsers.add_parser("joins", help="foreign key join time without and with indexes")
+    joins_parser.add_argument("folders", nargs="*", default=[os.path.join("input", "db3")])
+    joins_parser.add_argument("--repeat", type=int, default=5)
+    joins_parser.add_argument("--backend", default="mysql", help="database to time the joins on (mysql or sqlite)")
+
+    schema_parser = subparsers.add_parser("schema", help="schema read round trips and latency")
+    schema_parser.add_argument("folders", nargs="*", default=[os.path.join("input", "db3")])
+    schema_parser.add_argument("--repeat", type=int, default=5)
+
+    nlp_parser = subparsers.add_parser("nlp", help="NL preprocessing questions/sec")
+    nlp_parser.add_argument("folders", nargs="*", default=[os.path.join("input", "db3")])
+    nlp_parser.add_argument("--repeat", type=int, default=200)
+
+    direct_parser = subparsers.add_parser("direct", help="time to the first answer with CSV files queried in place vs uploaded")
+    direct_parser.add_argument("folders", nargs="*", default=[os.path.join("input", "db3")])
+    direct_parser.add_argument("--backends", nargs="+", default=["csv", "duckdb", "sqlite"])
+
+    engine_parser = subparsers.add_parser("engine", help="compare the in-process engine's answers and time with the database")
+    engine_parser.add_argument("folders", nargs="*", default=DEFAULT_FOLDERS)
+    engine_parser.add_argument("--backend", default="mysql", help="database to compare with (mysql, sqlite or duckdb)")
+    engine_parser.add_argument("--rounds", type=int, default=10, help="rounds of sample query generation")
+
+    generation_parser = subparsers.add_parser("generation", help="p50/p95 latency of sample query generation by worker count")
+    generation_parser.add_argument("folders", nargs="*", default=DEFAULT_FOLDERS)
+    generation_parser.add_argument("--backend", default="mysql", help="database to generate queries on (mysql, sqlite or duckdb)")
+    generation_parser.add_argument("--workers", type=int, nargs="+", default=[1, DEFAULT_GENERATION_WORKERS], help="worker counts to compare")
+    generation_parser.add_argument("--rounds", type=int, default=20, help="runs per menu option and worker count")
+
+    startup_parser = subparsers.add_parser("startup", help="import time of the CLI and its modules")
+    startup_parser.add_argument("--repeat", type=int, default=5)
+    startup_parser.add_argument("--budget-ms", type=float, default=None, help="fail if importing chatdb takes longer")
+
+    args = parser.parse_args()
+    if args.benchmark == "loader":
+        benchmark_loader(args.folders, dry_run=args.dry_run)
+    elif args.benchmark == "types":
+        benchmark_types(args.folders)
+    elif args.benchmark == "encoding":
+        benchmark_encoding(args.folders, args.repeat)
+    elif args.benchmark == "ingest":
+        benchmark_ingest(args.folders, args.workers)
+    elif args.benchmark == "joins":
+        benchmark_joins(args.folders, args.repeat, args.backend)
+    elif args.benchmark == "schema":
+        benchmark_schema(args.folders, args.repeat)
+    elif args.benchmark == "nlp":
+        benchmark_nlp(args.folders, args.repeat)
+    elif args.benchmark == "direct":
+        benchmark_direct(args.folders, args.backends)
+    elif args.benchmark == "engine":
+        benchmark_engine(args.folders, args.backend, args.rounds)
+    elif args.benchmark == "generation":
+        benchmark_generation(args.folders, args.backend, args.workers, args.rounds)
+    elif args.benchmark == "startup":
+        benchmark_startup(args.repeat, args.budget_ms)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,28 @@
-from mysql_functions import connect_to_mysql, create_database, reset_database, upload_csv_to_mysql, execute_query, process_csv_folder
-from query_generation import generate_sample_queries, generate_sample_queries_with_keyword
-from query_interpreter import interpret_user_query
+from db_connection import DEFAULT_DB_NAME
+from backends import BACKENDS, get_backend
+from translation_cache import save_translation_cache
+from result_cache import get_result_cache
+import argparse
+import contextlib
+import json
 import os
+import sys
+import time
 
+# The loader, query generation and interpreter modules pull in pandas, tabulate and NLTK,
+# so each menu option imports only what it needs when it is first chosen
 
-def main():
-    db_name = "dsci551"
-    create_database(db_name)
-    connection = connect_to_mysql(db_name=db_name)
+
+def main(backend_name=None, csv_folder=None):
+    db_name = DEFAULT_DB_NAME
+    backend = get_backend(backend_name)
+    backend.ensure_database(db_name)
+    print(f"Database `{db_name}` is ready ({backend.name}).")
+    # Connections are checked out per action, so time spent at the prompt never leaves a stale one behind
+    pool = backend.get_pool(db_name, local_infile=True)
+    if csv_folder:
+        with pool.connection() as connection:
+            backend.process_csv_folder(csv_folder, connection)
     
     while True:
         print("\nMenu:")
@@ -19,9 +34,26 @@ def main():
         
         choice = input("Enter your choice: ")
         if choice == "1":
+            from mysql_functions import reset_database, DEFAULT_MEMORY_BUDGET_MB
             directory = input("Enter the directory containing CSV files: ")
-            reset_database(connection)
-            process_csv_folder(directory, connection)
+            ingestion_modes = backend.ingestion_modes()
+            mode = input(f"Enter the ingestion mode ({', '.join(ingestion_modes)}) [{ingestion_modes[0]}]: ").strip().lower() or ingestion_modes[0]
+            if mode not in ingestion_modes:
+                print("Invalid ingestion mode. Try again.")
+                continue
+            memory_budget_mb = DEFAULT_MEMORY_BUDGET_MB
+            if mode == "stream":
+                try:
+                    memory_budget_mb = int(input(f"Enter the memory budget in MB [{DEFAULT_MEMORY_BUDGET_MB}]: ").strip() or DEFAULT_MEMORY_BUDGET_MB)
+                except ValueError:
+                    print("Invalid memory budget. Try again.")
+                    continue
+            with pool.connection() as connection:
+                # Incremental uploads update the tables of an earlier upload instead of starting over,
+                # and attached CSV files replace the previously attached ones themselves
+                if mode not in ("incremental", "attach"):
+                    reset_database(connection)
+                backend.process_csv_folder(directory, connection, mode, memory_budget_mb)
 
             # for file in os.listdir(directory):
             #     if file.endswith(".csv"):
@@ -30,7 +62,10 @@ def main():
             print("CSV files uploaded successfully.")
         
         elif choice == "2":
-            queries = generate_sample_queries(connection)
+            from query_generation import generate_sample_queries
+            from mysql_functions import execute_query
+            with pool.connection() as connection:
+                queries = generate_sample_queries(connection)
             for i, (description, query) in enumerate(queries, start=1):
                 print(f"{i}. Description: {description}")
                 print(f" Query: {query}\n")
@@ -47,7 +82,8 @@ def main():
                         query_number = int(input(f"Enter the query number to execute (1-{len(queries)}): "))
                         if 1 <= query_number <= len(queries):
                             _, query_to_execute = queries[query_number - 1]
-                            execute_query(connection, query_to_execute)
+                            with pool.connection() as connection:
+                                execute_query(connection, query_to_execute)
                         else:
                             print("Invalid query number. Try again.")
                     except ValueError:
@@ -62,8 +98,11 @@ def main():
                     print("Invalid choice. Try again.")
         
         elif choice == "3":
+            from query_generation import generate_sample_queries_with_keyword
+            from mysql_functions import execute_query
             keyword = input("Enter a keyword (group by, where, order by, join): ").strip().lower()
-            queries = generate_sample_queries_with_keyword(connection, keyword)
+            with pool.connection() as connection:
+                queries = generate_sample_queries_with_keyword(connection, keyword)
             for i, (description, query) in enumerate(queries, start=1):
                 print(f"{i}. Description: {description}")
                 print(f"   Query: {query}\n")
@@ -80,7 +119,8 @@ def main():
                         query_number = int(input(f"Enter the query number to execute (1-{len(queries)}): "))
                         if 1 <= query_number <= len(queries):
                             _, query_to_execute = queries[query_number - 1]
-                            execute_query(connection, query_to_execute)
+                            with pool.connection() as connection:
+                                execute_query(connection, query_to_execute)
                         else:
                             print("Invalid query number. Try again.")
                     except ValueError:
@@ -95,8 +135,11 @@ def main():
                     print("Invalid choice. Try again.")
         
         elif choice == "4":
+            from query_interpreter import interpret_user_query
+            from mysql_functions import execute_query
             user_query = input("Enter your natural language query: ").strip()
-            sql_query, success, results_or_error = interpret_user_query(user_query, connection)
+            with pool.connection() as connection:
+                sql_query, success, results_or_error = interpret_user_query(user_query, connection)
             
             if success:
                 print("\nGenerated SQL Query:")
@@ -108,7 +151,8 @@ def main():
                 while True:
                     sub_choice = input("Enter your choice: ")
                     if sub_choice == "1":
-                        execute_query(connection, sql_query)
+                        with pool.connection() as connection:
+                            execute_query(connection, sql_query)
                         break
                     elif sub_choice == "2":
                         break
@@ -120,10 +164,74 @@ def main():
         
         elif choice == "5":
             print("Exiting...")
+            backend.close()
+            save_translation_cache()
+            print(get_result_cache().report())
             break
         
         else:
             print("Invalid choice. Try again.")
 
+def read_questions(file_path):
+    """
+    Read questions from a text file (one per line) or a JSONL file with a "question" field per line.
+    """
+    questions = []
+    with open(file_path, encoding="utf-8") as question_file:
+        for line in question_file:
+            line = line.strip()
+            if not line:
+                continue
+            questions.append(json.loads(line)["question"] if file_path.endswith(".jsonl") else line)
+    return questions
+
+def run_batch(args):
+    """
+    Interpret every question in a file and write one JSON record per question.
+    """
+    from query_interpreter import interpret_batch
+
+    questions = read_questions(args.questions)
+    if args.csv:
+        backend = get_backend(args.backend)
+        # Standard output may carry the JSONL records
+        with contextlib.redirect_stdout(sys.stderr), backend.get_pool(args.db).connection() as connection:
+            backend.process_csv_folder(args.csv, connection)
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    start = time.perf_counter()
+    succeeded = 0
+    try:
+        for record in interpret_batch(questions, args.db, args.execute, args.workers, args.row_cap, args.backend):
+            succeeded += record["ok"]
+            output.write(json.dumps(record, default=str) + "\n")
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        get_backend(args.backend).close()
+        save_translation_cache()
+    elapsed = time.perf_counter() - start
+    print(f"{len(questions)} questions, {succeeded} succeeded, {elapsed:.2f}s "
+          f"({len(questions) / elapsed if elapsed else 0:,.0f} questions/s)", file=sys.stderr)
+    if args.execute:
+        print(get_result_cache().report(), file=sys.stderr)
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="ChatDB. Run without arguments for the interactive menu.")
+    parser.add_argument("--backend", choices=BACKENDS, help="database engine (default: CHATDB_BACKEND or mysql)")
+    parser.add_argument("--csv", metavar="FOLDER", help="query the CSV files in FOLDER in place (implies --backend csv)")
+    subparsers = parser.add_subparsers(dest="command")
+    batch_parser = subparsers.add_parser("batch", help="interpret questions from a file and write JSONL")
+    batch_parser.add_argument("questions", help="text file with one question per line, or JSONL with a \"question\" field")
+    batch_parser.add_argument("--output", "-o", help="JSONL output file (default: standard output)")
+    batch_parser.add_argument("--execute", action="store_true", help="also run each generated query")
+    batch_parser.add_argument("--workers", type=int, default=4)
+    batch_parser.add_argument("--row-cap", type=int, default=100, help="most result rows kept per executed query")
+    batch_parser.add_argument("--db", default=DEFAULT_DB_NAME)
+    args = parser.parse_args()
+    if args.csv:
+        args.backend = "csv"
+
+    if args.command == "batch":
+        run_batch(args)
+    else:
+        main(args.backend, args.csv)
\ No newline at end of file
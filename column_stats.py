@@ -0,0 +1,216 @@
+import json
+import threading
+
+import numpy as np
+import pandas as pd
+import pymysql
+
+from schema_catalog import METADATA_TABLE_PREFIX, get_connection_database
+from type_inference import NULL_MARKERS, parse_text_dates
+
+# Metadata table holding one row of statistics per uploaded column
+STATS_TABLE = f"{METADATA_TABLE_PREFIX}column_stats"
+
+# Most frequent values kept per column (at least 4 are needed to judge GROUP BY distributions)
+TOP_K = 10
+
+# Distinct values counted exactly per column; beyond this only the most frequent are kept
+MAX_TRACKED_VALUES = 100000
+
+# MySQL types whose statistics are kept as numbers
+NUMERIC_TYPES = ("BOOLEAN", "TINYINT", "SMALLINT", "MEDIUMINT", "INT", "BIGINT", "DECIMAL", "DOUBLE", "FLOAT")
+
+
+def to_python(value):
+    """
+    Convert NumPy scalars into plain Python values so they can be stored as JSON.
+    """
+    return value.item() if isinstance(value, np.generic) else value
+
+
+class ColumnStatsCollector:
+    """
+    Collect per-column statistics of a table from DataFrame chunks: row count, null count,
+    min/max of numeric and date columns, distinct count and the most frequent values.
+
+    Values are counted the way MySQL stores them (numbers as numbers, text dates as ISO dates),
+    so the statistics answer the same questions as MIN/MAX or GROUP BY queries on the table.
+    """
+
+    def __init__(self, column_types, date_formats=None):
+        self.column_types = column_types
+        self.date_formats = date_formats or {}
+        self.row_count = 0
+        self.columns = {}
+
+    def update(self, df):
+        self.row_count += len(df)
+        for column in df.columns:
+            state = self.columns.setdefault(column, {"null_count": 0, "min": None, "max": None, "counts": None})
+            values = self._stored_values(df[column], column)
+            state["null_count"] += len(df) - len(values)
+            if values.empty:
+                continue
+            if not pd.api.types.is_object_dtype(values.dtype) or self._is_date(column):
+                low, high = to_python(values.min()), to_python(values.max())
+                state["min"] = low if state["min"] is None else min(state["min"], low)
+                state["max"] = high if state["max"] is None else max(state["max"], high)
+            counts = values.value_counts()
+            state["counts"] = counts if state["counts"] is None else state["counts"].add(counts, fill_value=0)
+            if len(state["counts"]) > MAX_TRACKED_VALUES:
+                state["counts"] = state["counts"].nlargest(MAX_TRACKED_VALUES)
+        return self
+
+    def table_stats(self, column_name=lambda column: column):
+        """
+        Return {"row_count": n, "columns": {name: stats}}, naming columns with column_name.
+        """
+        columns = {}
+        for column, state in self.columns.items():
+            counts = state["counts"] if state["counts"] is not None else pd.Series(dtype=np.int64)
+            # Ties are broken by value so the result does not depend on how the table was chunked
+            top_values = counts.sort_index().sort_values(ascending=False, kind="stable").head(TOP_K)
+            columns[column_name(column)] = {
+                "null_count": state["null_count"],
+                "distinct_count": len(counts),
+                "min": state["min"],
+                "max": state["max"],
+                "top_values": [[to_python(value), int(count)] for value, count in top_values.items()],
+            }
+        return {"row_count": self.row_count, "columns": columns}
+
+    def _is_date(self, column):
+        return self.column_types.get(column, "") in ("DATE", "DATETIME")
+
+    def _stored_values(self, series, column):
+        null_mask = series.isna()
+        if not pd.api.types.is_numeric_dtype(series.dtype):
+            null_mask |= series.isin(NULL_MARKERS)
+        values = series[~null_mask]
+
+        column_type = self.column_types.get(column, "")
+        if column_type == "BOOLEAN":
+            return values.astype(bool).astype(np.int64)
+        if column_type.startswith(NUMERIC_TYPES):
+            return pd.to_numeric(values, errors="coerce").dropna()
+        if column in self.date_formats:
+            values = parse_text_dates(values, self.date_formats[column]).dropna()
+        elif self._is_date(column):
+            values = pd.to_datetime(values, errors="coerce").dropna()
+        if pd.api.types.is_datetime64_any_dtype(values.dtype):
+            date_format = "%Y-%m-%d" if column_type == "DATE" else "%Y-%m-%d %H:%M:%S"
+            return values.dt.strftime(date_format)
+        return values.astype(str)
+
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+# Function to persist column statistics
+def store_column_stats(connection, table_stats):
+    """
+    Save {table: table_stats} in the statistics table and the in-process cache.
+    """
+    cursor = connection.cursor()
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS `{STATS_TABLE}` (
+            table_name VARCHAR(64) NOT NULL,
+            column_name VARCHAR(64) NOT NULL,
+            row_count BIGINT NOT NULL,
+            null_count BIGINT NOT NULL,
+            distinct_count BIGINT NOT NULL,
+            min_value TEXT,
+            max_value TEXT,
+            top_values TEXT,
+            PRIMARY KEY (table_name, column_name)
+        );
+    """)
+    # Replace all rows of the given tables, so columns that no longer exist do not linger
+    for table in table_stats:
+        cursor.execute(f"DELETE FROM `{STATS_TABLE}` WHERE table_name = %s;", (table,))
+    rows = [
+        (table, column, stats["row_count"], column_stats["null_count"], column_stats["distinct_count"],
+         json.dumps(column_stats["min"]), json.dumps(column_stats["max"]), json.dumps(column_stats["top_values"]))
+        for table, stats in table_stats.items()
+        for column, column_stats in stats["columns"].items()
+    ]
+    cursor.executemany(f"REPLACE INTO `{STATS_TABLE}` VALUES (%s, %s, %s, %s, %s, %s, %s, %s)", rows)
+    connection.commit()
+
+    db_name = get_connection_database(connection)
+    with _stats_lock:
+        _stats[db_name] = {**_stats.get(db_name, {}), **table_stats}
+
+
+# Function to delete the statistics of dropped tables
+def delete_column_stats(connection, tables):
+    """
+    Remove the statistics of the given tables from the statistics table and the in-process cache.
+    """
+    cursor = connection.cursor()
+    try:
+        for table in tables:
+            cursor.execute(f"DELETE FROM `{STATS_TABLE}` WHERE table_name = %s;", (table,))
+        connection.commit()
+    except pymysql.err.ProgrammingError:
+        # No statistics were stored for this database
+        pass
+    invalidate_column_stats(get_connection_database(connection))
+
+
+# Function to load column statistics
+def get_column_stats(connection):
+    """
+    Return {table: {"row_count": n, "columns": {column: stats}}} for the connection's database,
+    read from the statistics table once and then served from memory.
+    Tables uploaded without statistics are missing from the result.
+    """
+    db_name = get_connection_database(connection)
+    with _stats_lock:
+        if db_name in _stats:
+            return _stats[db_name]
+
+    table_stats = {}
+    cursor = connection.cursor(pymysql.cursors.Cursor)
+    try:
+        cursor.execute(f"SELECT * FROM `{STATS_TABLE}`;")
+        rows = cursor.fetchall()
+    except pymysql.err.ProgrammingError:
+        # No statistics were stored for this database
+        rows = []
+    for table, column, row_count, null_count, distinct_count, min_value, max_value, top_values in rows:
+        stats = table_stats.setdefault(table, {"row_count": row_count, "columns": {}})
+        stats["columns"][column] = {
+            "null_count": null_count,
+            "distinct_count": distinct_count,
+            "min": json.loads(min_value),
+            "max": json.loads(max_value),
+            "top_values": json.loads(top_values),
+        }
+    with _stats_lock:
+        _stats[db_name] = table_stats
+    return table_stats
+
+
+# Function to look up the statistics of one column
+def get_stats_for_column(connection, table_name, column_name):
+    """
+    Return the statistics of a column together with its table's row count, or None if unknown.
+    """
+    stats = get_column_stats(connection).get(table_name)
+    if stats is None or column_name not in stats["columns"]:
+        return None
+    return {"row_count": stats["row_count"], **stats["columns"][column_name]}
+
+
+# Function to drop cached column statistics
+def invalidate_column_stats(db_name=None):
+    """
+    Forget the cached statistics of db_name (or of every database) after tables change.
+    """
+    with _stats_lock:
+        if db_name is None:
+            _stats.clear()
+        else:
+            _stats.pop(db_name, None)
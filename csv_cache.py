@@ -0,0 +1,204 @@
+import atexit
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from functools import lru_cache
+
+import pandas as pd
+
+from csv_encoding import detect_encoding
+from type_inference import ColumnTypeInferrer
+
+# Directory, next to the CSV files, holding the parsed-data cache
+CACHE_DIR_NAME = ".chatdb_cache"
+
+# Bumped whenever the cached data or its metadata changes meaning, e.g. a new type inference
+CACHE_FORMAT_VERSION = 2
+
+
+@lru_cache(maxsize=None)
+def columnar_cache_available():
+    """
+    Return True if pyarrow, which reads and writes Feather files, is installed.
+    The cache is optional: without pyarrow every load parses the CSV files.
+    """
+    try:
+        import pyarrow.feather  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+# Function to check whether files may be written to CACHE_DIR_NAME next to the CSV files
+def cache_dir_allowed():
+    return os.environ.get("CHATDB_CSV_CACHE", "1") != "0"
+
+
+# Function to check whether the parsed-data cache is used
+def csv_cache_enabled():
+    return columnar_cache_available() and cache_dir_allowed()
+
+
+@lru_cache(maxsize=None)
+def private_copy_dir():
+    """
+    Return a temporary directory for converted copies when the cache directory is turned off.
+    It is removed when the process exits.
+    """
+    copy_dir = tempfile.mkdtemp(prefix="chatdb_utf8_")
+    atexit.register(shutil.rmtree, copy_dir, ignore_errors=True)
+    return copy_dir
+
+
+# Function to read a CSV file
+def read_csv_file(file_path):
+    """
+    Read a CSV file in its detected encoding (UTF-8, or ISO-8859-1 if it is not valid UTF-8),
+    parsing it only once. Returns (DataFrame, encoding).
+    """
+    encoding = detect_encoding(file_path)
+    return pd.read_csv(file_path, encoding=encoding), encoding
+
+
+def cache_paths(file_path):
+    """
+    Return the Feather data file and JSON metadata file caching a CSV file.
+    """
+    cache_dir = os.path.join(os.path.dirname(os.path.abspath(file_path)), CACHE_DIR_NAME)
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    return os.path.join(cache_dir, f"{stem}.feather"), os.path.join(cache_dir, f"{stem}.json")
+
+
+def read_cached_meta(file_path, stat):
+    """
+    Return the cached metadata of a CSV file, or None if there is none for its current size and modification time.
+    """
+    _, meta_path = cache_paths(file_path)
+    try:
+        with open(meta_path, encoding="utf-8") as meta_file:
+            meta = json.load(meta_file)
+    except (OSError, ValueError):
+        return None
+    if (meta.get("version") != CACHE_FORMAT_VERSION or meta.get("source_size") != stat.st_size
+            or meta.get("source_mtime_ns") != stat.st_mtime_ns):
+        return None
+    return meta
+
+
+def read_cached_csv(file_path, stat):
+    """
+    Return the cached parse of a CSV file, or None if there is none for its current size and modification time.
+    """
+    meta = read_cached_meta(file_path, stat)
+    if meta is None:
+        return None
+    data_path, _ = cache_paths(file_path)
+    import pyarrow.feather
+    try:
+        # Uncompressed Feather files are memory-mapped rather than read
+        df = pyarrow.feather.read_table(data_path, memory_map=True).to_pandas()
+    except (OSError, ValueError):
+        return None
+    return {"df": df, "encoding": meta["encoding"], "column_types": meta["column_types"], "date_formats": meta["date_formats"]}
+
+
+def write_cached_csv(file_path, stat, parsed):
+    """
+    Cache the parse of a CSV file. Files that Arrow cannot store (e.g. columns mixing numbers and text)
+    or that cannot be written are simply not cached.
+    """
+    import pyarrow
+    import pyarrow.feather
+    data_path, meta_path = cache_paths(file_path)
+    meta = {
+        "version": CACHE_FORMAT_VERSION, "source_size": stat.st_size, "source_mtime_ns": stat.st_mtime_ns,
+        "encoding": parsed["encoding"], "column_types": parsed["column_types"], "date_formats": parsed["date_formats"],
+    }
+    try:
+        os.makedirs(os.path.dirname(data_path), exist_ok=True)
+        pyarrow.feather.write_feather(parsed["df"], f"{data_path}.tmp", compression="uncompressed")
+        os.replace(f"{data_path}.tmp", data_path)
+        with open(f"{meta_path}.tmp", "w", encoding="utf-8") as meta_file:
+            json.dump(meta, meta_file)
+        os.replace(f"{meta_path}.tmp", meta_path)
+    except (OSError, pyarrow.ArrowException) as e:
+        print(f"Could not cache the parsed data of `{file_path}`: {e}")
+
+
+# Function to load a CSV file with its inferred column types
+def load_parsed_csv(file_path):
+    """
+    Return {"df", "encoding", "column_types", "date_formats"} for a CSV file.
+
+    When pyarrow is installed, the DataFrame, the inferred types and the detected encoding are kept
+    in a Feather file under CACHE_DIR_NAME next to the CSV, and reused as long as the CSV's size and
+    modification time are unchanged, so repeated loads skip CSV parsing and type inference.
+    Set CHATDB_CSV_CACHE=0 to always parse the CSV.
+    """
+    stat = os.stat(file_path)
+    if csv_cache_enabled():
+        cached = read_cached_csv(file_path, stat)
+        if cached is not None:
+            return cached
+    df, encoding = read_csv_file(file_path)
+    inferrer = ColumnTypeInferrer().update(df)
+    parsed = {"df": df, "encoding": encoding, "column_types": inferrer.column_types(), "date_formats": inferrer.date_formats()}
+    if csv_cache_enabled():
+        write_cached_csv(file_path, stat, parsed)
+    return parsed
+
+
+# Function to get the column types of a CSV file without loading its data
+def load_csv_schema(file_path):
+    """
+    Return {"encoding", "column_types", "date_formats"} for a CSV file. An unchanged file is
+    answered from the cache metadata alone; otherwise the file is parsed (and cached) once.
+    """
+    if csv_cache_enabled():
+        meta = read_cached_meta(file_path, os.stat(file_path))
+        if meta is not None:
+            return {"encoding": meta["encoding"], "column_types": meta["column_types"], "date_formats": meta["date_formats"]}
+    parsed = load_parsed_csv(file_path)
+    return {"encoding": parsed["encoding"], "column_types": parsed["column_types"], "date_formats": parsed["date_formats"]}
+
+
+# Function to get a UTF-8 version of a CSV file
+def utf8_csv_path(file_path, encoding):
+    """
+    Return the path of the CSV file's contents in UTF-8: the file itself if it already is UTF-8,
+    otherwise a converted copy under CACHE_DIR_NAME (or, with CHATDB_CSV_CACHE=0, in a temporary
+    directory of this process), rewritten whenever the file's size or modification time changes.
+    """
+    if encoding in ("utf-8", "utf-8-sig"):
+        return file_path
+    stat = os.stat(file_path)
+    if cache_dir_allowed():
+        data_path, _ = cache_paths(file_path)
+        copy_stem = os.path.splitext(data_path)[0]
+    else:
+        # Files of different folders may share a name
+        path_digest = hashlib.sha256(os.path.abspath(file_path).encode("utf-8")).hexdigest()[:16]
+        copy_stem = os.path.join(private_copy_dir(), f"{os.path.splitext(os.path.basename(file_path))[0]}-{path_digest}")
+    copy_path, meta_path = f"{copy_stem}.utf-8.csv", f"{copy_stem}.utf-8.json"
+    source = {"source_size": stat.st_size, "source_mtime_ns": stat.st_mtime_ns}
+    try:
+        with open(meta_path, encoding="utf-8") as meta_file:
+            if json.load(meta_file) == source and os.path.exists(copy_path):
+                return copy_path
+    except (OSError, ValueError):
+        pass
+    os.makedirs(os.path.dirname(copy_path), exist_ok=True)
+    with open(file_path, "r", encoding=encoding, newline="") as source_file, \
+            open(f"{copy_path}.tmp", "w", encoding="utf-8", newline="") as target:
+        while True:
+            chunk = source_file.read(1024 * 1024)
+            if not chunk:
+                break
+            target.write(chunk)
+    os.replace(f"{copy_path}.tmp", copy_path)
+    with open(f"{meta_path}.tmp", "w", encoding="utf-8") as meta_file:
+        json.dump(source, meta_file)
+    os.replace(f"{meta_path}.tmp", meta_path)
+    return copy_path
@@ -0,0 +1,37 @@
+import codecs
+import mmap
+import os
+
+# Encoding used when a file is not valid UTF-8; every byte sequence is valid ISO-8859-1
+FALLBACK_ENCODING = "ISO-8859-1"
+
+# Bytes validated per step
+SNIFF_CHUNK_BYTES = 1024 * 1024
+
+
+# Function to detect the encoding of a CSV file
+def detect_encoding(file_path):
+    """
+    Return "utf-8-sig" for UTF-8 files starting with a byte order mark, "utf-8" for other valid
+    UTF-8 files and FALLBACK_ENCODING otherwise.
+
+    The file is memory-mapped and validated in one pass with an incremental decoder, so a bad
+    byte near the end costs one scan of the raw bytes rather than a full CSV parse.
+    Runs of pure ASCII, the bulk of most CSV files, are skipped without decoding.
+    """
+    if os.path.getsize(file_path) == 0:
+        return "utf-8"
+    with open(file_path, "rb") as csv_file, mmap.mmap(csv_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        encoding = "utf-8-sig" if data[:3] == codecs.BOM_UTF8 else "utf-8"
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        try:
+            for start in range(0, len(data), SNIFF_CHUNK_BYTES):
+                chunk = data[start:start + SNIFF_CHUNK_BYTES]
+                # A multi-byte character split across chunks leaves the decoder mid-sequence
+                if chunk.isascii() and not decoder.getstate()[0]:
+                    continue
+                decoder.decode(chunk)
+            decoder.decode(b"", final=True)
+        except UnicodeDecodeError:
+            return FALLBACK_ENCODING
+    return encoding
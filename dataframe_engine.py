@@ -0,0 +1,845 @@
+import os
+import re
+import threading
+from decimal import ROUND_HALF_UP, Decimal
+
+import numpy as np
+import pandas as pd
+
+from type_inference import NULL_MARKERS, TIME_PATTERN, parse_text_dates
+
+# MySQL types answered as numbers; BOOLEAN is a TINYINT(1) in MySQL
+INTEGER_TYPE_NAMES = ("BOOLEAN", "TINYINT", "SMALLINT", "MEDIUMINT", "INT", "BIGINT")
+FLOAT_TYPE_NAMES = ("DOUBLE", "FLOAT")
+
+# Kinds stored as NumPy datetime64/timedelta64 values, compared through their int64 view
+TEMPORAL_KINDS = ("date", "datetime", "time")
+
+# Aggregates the generated queries use
+AGGREGATES = ("COUNT", "SUM", "AVG", "MIN", "MAX")
+
+# Extra decimal places of AVG results (MySQL's div_precision_increment)
+AVG_EXTRA_SCALE = 4
+
+# Words the supported query shape is built from; any other SQL keyword makes the query unsupported
+KEYWORDS = {"SELECT", "FROM", "JOIN", "INNER", "ON", "WHERE", "AND", "GROUP", "BY", "ORDER", "ASC", "DESC", "LIMIT", "OFFSET", "AS"}
+UNSUPPORTED_WORDS = {
+    "DISTINCT", "OR", "NOT", "IN", "IS", "NULL", "LIKE", "BETWEEN", "HAVING", "LEFT", "RIGHT", "OUTER", "CROSS",
+    "UNION", "CASE", "WHEN", "EXISTS", "USING", "NATURAL", "WITH", "INTO", "FOR", "STRAIGHT_JOIN", "REGEXP",
+}
+
+# Backtick identifiers, string literals (without backslash escapes), numbers, words and operators
+TOKEN_PATTERN = re.compile(
+    r"\s*(?:(?P<ident>`[^`]+`)|(?P<string>'(?:[^'\\]|'')*')|(?P<number>\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)"
+    r"|(?P<word>[A-Za-z_]\w*)|(?P<op><>|!=|>=|<=|[=<>(),.*;-]))"
+)
+
+COMPARISON_OPERATORS = {"=", "!=", "<>", ">", "<", ">=", "<="}
+
+# Text the engine compares like MySQL's utf8mb4_0900_ai_ci collation. Printable ASCII compares equal
+# exactly when it is equal lower-cased; letters, digits and spaces also sort in lower-cased code point
+# order. Accented letters, other characters and the order of ASCII punctuation are left to the database.
+EQUAL_TEXT_PATTERN = r"[\x20-\x7e]*"
+ORDERED_TEXT_PATTERN = r"[A-Za-z0-9 ]*"
+
+# Date literals compared with DATE and DATETIME columns; MySQL reads other forms differently
+DATE_LITERAL_PATTERN = re.compile(r"\d{4}-\d{2}-\d{2}( \d{2}:\d{2}:\d{2})?")
+
+
+def dataframe_engine_enabled():
+    """
+    Return False if CHATDB_DATAFRAME_ENGINE=0, which sends every query to the database.
+    """
+    return os.environ.get("CHATDB_DATAFRAME_ENGINE", "1") != "0"
+
+
+# ---------------------------------------------------------------------------
+# Parsing: the shape produced by generate_sql_query and construct_dynamic_query
+# ---------------------------------------------------------------------------
+
+def tokenize(query):
+    """
+    Split a query into (kind, value, start, end) tokens, or return None if it contains
+    anything the engine does not read (e.g. backslash escapes or functions of several arguments).
+    """
+    tokens, position, query = [], 0, query.rstrip()
+    while position < len(query):
+        match = TOKEN_PATTERN.match(query, position)
+        if match is None or match.end() == position:
+            return None
+        kind = match.lastgroup
+        value, start = match.group(kind), match.start(kind)
+        if kind == "ident":
+            value = value[1:-1]
+        elif kind == "string":
+            value = value[1:-1].replace("''", "'")
+        elif kind == "word" and value.upper() in KEYWORDS | UNSUPPORTED_WORDS:
+            kind, value = "keyword", value.upper()
+        tokens.append((kind, value, start, match.end()))
+        position = match.end()
+    return tokens
+
+
+class QueryShapeParser:
+    """
+    Parse one SELECT of the supported shape into a plan:
+    {"select", "from", "join", "where", "group_by", "order_by", "limit", "offset"}.
+
+    Column references are (table or None, column) pairs. parse() returns None for anything
+    outside the shape, so the caller can send the query to the database instead.
+    """
+
+    def __init__(self, query, tokens):
+        self.query = query
+        self.tokens = tokens
+        self.position = 0
+
+    def parse(self):
+        if not self.accept("keyword", "SELECT"):
+            return None
+        plan = {"select": self.select_list(), "join": None, "where": [], "group_by": None, "order_by": None,
+                "limit": None, "offset": 0}
+        if plan["select"] is None or not self.accept("keyword", "FROM"):
+            return None
+        plan["from"] = self.name()
+        if plan["from"] is None:
+            return None
+        self.accept("keyword", "INNER")
+        if self.accept("keyword", "JOIN"):
+            table, left, right = self.name(), None, None
+            if table is not None and self.accept("keyword", "ON"):
+                left = self.reference()
+                right = self.reference() if self.accept("op", "=") else None
+            if right is None:
+                return None
+            plan["join"] = {"table": table, "left": left, "right": right}
+        if self.accept("keyword", "WHERE"):
+            while True:
+                condition = self.condition()
+                if condition is None:
+                    return None
+                plan["where"].append(condition)
+                if not self.accept("keyword", "AND"):
+                    break
+        if self.accept("keyword", "GROUP"):
+            plan["group_by"] = self.reference() if self.accept("keyword", "BY") else None
+            if plan["group_by"] is None:
+                return None
+        if self.accept("keyword", "ORDER"):
+            expression = self.select_expression() if self.accept("keyword", "BY") else None
+            if expression is None or expression.get("alias"):
+                return None
+            descending = self.accept("keyword", "DESC") is not None
+            if not descending:
+                self.accept("keyword", "ASC")
+            plan["order_by"] = {"expression": expression, "descending": descending}
+        if self.accept("keyword", "LIMIT"):
+            plan["limit"] = self.integer()
+            if plan["limit"] is None:
+                return None
+            if self.accept("op", ","):
+                plan["offset"], plan["limit"] = plan["limit"], self.integer()
+            elif self.accept("keyword", "OFFSET"):
+                plan["offset"] = self.integer()
+            if plan["limit"] is None or plan["offset"] is None:
+                return None
+        self.accept("op", ";")
+        return plan if self.position == len(self.tokens) else None
+
+    def peek(self, offset=0):
+        index = self.position + offset
+        return self.tokens[index] if index < len(self.tokens) else (None, None, len(self.query), len(self.query))
+
+    def accept(self, kind, value=None):
+        token = self.peek()
+        if token[0] == kind and (value is None or token[1] == value):
+            self.position += 1
+            return token
+        return None
+
+    def name(self):
+        token = self.accept("ident") or self.accept("word")
+        return token[1] if token else None
+
+    def integer(self):
+        token = self.accept("number")
+        return int(token[1]) if token and token[1].isdigit() else None
+
+    def reference(self):
+        first = self.name()
+        if first is None:
+            return None
+        if self.accept("op", "."):
+            column = self.name()
+            return (first, column.lower()) if column is not None else None
+        return (None, first.lower())
+
+    def select_list(self):
+        if self.accept("op", "*"):
+            return [{"kind": "star"}]
+        items = []
+        while True:
+            item = self.select_expression()
+            if item is None:
+                return None
+            items.append(item)
+            if not self.accept("op", ","):
+                return items
+
+    def select_expression(self):
+        start = self.peek()[2]
+        token, following = self.peek(), self.peek(1)
+        if token[0] == "word" and token[1].upper() in AGGREGATES and following[0] == "op" and following[1] == "(":
+            self.position += 2
+            function = token[1].upper()
+            star = function == "COUNT" and self.accept("op", "*") is not None
+            argument = None if star else self.reference()
+            if (argument is None and not star) or not self.accept("op", ")"):
+                return None
+            item = {"kind": "aggregate", "function": function, "argument": argument}
+        else:
+            reference = self.reference()
+            if reference is None:
+                return None
+            item = {"kind": "column", "reference": reference}
+        item["name"] = reference_name(item, self.query[start:self.peek(-1)[3]])
+        if self.accept("keyword", "AS"):
+            alias = self.name()
+            if alias is None:
+                return None
+            item["name"], item["alias"] = alias, True
+        return item
+
+    def condition(self):
+        reference = self.reference()
+        operator = self.accept("op")
+        if reference is None or operator is None or operator[1] not in COMPARISON_OPERATORS:
+            return None
+        negative = bool(self.accept("op", "-"))
+        token = self.accept("number") or (None if negative else self.accept("string"))
+        if token is None:
+            return None
+        if token[0] == "string":
+            value = token[1]
+        else:
+            value = float(token[1]) if any(c in token[1] for c in ".eE") else int(token[1])
+            value = -value if negative else value
+        return reference, "!=" if operator[1] == "<>" else operator[1], value
+
+
+def reference_name(item, text):
+    """
+    Return the column name MySQL gives a select item without an alias: the column itself,
+    or the expression as written for aggregates.
+    """
+    if item["kind"] == "column":
+        return item["reference"][1]
+    return text
+
+
+# Function to parse a generated query
+def parse_query(query):
+    """
+    Return the plan of a query of the supported shape (see QueryShapeParser), or None.
+    """
+    tokens = tokenize(query)
+    if not tokens:
+        return None
+    return QueryShapeParser(query, tokens).parse()
+
+
+# ---------------------------------------------------------------------------
+# In-memory tables
+# ---------------------------------------------------------------------------
+
+def prepare_column(series, column_type, date_format=None):
+    """
+    Convert a CSV column into the values MySQL stores for it: {"values", "nulls", "kind", "scale"}.
+    Numbers and dates become NumPy arrays; text stays an object array. NULL markers become nulls.
+    """
+    base = column_type.split("(")[0].upper()
+    if base in INTEGER_TYPE_NAMES or base in FLOAT_TYPE_NAMES or base == "DECIMAL":
+        numbers = pd.to_numeric(series, errors="coerce")
+        nulls = numbers.isna().to_numpy()
+        if base in INTEGER_TYPE_NAMES:
+            return {"values": numbers.fillna(0).to_numpy(dtype=np.int64), "nulls": nulls, "kind": "int"}
+        if base == "DECIMAL":
+            scale = int(re.search(r",\s*(\d+)", column_type).group(1))
+            return {"values": numbers.to_numpy(dtype=np.float64), "nulls": nulls, "kind": "decimal", "scale": scale}
+        return {"values": numbers.to_numpy(dtype=np.float64), "nulls": nulls, "kind": "float"}
+    if base in ("DATE", "DATETIME"):
+        if pd.api.types.is_datetime64_any_dtype(series.dtype):
+            parsed = series
+        elif date_format:
+            parsed = parse_text_dates(series, date_format)
+        else:
+            parsed = pd.to_datetime(series, format="%Y-%m-%d" if base == "DATE" else "%Y-%m-%d %H:%M:%S", errors="coerce")
+        if base == "DATE":
+            parsed = parsed.dt.normalize()
+        values = parsed.to_numpy(dtype="datetime64[ns]")
+        return {"values": values, "nulls": np.isnat(values), "kind": base.lower()}
+    if base == "TIME":
+        values = pd.to_timedelta(series, errors="coerce").to_numpy(dtype="timedelta64[ns]")
+        return {"values": values, "nulls": np.isnat(values), "kind": "time"}
+    nulls = series.isna().to_numpy()
+    if not pd.api.types.is_numeric_dtype(series.dtype):
+        nulls = nulls | series.isin(NULL_MARKERS).to_numpy()
+    values = series.to_numpy(dtype=object).copy()
+    values[nulls] = ""
+    if pd.api.types.infer_dtype(values, skipna=False) != "string":
+        # Numbers in a text column are stored as their text
+        values = np.array([str(value) for value in values], dtype=object)
+        values[nulls] = ""
+    return {"values": values, "nulls": nulls, "kind": "text"}
+
+
+def prepare_table(table_name, df, column_types, date_formats):
+    """
+    Build {"columns": {column: prepared column}, "names": [...], "rows": n} for a loaded table, with
+    the rows in primary key order like a full scan of the MySQL table.
+    """
+    from mysql_functions import normalize_column_name, primary_key_candidates
+
+    names = [normalize_column_name(column) for column in df.columns]
+    columns = {
+        name: prepare_column(df[column], column_types[column], date_formats.get(column))
+        for name, column in zip(names, df.columns)
+    }
+    primary_key = next((name for name in primary_key_candidates(table_name) if name in columns), None)
+    if primary_key is not None:
+        order = np.argsort(columns[primary_key]["values"], kind="stable")
+        for column in columns.values():
+            column["values"], column["nulls"] = column["values"][order], column["nulls"][order]
+    return {"columns": columns, "names": names, "rows": len(df)}
+
+
+_tables = {}
+_tables_lock = threading.Lock()
+
+
+# Function to keep loaded tables in memory for the engine
+def store_dataframes(connection, all_dataframes, table_column_types, date_formats_by_table):
+    """
+    Remember the DataFrames just loaded into the connection's database, with their column types
+    and text date formats. Tables are converted into the engine's arrays on first use.
+    """
+    from schema_catalog import get_connection_database
+
+    if not dataframe_engine_enabled():
+        return
+    db_name = get_connection_database(connection)
+    with _tables_lock:
+        tables = _tables.setdefault(db_name, {})
+        for table, df in all_dataframes.items():
+            tables[table] = {"df": df, "column_types": table_column_types[table],
+                             "date_formats": date_formats_by_table.get(table, {}), "prepared": None}
+
+
+# Function to get a table prepared for the engine
+def get_prepared_table(db_name, table):
+    """
+    Return the prepared arrays of a table of db_name, or None if the table is not held in memory.
+    """
+    with _tables_lock:
+        entry = _tables.get(db_name, {}).get(table)
+        if entry is None:
+            return None
+        if entry["prepared"] is None:
+            entry["prepared"] = prepare_table(table, entry["df"], entry["column_types"], entry["date_formats"])
+            # The arrays replace the DataFrame
+            entry["df"] = None
+        return entry["prepared"]
+
+
+# Function to forget in-memory tables
+def invalidate_dataframes(db_name=None, tables=None):
+    """
+    Forget the given tables of db_name, every table of db_name if no tables are given,
+    or everything if db_name is None as well.
+    """
+    with _tables_lock:
+        if db_name is None:
+            _tables.clear()
+        elif tables is None:
+            _tables.pop(db_name, None)
+        else:
+            for table in tables:
+                _tables.get(db_name, {}).pop(table, None)
+
+
+# ---------------------------------------------------------------------------
+# Execution
+# ---------------------------------------------------------------------------
+
+class Unsupported(Exception):
+    """
+    Raised while executing a plan the engine cannot answer exactly as MySQL would.
+    """
+
+
+def text_key(column):
+    """
+    Return the lower-cased text of a column, used for MySQL's case-insensitive comparisons.
+    """
+    if "lower" not in column:
+        column["lower"] = pd.Series(column["values"], dtype=object).str.lower().to_numpy(dtype=object)
+    return column["lower"]
+
+
+def text_rank(column):
+    """
+    Return the rank of every value of a text column in case-insensitive order, computed once per column,
+    so sorting and grouping work on integers instead of strings.
+    """
+    if "rank" not in column:
+        column["rank"] = np.unique(text_key(column), return_inverse=True)[1].reshape(-1)
+    return column["rank"]
+
+
+def text_collation(column):
+    """
+    Return how far a text column follows the collation as the engine models it: "ordered" if every value
+    matches ORDERED_TEXT_PATTERN, "equal" if every value matches EQUAL_TEXT_PATTERN, otherwise None.
+    """
+    if "collation" not in column:
+        values = pd.Series(column["values"], dtype=object)
+        if values.str.fullmatch(ORDERED_TEXT_PATTERN).all():
+            column["collation"] = "ordered"
+        elif values.str.fullmatch(EQUAL_TEXT_PATTERN).all():
+            column["collation"] = "equal"
+        else:
+            column["collation"] = None
+    return column["collation"]
+
+
+def require_collation(column, ordered):
+    """
+    Raise Unsupported unless the text column can be compared for equality (or ordered) like MySQL does.
+    """
+    collation = text_collation(column)
+    if collation is None or (ordered and collation != "ordered"):
+        raise Unsupported("text outside the characters the engine collates like MySQL")
+
+
+def numeric_family(kind):
+    return kind in ("int", "decimal", "float")
+
+
+def comparison_family(kind):
+    """
+    Return the group of kinds whose values compare with each other: numbers, text, dates or times.
+    """
+    if numeric_family(kind):
+        return "number"
+    return "date" if kind in ("date", "datetime") else kind
+
+
+def compare(column, operator, value):
+    """
+    Return the mask of rows where `column operator value` is true; NULLs never match.
+    """
+    kind = column["kind"]
+    if numeric_family(kind):
+        if isinstance(value, str):
+            try:
+                value = float(value)
+            except ValueError:
+                raise Unsupported("text compared with a number column")
+        values = column["values"]
+    elif kind == "text":
+        if not isinstance(value, str):
+            raise Unsupported("number compared with a text column")
+        ordered = operator not in ("=", "!=")
+        require_collation(column, ordered)
+        if not re.fullmatch(ORDERED_TEXT_PATTERN if ordered else EQUAL_TEXT_PATTERN, value):
+            raise Unsupported("text literal outside the characters the engine collates like MySQL")
+        values, value = text_key(column), value.lower()
+    elif kind in ("date", "datetime"):
+        if not isinstance(value, str) or not DATE_LITERAL_PATTERN.fullmatch(value):
+            raise Unsupported("date column compared with a value that is not an ISO date")
+        try:
+            value = np.datetime64(pd.Timestamp(value).to_datetime64(), "ns")
+        except ValueError:
+            raise Unsupported("invalid date literal")
+        values = column["values"]
+    else:
+        if not isinstance(value, str) or not re.fullmatch(TIME_PATTERN, value):
+            raise Unsupported("time column compared with a value that is not a time")
+        value = np.timedelta64(pd.to_timedelta(value).to_timedelta64(), "ns")
+        values = column["values"]
+    if operator == "=":
+        mask = values == value
+    elif operator == "!=":
+        mask = values != value
+    elif operator == ">":
+        mask = values > value
+    elif operator == "<":
+        mask = values < value
+    elif operator == ">=":
+        mask = values >= value
+    else:
+        mask = values <= value
+    return np.asarray(mask, dtype=bool) & ~column["nulls"]
+
+
+def join_key(column):
+    """
+    Return the values two columns are matched on: lower-cased text, or the numbers and dates themselves.
+    """
+    if column["kind"] == "text":
+        require_collation(column, ordered=False)
+        return text_key(column)
+    if column["kind"] in TEMPORAL_KINDS:
+        return column["values"].view(np.int64)
+    return column["values"].astype(np.float64)
+
+
+def hash_join(left_keys, right_keys, limit=None):
+    """
+    Inner equi-join of two key arrays. Both sides are hashed into shared codes with one
+    factorize; the right side is bucketed by code, and every left row is paired with its bucket.
+    Returns (left positions, right positions), ordered by left position. With a limit only the
+    first limit pairs are built, so a LIMIT over a many-to-many join does not materialize it.
+    """
+    codes, uniques = pd.factorize(np.concatenate([left_keys, right_keys]))
+    left_codes, right_codes = codes[:len(left_keys)], codes[len(left_keys):]
+    bucket_sizes = np.bincount(right_codes, minlength=len(uniques))
+    bucket_starts = np.cumsum(bucket_sizes) - bucket_sizes
+    right_by_code = np.argsort(right_codes, kind="stable")
+    matches = bucket_sizes[left_codes]
+    if limit is not None:
+        # Keep the left rows up to the one completing the limit, and cut its bucket short
+        totals = np.cumsum(matches)
+        needed = min(int(np.searchsorted(totals, limit)) + 1, len(matches))
+        left_codes, matches = left_codes[:needed], matches[:needed].copy()
+        if needed and totals[needed - 1] > limit:
+            matches[-1] -= totals[needed - 1] - limit
+    left = np.repeat(np.arange(len(matches)), matches)
+    within_bucket = np.arange(matches.sum()) - np.repeat(np.cumsum(matches) - matches, matches)
+    right = right_by_code[np.repeat(bucket_starts[left_codes], matches) + within_bucket]
+    return left, right
+
+
+def sort_key(column, index):
+    """
+    Return a float array ordering the rows of column (gathered by index) the way MySQL's ORDER BY does,
+    with NULLs lowest. Text is ranked case-insensitively.
+    """
+    nulls = column["nulls"][index]
+    if column["kind"] == "text":
+        require_collation(column, ordered=True)
+        key = text_rank(column)[index].astype(np.float64)
+    elif column["kind"] in TEMPORAL_KINDS:
+        key = column["values"][index].view(np.int64).astype(np.float64)
+    elif column["values"].dtype == object:
+        # Exact DECIMAL results are ranked, as float64 could tie distinct values
+        key = np.unique(column["values"][index], return_inverse=True)[1].reshape(-1).astype(np.float64)
+    else:
+        key = column["values"][index].astype(np.float64)
+    key[nulls] = -np.inf
+    return key
+
+
+def group_codes(column, index):
+    """
+    Return (codes, group count, first row of each group) for GROUP BY column, with groups
+    numbered in order of first appearance and NULLs forming one group.
+    """
+    nulls = column["nulls"][index]
+    if column["kind"] == "text":
+        require_collation(column, ordered=False)
+        keys = text_rank(column)[index]
+    elif column["kind"] in TEMPORAL_KINDS:
+        keys = column["values"][index].view(np.int64)
+    else:
+        keys = column["values"][index]
+    codes, uniques = pd.factorize(keys)
+    codes = codes.astype(np.int64)
+    count = len(uniques)
+    if nulls.any():
+        # Null rows carry a placeholder value; give them their own group
+        codes[nulls] = count
+        codes, uniques = pd.factorize(codes)
+        count = len(uniques)
+    first_rows = np.full(count, len(codes), dtype=np.int64)
+    np.minimum.at(first_rows, codes, np.arange(len(codes)))
+    return codes, count, first_rows
+
+
+def scaled_integers(column):
+    """
+    Return the values of an INT or DECIMAL column as integers scaled by 10 ** scale, computed once
+    per column, so that SUM and AVG are exact like MySQL's decimal arithmetic. The array is int64
+    when every value fits within float64's exact integers, and holds Python ints otherwise.
+    """
+    if "scaled" not in column:
+        values = column["values"]
+        if column["kind"] == "int":
+            column["scaled"] = values
+        else:
+            scale = column.get("scale", 0)
+            product = np.where(column["nulls"], 0, values * 10 ** scale)
+            if np.abs(product).max(initial=0) < 2 ** 52:
+                column["scaled"] = np.rint(product).astype(np.int64)
+            else:
+                column["scaled"] = np.array([
+                    0 if null else int(Decimal(repr(value)).scaleb(scale).to_integral_value(ROUND_HALF_UP))
+                    for value, null in zip(values.tolist(), column["nulls"].tolist())
+                ], dtype=object)
+    return column["scaled"]
+
+
+def exact_group_sums(values, codes, count):
+    """
+    Sum integer values per group, in int64 when no sum can overflow it and in Python ints otherwise.
+    """
+    if values.dtype != object and int(np.abs(values).max(initial=0)) * len(values) < 2 ** 63:
+        sums = np.zeros(count, dtype=np.int64)
+    else:
+        sums, values = np.zeros(count, dtype=object), values.astype(object)
+    np.add.at(sums, codes, values)
+    return sums
+
+
+def round_half_up_quotient(numerator, denominator):
+    """
+    Return numerator / denominator rounded to an integer, halves away from zero as MySQL rounds decimals.
+    """
+    quotient, remainder = divmod(abs(numerator), denominator)
+    if 2 * remainder >= denominator:
+        quotient += 1
+    return quotient if numerator >= 0 else -quotient
+
+
+def aggregate(function, column, index, codes, count):
+    """
+    Compute one aggregate per group as a standalone prepared column. Result types follow MySQL:
+    COUNT is an integer, SUM and AVG of exact numbers are DECIMAL (computed exactly, as Decimal
+    objects), MIN and MAX keep the column type.
+    """
+    if column is None:
+        return {"values": np.bincount(codes, minlength=count), "nulls": np.zeros(count, dtype=bool), "kind": "int"}
+    kind = column["kind"]
+    valid = ~column["nulls"][index]
+    valid_codes = codes[valid]
+    counts = np.bincount(valid_codes, minlength=count)
+    if function == "COUNT":
+        return {"values": counts, "nulls": np.zeros(count, dtype=bool), "kind": "int"}
+    if function in ("SUM", "AVG"):
+        if not numeric_family(kind):
+            raise Unsupported(f"{function} of a {kind} column")
+        nulls = counts == 0
+        if kind == "float":
+            sums = np.bincount(valid_codes, weights=column["values"][index][valid], minlength=count)
+            values = sums if function == "SUM" else sums / np.maximum(counts, 1)
+            return {"values": values, "nulls": nulls, "kind": "float"}
+        # Exact numbers: sum the scaled integers and build Decimals, rounding AVG half up
+        scale = column.get("scale", 0)
+        sums = exact_group_sums(scaled_integers(column)[index][valid], valid_codes, count)
+        if function == "SUM":
+            values = [Decimal(total).scaleb(-scale) for total in sums.tolist()]
+        else:
+            scale += AVG_EXTRA_SCALE
+            values = [
+                Decimal(round_half_up_quotient(total * 10 ** AVG_EXTRA_SCALE, max(rows, 1))).scaleb(-scale)
+                for total, rows in zip(sums.tolist(), counts.tolist())
+            ]
+        result_values = np.empty(count, dtype=object)
+        result_values[:] = values
+        return {"values": result_values, "nulls": nulls, "kind": "decimal", "scale": scale}
+    # MIN and MAX: order the valid rows by group, then by value, and take each group's first or last row
+    rows = np.flatnonzero(valid)
+    ordered = rows[np.lexsort((sort_key(column, index[rows]), codes[rows]))]
+    ordered_codes = codes[ordered]
+    if function == "MAX":
+        ordered, ordered_codes = ordered[::-1], ordered_codes[::-1]
+    present, first = np.unique(ordered_codes, return_index=True)
+    picked = np.zeros(count, dtype=np.int64)
+    picked[present] = index[ordered[first]]
+    result = {key: value for key, value in column.items() if key not in ("values", "nulls", "lower", "rank", "collation", "scaled")}
+    result["values"] = column["values"][picked]
+    result["nulls"] = counts == 0
+    return result
+
+
+def top_positions(key, descending, limit, offset):
+    """
+    Return the output positions in ORDER BY order, keeping only the first offset + limit.
+    Ties keep their input order. With a LIMIT only the k smallest keys are selected with
+    argpartition and sorted, instead of sorting every row.
+    """
+    if descending:
+        key = -key
+    if limit is None or offset + limit >= len(key):
+        return np.argsort(key, kind="stable")[offset:]
+    k = offset + limit
+    if k == 0:
+        return np.array([], dtype=np.int64)
+    kth = key[np.argpartition(key, k - 1)[k - 1]]
+    below = np.flatnonzero(key < kth)
+    ties = np.flatnonzero(key == kth)[:k - len(below)]
+    chosen = np.concatenate([below, ties])
+    return chosen[np.lexsort((chosen, key[chosen]))][offset:]
+
+
+def to_python(column, index):
+    """
+    Convert the rows of a prepared column into the Python values pymysql returns.
+    """
+    kind, nulls = column["kind"], column["nulls"][index]
+    values = column["values"][index]
+    if kind == "decimal" and values.dtype == object:
+        # SUM and AVG results are already exact Decimals
+        converted = values.tolist()
+    elif kind == "decimal":
+        scale = column.get("scale", 0)
+        converted = [Decimal(f"{value:.{scale}f}") for value in values.tolist()]
+    elif kind == "date":
+        converted = values.astype("datetime64[D]").tolist()
+    elif kind == "datetime":
+        converted = values.astype("datetime64[us]").tolist()
+    elif kind == "time":
+        converted = values.astype("timedelta64[us]").tolist()
+    else:
+        converted = values.tolist()
+    for position in np.flatnonzero(nulls):
+        converted[position] = None
+    return converted
+
+
+def execute_plan(plan, tables, max_rows=None):
+    """
+    Run a parsed plan over prepared tables ({table name: prepared table}).
+    Returns {"columns", "rows"}, or None if the result has more than max_rows rows.
+    Raises Unsupported for queries MySQL would reject or answer differently.
+    """
+    sources = [plan["from"]] + ([plan["join"]["table"]] if plan["join"] else [])
+    if len(set(sources)) != len(sources):
+        raise Unsupported("self join")
+
+    def resolve(reference):
+        table, name = reference
+        candidates = [source for source in sources if (table is None or source == table) and name in tables[source]["columns"]]
+        if len(candidates) != 1:
+            raise Unsupported(f"unknown or ambiguous column {name}")
+        return candidates[0], tables[candidates[0]]["columns"][name]
+
+    # Filter each table on its own conditions before joining
+    masks = {source: np.ones(tables[source]["rows"], dtype=bool) for source in sources}
+    for reference, operator, value in plan["where"]:
+        source, column = resolve(reference)
+        masks[source] &= compare(column, operator, value)
+    rows = {source: np.flatnonzero(mask) for source, mask in masks.items()}
+
+    select = plan["select"]
+    if select[0]["kind"] == "star":
+        select = [{"kind": "column", "reference": (source, name), "name": name} for source in sources for name in tables[source]["names"]]
+    grouped = plan["group_by"] is not None or any(item["kind"] == "aggregate" for item in select)
+
+    if plan["join"]:
+        (left_source, left_column), (right_source, right_column) = resolve(plan["join"]["left"]), resolve(plan["join"]["right"])
+        if left_source == right_source:
+            raise Unsupported("join condition within one table")
+        if comparison_family(left_column["kind"]) != comparison_family(right_column["kind"]):
+            raise Unsupported("join of columns of different types")
+        left_rows = rows[left_source][~left_column["nulls"][rows[left_source]]]
+        right_rows = rows[right_source][~right_column["nulls"][rows[right_source]]]
+        # Without grouping or ORDER BY, a LIMIT keeps the first rows of the join
+        pair_limit = None
+        if plan["limit"] is not None and not grouped and not plan["order_by"]:
+            pair_limit = plan["offset"] + plan["limit"]
+        left, right = hash_join(join_key(left_column)[left_rows], join_key(right_column)[right_rows], pair_limit)
+        rows = {left_source: left_rows[left], right_source: right_rows[right]}
+    row_count = len(rows[plan["from"]])
+
+    # Each output column is a prepared column and the index of its rows
+    outputs = []
+    if grouped:
+        group_source, group_column = resolve(plan["group_by"]) if plan["group_by"] else (None, None)
+        if group_column is not None:
+            codes, count, first_rows = group_codes(group_column, rows[group_source])
+        else:
+            codes, count, first_rows = np.zeros(row_count, dtype=np.int64), 1, np.zeros(1, dtype=np.int64)
+
+        def grouped_output(item):
+            if item["kind"] == "aggregate":
+                source, column = resolve(item["argument"]) if item["argument"] else (plan["from"], None)
+                return aggregate(item["function"], column, rows[source], codes, count), np.arange(count)
+            source, column = resolve(item["reference"])
+            if column is not group_column:
+                # ONLY_FULL_GROUP_BY rejects columns that are neither grouped nor aggregated
+                raise Unsupported("column outside GROUP BY")
+            return column, rows[source][first_rows]
+
+        outputs = [grouped_output(item) for item in select]
+        output_count = count
+    else:
+        for item in select:
+            source, column = resolve(item["reference"])
+            outputs.append((column, rows[source]))
+        output_count = row_count
+
+    positions = np.arange(output_count)
+    if plan["order_by"]:
+        expression = plan["order_by"]["expression"]
+        order_output = None
+        if expression["kind"] == "column" and expression["reference"][0] is None:
+            # An unqualified name refers to a select item before a table column
+            named = [output for item, output in zip(select, outputs) if item["name"].lower() == expression["reference"][1]]
+            if len(named) > 1:
+                raise Unsupported("ambiguous ORDER BY")
+            order_output = named[0] if named else None
+        if order_output is None and expression["kind"] == "aggregate":
+            same = [output for item, output in zip(select, outputs) if item["kind"] == "aggregate"
+                    and (item["function"], item["argument"]) == (expression["function"], expression["argument"])]
+            if not same:
+                raise Unsupported("ORDER BY an aggregate that is not selected")
+            order_output = same[0]
+        if order_output is None:
+            source, column = resolve(expression["reference"])
+            if grouped:
+                if column is not group_column:
+                    raise Unsupported("ORDER BY a column outside GROUP BY")
+                order_output = (column, rows[source][first_rows])
+            else:
+                order_output = (column, rows[source])
+        positions = top_positions(sort_key(*order_output), plan["order_by"]["descending"], plan["limit"], plan["offset"])
+    if plan["limit"] is not None:
+        positions = positions[:plan["limit"]] if plan["order_by"] else positions[plan["offset"]:plan["offset"] + plan["limit"]]
+    if max_rows is not None and len(positions) > max_rows:
+        return None
+
+    columns = [item["name"] for item in select]
+    values = [to_python(column, index[positions]) for column, index in outputs]
+    return {"columns": columns, "rows": list(zip(*values)) if values else []}
+
+
+# Function to answer a query from the in-memory tables
+def execute_on_dataframes(db_name, query, max_rows=None):
+    """
+    Answer a generated query from the DataFrames of the last load of db_name (see store_dataframes)
+    instead of the database. The engine covers the shape of the generated queries: one table or
+    one equi-join, a conjunctive WHERE, one GROUP BY with aggregates, ORDER BY and LIMIT/OFFSET,
+    with MySQL's NULL handling, case-insensitive text comparisons and result types. Text outside
+    plain ASCII (see EQUAL_TEXT_PATTERN) is left to the database, whose collation is accent-insensitive.
+
+    Returns {"columns", "rows"}, or None when the query is outside that shape, reads a table that
+    is not held in memory, or returns more than max_rows rows; the caller then runs it on the database.
+    """
+    if not dataframe_engine_enabled():
+        return None
+    with _tables_lock:
+        if not _tables.get(db_name):
+            return None
+    plan = parse_query(query)
+    if plan is None:
+        return None
+    tables = {}
+    for table in [plan["from"]] + ([plan["join"]["table"]] if plan["join"] else []):
+        tables[table] = get_prepared_table(db_name, table)
+        if tables[table] is None:
+            return None
+    try:
+        return execute_plan(plan, tables, max_rows)
+    except Unsupported:
+        return None
@@ -0,0 +1,178 @@
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+import pymysql
+
+# Default database used by ChatDB
+DEFAULT_DB_NAME = "dsci551"
+
+# Connections kept per pool; also the most that can be checked out at once
+DEFAULT_POOL_SIZE = 8
+
+# Connections idle for longer than this are pinged (and reconnected if stale) before reuse
+PING_AFTER_IDLE_SECONDS = 30
+
+# Seconds to wait for a free connection before giving up
+ACQUIRE_TIMEOUT_SECONDS = 60
+
+
+# Function to read the MySQL connection settings
+def get_mysql_settings():
+    """
+    Read MySQL connection settings from CHATDB_MYSQL_* environment variables.
+    """
+    return {
+        "host": os.environ.get("CHATDB_MYSQL_HOST", "localhost"),
+        "port": int(os.environ.get("CHATDB_MYSQL_PORT", 3306)),
+        "user": os.environ.get("CHATDB_MYSQL_USER", "root"),
+        "password": os.environ.get("CHATDB_MYSQL_PASSWORD", "harshita@97"),  # Replace with your MySQL root password
+        "connect_timeout": int(os.environ.get("CHATDB_MYSQL_CONNECT_TIMEOUT", 10)),
+    }
+
+
+# Function to open a new MySQL connection
+def connect(db_name=None, local_infile=False, cursorclass=None):
+    """
+    Open a new connection. If db_name is provided, connect to that database.
+    local_infile enables LOAD DATA LOCAL INFILE on the client side.
+    """
+    return pymysql.connect(
+        database=db_name,
+        local_infile=local_infile,
+        cursorclass=cursorclass or pymysql.cursors.Cursor,
+        **get_mysql_settings()
+    )
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of MySQL connections to one database.
+
+    Connections are created on demand up to size and handed out most recently used first.
+    A connection that sat idle longer than PING_AFTER_IDLE_SECONDS is pinged with reconnect
+    before reuse, so MySQL's idle timeout never surfaces as a failed query.
+    """
+
+    def __init__(self, db_name=None, size=DEFAULT_POOL_SIZE, local_infile=False, cursorclass=None):
+        self.db_name = db_name
+        self.size = size
+        self.local_infile = local_infile
+        self.cursorclass = cursorclass
+        self.idle = queue.LifoQueue()
+        self.available = threading.Semaphore(size)
+
+    def acquire(self, timeout=ACQUIRE_TIMEOUT_SECONDS):
+        """
+        Check out a healthy connection, blocking while all of them are in use.
+        """
+        if not self.available.acquire(timeout=timeout):
+            raise TimeoutError(f"No free MySQL connection after {timeout}s (pool size {self.size}).")
+        try:
+            while True:
+                try:
+                    connection, last_used = self.idle.get_nowait()
+                except queue.Empty:
+                    return connect(self.db_name, self.local_infile, self.cursorclass)
+                if time.monotonic() - last_used < PING_AFTER_IDLE_SECONDS:
+                    return connection
+                try:
+                    connection.ping(reconnect=True)
+                    return connection
+                except pymysql.MySQLError:
+                    self._discard(connection)
+        except BaseException:
+            self.available.release()
+            raise
+
+    def release(self, connection, broken=False):
+        """
+        Return a connection to the pool. Any open transaction is rolled back so the next
+        user does not read from a stale snapshot; broken connections are closed instead.
+        """
+        try:
+            if broken:
+                self._discard(connection)
+                return
+            try:
+                connection.rollback()
+            except pymysql.MySQLError:
+                self._discard(connection)
+                return
+            self.idle.put((connection, time.monotonic()))
+        finally:
+            self.available.release()
+
+    @contextmanager
+    def connection(self):
+        """
+        Check out a connection for the duration of a with block.
+        """
+        connection = self.acquire()
+        broken = False
+        try:
+            yield connection
+        except (pymysql.OperationalError, pymysql.InterfaceError):
+            broken = True
+            raise
+        finally:
+            self.release(connection, broken)
+
+    def close(self):
+        """
+        Close every idle connection.
+        """
+        while True:
+            try:
+                connection, _ = self.idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(connection)
+
+    def _discard(self, connection):
+        try:
+            connection.close()
+        except pymysql.Error:
+            pass
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+# Function to get the shared pool for a database
+def get_pool(db_name=None, local_infile=False, size=None):
+    """
+    Return the process-wide pool for (db_name, local_infile), creating it on first use.
+    The pool size comes from size, CHATDB_MYSQL_POOL_SIZE or DEFAULT_POOL_SIZE.
+    """
+    key = (db_name, local_infile)
+    with _pools_lock:
+        if key not in _pools:
+            size = size or int(os.environ.get("CHATDB_MYSQL_POOL_SIZE", DEFAULT_POOL_SIZE))
+            _pools[key] = ConnectionPool(db_name, size, local_infile)
+        return _pools[key]
+
+
+# Function to close all pooled connections
+def close_pools():
+    """
+    Close the idle connections of every pool, e.g. before exiting.
+    """
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+
+
+# Function to create a database if it doesn't exist
+def ensure_database(db_name):
+    """
+    Create the database if it does not already exist, using a pooled server-level connection.
+    """
+    with get_pool().connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{db_name}`;")
+        connection.commit()
@@ -0,0 +1,312 @@
+import hashlib
+import json
+import os
+import time
+
+import pandas as pd
+import pymysql
+
+from csv_cache import load_parsed_csv
+from column_stats import ColumnStatsCollector, delete_column_stats, invalidate_column_stats, store_column_stats
+from mysql_functions import (
+    align_key_column_types, build_create_table_query, build_dependency_levels, create_indexes, dataframe_to_rows,
+    find_foreign_keys, insert_dataframe, normalize_column_name, primary_key_candidates, print_load_report, RssSampler,
+)
+from result_cache import invalidate_result_cache
+from dataframe_engine import invalidate_dataframes
+from schema_catalog import METADATA_TABLE_PREFIX, get_connection_database, get_schema_catalog, invalidate_schema_catalog
+from translation_cache import invalidate_translation_cache
+
+# Metadata table holding the fingerprint of the CSV file each table was last loaded from
+FINGERPRINT_TABLE = f"{METADATA_TABLE_PREFIX}file_fingerprints"
+
+# Bytes read at a time while hashing a file
+HASH_CHUNK_BYTES = 1024 * 1024
+
+# Keys per DELETE statement when removing rows that disappeared from a file
+DELETE_BATCH_SIZE = 1000
+
+
+# Function to hash a file
+def hash_file(file_path, prefix_size=None):
+    """
+    Return the SHA-256 of the whole file and, if prefix_size is given, of its first prefix_size bytes,
+    reading the file once.
+    """
+    digest = hashlib.sha256()
+    prefix_digest = digest.hexdigest() if prefix_size == 0 else None
+    position = 0
+    with open(file_path, "rb") as csv_file:
+        while True:
+            # Stop each read at the prefix boundary so the prefix hash can be taken there
+            read_size = HASH_CHUNK_BYTES
+            if prefix_size is not None and position < prefix_size:
+                read_size = min(read_size, prefix_size - position)
+            chunk = csv_file.read(read_size)
+            position += len(chunk)
+            digest.update(chunk)
+            if prefix_size is not None and position == prefix_size and prefix_digest is None:
+                prefix_digest = digest.hexdigest()
+            if not chunk:
+                break
+    return digest.hexdigest(), prefix_digest
+
+
+# Function to check whether a byte offset of a file is on a line break
+def is_line_boundary(file_path, offset):
+    """
+    Return True if the byte offset ends a line or the bytes after it start a new one,
+    as when rows are appended to a file whose last line had no line break.
+    """
+    if offset == 0:
+        return True
+    with open(file_path, "rb") as csv_file:
+        csv_file.seek(offset - 1)
+        around = csv_file.read(2)
+    return around[:1] == b"\n" or around[1:] in (b"\n", b"\r")
+
+
+# Function to compare a file with its stored fingerprint
+def classify_file(file_path, fingerprint):
+    """
+    Return (change, content hash), where change is "new" without a fingerprint, "unchanged" if the
+    content is the same, "append" if the file only gained lines at the end, and
+    "changed" otherwise. Files with the same size and modification time are not read at all.
+    """
+    stat = os.stat(file_path)
+    if fingerprint is None:
+        return "new", hash_file(file_path)[0]
+    if stat.st_size == fingerprint["size"] and stat.st_mtime_ns == fingerprint["mtime_ns"]:
+        return "unchanged", fingerprint["content_hash"]
+    content_hash, prefix_hash = hash_file(file_path, fingerprint["size"])
+    if content_hash == fingerprint["content_hash"]:
+        return "unchanged", content_hash
+    if (stat.st_size > fingerprint["size"] and prefix_hash == fingerprint["content_hash"]
+            and is_line_boundary(file_path, fingerprint["size"])):
+        return "append", content_hash
+    return "changed", content_hash
+
+
+# Function to load the stored file fingerprints
+def load_fingerprints(connection):
+    """
+    Return {table: fingerprint} for the connection's database, creating the fingerprint table if needed.
+    """
+    cursor = connection.cursor(pymysql.cursors.Cursor)
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS `{FINGERPRINT_TABLE}` (
+            table_name VARCHAR(64) NOT NULL PRIMARY KEY,
+            file_name VARCHAR(255) NOT NULL,
+            size BIGINT NOT NULL,
+            mtime_ns BIGINT NOT NULL,
+            content_hash CHAR(64) NOT NULL,
+            row_count BIGINT NOT NULL,
+            column_types TEXT NOT NULL
+        );
+    """)
+    cursor.execute(f"SELECT * FROM `{FINGERPRINT_TABLE}`;")
+    return {
+        table: {"file_name": file_name, "size": size, "mtime_ns": mtime_ns, "content_hash": content_hash,
+                "row_count": row_count, "column_types": json.loads(column_types)}
+        for table, file_name, size, mtime_ns, content_hash, row_count, column_types in cursor.fetchall()
+    }
+
+
+# Function to store a file fingerprint
+def save_fingerprint(connection, table, file_path, content_hash, row_count, column_types):
+    """
+    Remember the file a table was loaded from; column_types is kept in column order.
+    """
+    stat = os.stat(file_path)
+    cursor = connection.cursor()
+    cursor.execute(
+        f"REPLACE INTO `{FINGERPRINT_TABLE}` VALUES (%s, %s, %s, %s, %s, %s, %s);",
+        (table, os.path.basename(file_path), stat.st_size, stat.st_mtime_ns, content_hash, row_count, json.dumps(column_types)),
+    )
+    connection.commit()
+
+
+def find_primary_key(table_name, df):
+    """
+    Return the DataFrame column that becomes the table's primary key, or None.
+    """
+    primary_keys = primary_key_candidates(table_name)
+    return next((col for col in df.columns if normalize_column_name(col) in primary_keys), None)
+
+
+# Function to delete the rows whose key is no longer in the file
+def delete_missing_keys(cursor, table_name, df, key_column):
+    """
+    Delete the rows of a table whose primary key does not appear in the DataFrame.
+    Returns the number of rows deleted.
+    """
+    key = normalize_column_name(key_column)
+    file_keys = {row[0] for row in dataframe_to_rows(df[[key_column]])}
+    cursor.execute(f"SELECT `{key}` FROM `{table_name}`;")
+    missing = [row[0] for row in cursor.fetchall() if row[0] not in file_keys]
+    for start in range(0, len(missing), DELETE_BATCH_SIZE):
+        batch = missing[start:start + DELETE_BATCH_SIZE]
+        cursor.execute(f"DELETE FROM `{table_name}` WHERE `{key}` IN ({', '.join(['%s'] * len(batch))});", batch)
+    return len(missing)
+
+
+# Function to reload one table from scratch
+def reload_table(cursor, table_name, df, column_types, date_formats):
+    cursor.execute(f"DROP TABLE IF EXISTS `{table_name}`;")
+    cursor.execute(build_create_table_query(table_name, column_types, {}))
+    return insert_dataframe(cursor, table_name, df, date_formats=date_formats)
+
+
+# Function to apply the changes of one file to its table
+def update_table(cursor, table_name, change, df, column_types, date_formats, fingerprint):
+    """
+    Bring a table in line with its CSV file and return (action, rows written):
+    "append" inserts only the rows after the previously loaded ones, "upsert" updates the rows by
+    primary key and deletes the rows that were removed from the file, and "reload" recreates the table.
+    Columns whose inferred type changed are altered in place; the table is reloaded if that fails,
+    if the columns were renamed, added or removed, or if a changed file has no primary key.
+    """
+    key_column = find_primary_key(table_name, df)
+    if (change not in ("append", "changed") or list(fingerprint["column_types"]) != list(column_types)
+            or (change == "changed" and key_column is None)):
+        return "reload", reload_table(cursor, table_name, df, column_types, date_formats)
+
+    if change == "changed":
+        delete_missing_keys(cursor, table_name, df, key_column)
+    modified = [
+        f"MODIFY `{normalize_column_name(col)}` {col_type}"
+        for col, col_type in column_types.items() if fingerprint["column_types"][col] != col_type
+    ]
+    if modified:
+        try:
+            cursor.execute(f"ALTER TABLE `{table_name}` {', '.join(modified)};")
+        except pymysql.MySQLError as e:
+            print(f"Could not change the column types of `{table_name}` ({e}), reloading it.")
+            return "reload", reload_table(cursor, table_name, df, column_types, date_formats)
+
+    if change == "append":
+        return "append", insert_dataframe(cursor, table_name, df.iloc[fingerprint["row_count"]:], date_formats=date_formats)
+    return "upsert", insert_dataframe(cursor, table_name, df, date_formats=date_formats, upsert=True)
+
+
+# Function to load only the files of a folder that changed
+def process_csv_folder_incremental(folder_path, connection, add_indexes=True):
+    """
+    Load a folder of CSV files into a database that may already hold an earlier load of it.
+
+    Each file is compared with the fingerprint (size, modification time, SHA-256) stored when its
+    table was last loaded. Unchanged files are skipped without being read, files that only gained
+    rows at the end get those rows appended, other changed files are upserted by primary key, and
+    new files, or files without a primary key, are reloaded. Tables whose file was removed are dropped.
+    Returns a per-table load report.
+    """
+    fingerprints = load_fingerprints(connection)
+    existing_tables = set(get_schema_catalog(connection).table_names())
+    file_paths = {
+        os.path.splitext(file_name)[0]: os.path.join(folder_path, file_name)
+        for file_name in sorted(os.listdir(folder_path)) if file_name.endswith(".csv")
+    }
+
+    changes, content_hashes = {}, {}
+    for table, file_path in file_paths.items():
+        fingerprint = fingerprints.get(table)
+        changes[table], content_hashes[table] = classify_file(file_path, fingerprint)
+        if table not in existing_tables:
+            changes[table] = "new"
+        elif changes[table] == "unchanged" and os.stat(file_path).st_mtime_ns != fingerprint["mtime_ns"]:
+            # Same content with a newer modification time: refresh the fingerprint so the file is not hashed again
+            save_fingerprint(connection, table, file_path, content_hashes[table], fingerprint["row_count"], fingerprint["column_types"])
+
+    # Read and infer the changed files; unchanged tables keep their stored column types
+    frames, inferred_types, date_formats_by_table, encodings = {}, {}, {}, {}
+
+    def read_table(table):
+        parsed = load_parsed_csv(file_paths[table])
+        frames[table] = parsed["df"]
+        encodings[table] = parsed["encoding"]
+        inferred_types[table] = dict(parsed["column_types"])
+        date_formats_by_table[table] = parsed["date_formats"]
+
+    for table, change in changes.items():
+        if change != "unchanged":
+            read_table(table)
+    foreign_keys = find_foreign_keys({
+        table: pd.DataFrame(columns=list(frames[table].columns) if table in frames else list(fingerprints[table]["column_types"]))
+        for table in file_paths
+    })
+    while True:
+        table_column_types = align_key_column_types({
+            table: dict(inferred_types[table]) if table in inferred_types else dict(fingerprints[table]["column_types"])
+            for table in file_paths
+        }, foreign_keys)
+        # A changed key column can widen the matching column of an unchanged table
+        widened = [
+            table for table, change in changes.items()
+            if change == "unchanged" and table_column_types[table] != fingerprints[table]["column_types"]
+        ]
+        if not widened:
+            break
+        for table in widened:
+            changes[table] = "changed"
+            read_table(table)
+
+    removed = [table for table in fingerprints if table not in file_paths]
+    if not frames and not removed:
+        print("No CSV files changed since the last upload.")
+        return [{"table": table, "mode": "unchanged", "rows": 0, "seconds": 0.0, "peak_rss_mb": None} for table in file_paths]
+
+    load_report, table_stats, reloaded_stats = [], {}, {}
+    cursor = connection.cursor()
+    # Tables are updated in place, so rows of one table may briefly reference rows another table gains later
+    cursor.execute("SET foreign_key_checks = 0;")
+    try:
+        for table in removed:
+            cursor.execute(f"DROP TABLE IF EXISTS `{table}`;")
+            cursor.execute(f"DELETE FROM `{FINGERPRINT_TABLE}` WHERE table_name = %s;", (table,))
+            connection.commit()
+            print(f"Table `{table}` dropped, its CSV file was removed.")
+
+        for level in build_dependency_levels(list(file_paths), foreign_keys):
+            for table in level:
+                start = time.perf_counter()
+                if table not in frames:
+                    load_report.append({"table": table, "mode": "unchanged", "rows": 0, "seconds": 0.0, "peak_rss_mb": None})
+                    continue
+                df, column_types = frames[table], table_column_types[table]
+                date_formats = date_formats_by_table[table]
+                with RssSampler() as rss:
+                    try:
+                        action, rows = update_table(cursor, table, changes[table], df, column_types, date_formats, fingerprints.get(table))
+                        connection.commit()
+                        save_fingerprint(connection, table, file_paths[table], content_hashes[table], len(df), column_types)
+                        print(f"Table `{table}`: {action}, {rows} rows written.")
+                    except Exception as e:
+                        connection.rollback()
+                        print(f"Error processing `{file_paths[table]}`: {e}")
+                        action, rows = changes[table], None
+                load_report.append({"table": table, "encoding": encodings[table], "mode": action, "rows": rows, "seconds": time.perf_counter() - start, **rss.report()})
+                if rows is not None:
+                    table_stats[table] = ColumnStatsCollector(column_types, date_formats).update(df).table_stats(normalize_column_name)
+                    if action == "reload":
+                        reloaded_stats[table] = table_stats[table]
+    finally:
+        cursor.execute("SET foreign_key_checks = 1;")
+
+    db_name = get_connection_database(connection)
+    invalidate_result_cache(db_name, list(frames) + removed)
+    invalidate_dataframes(db_name, list(frames) + removed)
+    invalidate_schema_catalog()
+    invalidate_translation_cache()
+    if removed:
+        delete_column_stats(connection, removed)
+    store_column_stats(connection, table_stats)
+    # Only the cached statistics of the updated tables were replaced; reload all of them on next use
+    invalidate_column_stats()
+    # Appended and upserted tables keep their indexes and foreign keys
+    if add_indexes and reloaded_stats:
+        index_timings = create_indexes(connection, table_column_types, foreign_keys, reloaded_stats, file_paths)
+        for entry in load_report:
+            entry["index_seconds"] = index_timings.get(entry["table"])
+
+    print_load_report(load_report)
+    return load_report
@@ -1,33 +1,39 @@
 import pymysql
 import pandas as pd
+import numpy as np
 import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 from tabulate import tabulate
-from nltk.stem import WordNetLemmatizer
-from rapidfuzz import process, fuzz
+from db_connection import connect, get_pool, ensure_database
+from nlp_resources import lemmatize
+from schema_catalog import get_connection_database, invalidate_schema_catalog
+from column_stats import ColumnStatsCollector, NUMERIC_TYPES, store_column_stats, invalidate_column_stats
+from translation_cache import invalidate_translation_cache
+from result_cache import get_result_cache, invalidate_result_cache
+from dataframe_engine import execute_on_dataframes, invalidate_dataframes, store_dataframes
+from csv_cache import load_parsed_csv
+from csv_encoding import detect_encoding
+from type_inference import ColumnTypeInferrer, NULL_MARKERS, DATE_FORMATS, INTEGER_TYPES, parse_text_dates
 
 # Function to connect to MySQL
-def connect_to_mysql(db_name=None):
+def connect_to_mysql(db_name=None, local_infile=False):
     """
     Connect to MySQL. If db_name is provided, connect to that database.
+    local_infile enables LOAD DATA LOCAL INFILE on the client side.
+    Connection settings come from the CHATDB_MYSQL_* environment variables (see db_connection).
     """
-    connection = pymysql.connect(
-        host="localhost",
-        user="root",
-        password="harshita@97",  # Replace with your MySQL root password
-        database=db_name
-    )
-    return connection
+    return connect(db_name, local_infile)
 
 # Function to create the database if it doesn't exist
 def create_database(db_name="dsci551"):
     """
     Create a database if it does not already exist.
     """
-    connection = connect_to_mysql()
-    cursor = connection.cursor()
-    cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{db_name}`;")
-    connection.commit()
-    connection.close()
+    ensure_database(db_name)
     print(f"Database `{db_name}` is ready.")
 
 # Function to reset the database (drop all tables)
@@ -43,26 +49,19 @@ def reset_database(connection):
         cursor.execute(f"DROP TABLE IF EXISTS `{table[0]}`;")
     cursor.execute("SET FOREIGN_KEY_CHECKS = 1;")
     connection.commit()
+    invalidate_schema_catalog()
+    invalidate_column_stats()
+    invalidate_translation_cache()
+    invalidate_result_cache(get_connection_database(connection))
+    invalidate_dataframes(get_connection_database(connection))
     print("All existing tables dropped.")
 
 # Function to infer MySQL column types from Pandas DataFrame
 def infer_column_types(df):
     """
-    Infer MySQL column types from a Pandas DataFrame.
+    Infer compact MySQL column types from a Pandas DataFrame.
     """
-    column_types = {}
-    for column in df.columns:
-        dtype = df[column].dtype
-        if pd.api.types.is_integer_dtype(dtype):
-            column_types[column] = "INT"
-        elif pd.api.types.is_float_dtype(dtype):
-            column_types[column] = "FLOAT"
-        elif pd.api.types.is_datetime64_any_dtype(dtype):
-            column_types[column] = "DATETIME"
-        else:
-            max_length = df[column].astype(str).map(len).max()
-            column_types[column] = f"VARCHAR({max_length if max_length > 0 else 255})"
-    return column_types
+    return ColumnTypeInferrer().update(df).column_types()
 
 # # Function to create a table and insert data into MySQL
 # def upload_csv_to_mysql(file_path, connection):
@@ -112,15 +111,18 @@ def infer_column_types(df):
 
 
 
-# Initialize NLTK lemmatizer
-lemmatizer = WordNetLemmatizer()
+def normalize_column_name(column):
+    """
+    Convert a CSV header into the column name used in MySQL.
+    """
+    return column.replace(' ', '_').lower()
 
 def get_singular_table_name(file_name):
     """
     Get the singular form of the table name from the CSV file name.
     """
     table_name = os.path.splitext(file_name)[0]
-    singular_name = lemmatizer.lemmatize(table_name.lower())  # Convert to singular
+    singular_name = lemmatize(table_name.lower())  # Convert to singular
     return singular_name
 
 
@@ -129,7 +131,8 @@ def find_foreign_keys(all_dataframes):
     Infer foreign key relationships based on primary keys and table names.
     """
     foreign_keys = {}
-    table_columns = {table: df.columns.tolist() for table, df in all_dataframes.items()}
+    # Compare the column names as they are created in MySQL, e.g. "raceId" and "Movie ID" become "raceid" and "movie_id"
+    table_columns = {table: [normalize_column_name(col) for col in df.columns] for table, df in all_dataframes.items()}
 
     # Detect primary keys for each table
     primary_keys = {}
@@ -151,133 +154,822 @@ def find_foreign_keys(all_dataframes):
 
     return foreign_keys
 
-def upload_csv_to_mysql(file_path, connection, all_dataframes, foreign_keys, batch_size=1000):
+# Upper bound on the estimated payload of one executemany() call; pymysql folds each call
+# into multi-row INSERT statements of about this size
+MAX_BATCH_BYTES = 1024 * 1024
+
+def dataframe_to_rows(df, date_formats=None):
     """
-    Upload a CSV file into MySQL by creating a table dynamically.
-    Handles primary key and foreign key constraints and uses batch inserts for faster data insertion.
+    Convert a DataFrame into row tuples for parameter binding.
+    Each column is converted in one vectorized pass: NaN/NaT and NULL markers become None
+    and NumPy scalars become native Python values. Text date columns listed in date_formats
+    are parsed into dates.
     """
-    table_name = os.path.splitext(os.path.basename(file_path))[0]
-    df = all_dataframes[table_name]
-    column_types = infer_column_types(df)
+    date_formats = date_formats or {}
+    converted = []
+    for column in df.columns:
+        series = df[column]
+        if column in date_formats:
+            series = parse_text_dates(series, date_formats[column])
+            if date_formats[column] in DATE_FORMATS:
+                series = series.dt.date
+        null_mask = series.isna().to_numpy()
+        if pd.api.types.is_datetime64_any_dtype(series.dtype):
+            values = np.array(series.dt.to_pydatetime(), dtype=object)
+        else:
+            values = series.to_numpy(dtype=object)
+            if not pd.api.types.is_numeric_dtype(series.dtype):
+                null_mask = null_mask | series.isin(NULL_MARKERS).to_numpy()
+        if null_mask.any():
+            values[null_mask] = None
+        converted.append(values)
+    return list(zip(*converted))
+
+def estimate_row_bytes(df):
+    """
+    Estimate the size of each row once rendered into an INSERT statement.
+    """
+    row_bytes = np.zeros(len(df), dtype=np.int64)
+    for column in df.columns:
+        series = df[column]
+        if pd.api.types.is_string_dtype(series.dtype):
+            # Non-string objects report NaN lengths and are counted like NULLs
+            lengths = series.str.len().fillna(4).to_numpy(dtype=np.int64)
+            row_bytes += lengths + 4
+        else:
+            row_bytes += 24
+    return row_bytes
 
-    # Identify the primary key for the current table
+def iter_batches_by_bytes(row_bytes, max_batch_bytes=MAX_BATCH_BYTES):
+    """
+    Yield (start, end) row ranges whose estimated size stays within max_batch_bytes.
+    A single oversized row still gets a batch of its own.
+    """
+    cumulative = np.cumsum(row_bytes)
+    start = 0
+    while start < len(row_bytes):
+        offset = cumulative[start - 1] if start > 0 else 0
+        end = int(np.searchsorted(cumulative, offset + max_batch_bytes, side="right"))
+        end = max(end, start + 1)
+        yield start, end
+        start = end
+
+def insert_dataframe(cursor, table_name, df, max_batch_bytes=MAX_BATCH_BYTES, date_formats=None, upsert=False):
+    """
+    Insert all rows of a DataFrame into an existing table using parameterized executemany() batches.
+    With upsert, rows whose key already exists update the existing row instead (ON DUPLICATE KEY UPDATE).
+    Returns the number of rows inserted.
+    """
+    columns = [normalize_column_name(col) for col in df.columns]
+    columns_list = ", ".join([f"`{col}`" for col in columns])
+    placeholders = ", ".join(["%s"] * len(df.columns))
+    insert_query = f"INSERT INTO `{table_name}` ({columns_list}) VALUES ({placeholders})"
+    if upsert:
+        insert_query += " ON DUPLICATE KEY UPDATE " + ", ".join(f"`{col}` = VALUES(`{col}`)" for col in columns)
+
+    inserted = 0
+    for start, end in iter_batches_by_bytes(estimate_row_bytes(df), max_batch_bytes):
+        rows = dataframe_to_rows(df.iloc[start:end], date_formats)
+        cursor.executemany(insert_query, rows)
+        inserted += len(rows)
+    return inserted
+
+def primary_key_candidates(table_name):
+    """
+    Return the column names that would be the primary key of a table, e.g. "raceid" or "race_id" for races.
+    """
     singular_table_name = get_singular_table_name(table_name)  # Singular form of the table name
-    possible_primary_keys = [f"{singular_table_name}_id", f"{singular_table_name}id", f"{singular_table_name.replace('_', '')}id"]
+    return [f"{singular_table_name}_id", f"{singular_table_name}id", f"{singular_table_name.replace('_', '')}id"]
+
+def build_create_table_query(table_name, column_types, foreign_keys):
+    """
+    Build the CREATE TABLE statement for a table with the given column types, declaring the
+    inferred primary key. Foreign keys and secondary indexes are added by create_indexes once
+    the data is loaded, which is cheaper than maintaining them row by row during the load.
+    """
+    # Identify the primary key for the current table
+    possible_primary_keys = primary_key_candidates(table_name)
 
     # Generate SQL for creating table
     columns_def = []
     for col, dtype in column_types.items():
-        col_new = col.replace(' ', '_').lower()
-        column_def = f"`{col.replace(' ', '_').lower()}` {dtype}"
+        col_new = normalize_column_name(col)
+        column_def = f"`{col_new}` {dtype}"
         if col_new in possible_primary_keys:  # Declare the primary key
             column_def += " PRIMARY KEY"
-        # Add foreign key constraints if applicable
-        for fk_col, referenced_table in foreign_keys.get(table_name, []):
-            if col_new == fk_col:
-                column_def += f" REFERENCES {referenced_table}({fk_col})"
-                break
         columns_def.append(column_def)
     columns_def = ", ".join(columns_def)
-    create_table_query = f"CREATE TABLE `{table_name}` ({columns_def});"
+    return f"CREATE TABLE `{table_name}` ({columns_def});"
+
+def upload_csv_to_mysql(file_path, connection, all_dataframes, foreign_keys, max_batch_bytes=MAX_BATCH_BYTES, column_types=None, date_formats=None):
+    """
+    Upload a CSV file into MySQL by creating a table dynamically.
+    Handles primary key and foreign key constraints and uses parameterized batch inserts for faster data insertion.
+    column_types and date_formats are inferred from the data unless given.
+    Returns the number of rows inserted, or None if the upload failed.
+    """
+    table_name = os.path.splitext(os.path.basename(file_path))[0]
+    df = all_dataframes[table_name]
+    if column_types is None:
+        inferrer = ColumnTypeInferrer().update(df)
+        column_types, date_formats = inferrer.column_types(), inferrer.date_formats()
+    create_table_query = build_create_table_query(table_name, column_types, foreign_keys)
 
     cursor = connection.cursor()
     try:
         print(create_table_query)  # Debugging: Print the create table query
         cursor.execute(create_table_query)
+        invalidate_result_cache(get_connection_database(connection), [table_name])
         print(f"Table `{table_name}` created successfully.")
 
-        # Prepare columns for the INSERT statement
-        columns_list = ", ".join([f"`{col.replace(' ', '_').lower()}`" for col in df.columns])
-
-        # Batch insert records
-        rows = []
-        for _, row in df.iterrows():
-            values = []
-            for col, value in zip(df.columns, row.values):
-                column_type = column_types[col]
-                if pd.isna(value) or value == "NULL":
-                    values.append("NULL")
-                elif column_type in ["INT", "FLOAT"]:
-                    values.append(str(value))
-                else:
-                    escaped_value = str(value).replace("'", "''")
-                    values.append(f"'{escaped_value}'")
-            rows.append(f"({', '.join(values)})")
-
-            # Insert in batches
-            if len(rows) >= batch_size:
-                insert_query = f"INSERT INTO `{table_name}` ({columns_list}) VALUES {', '.join(rows)};"
-                cursor.execute(insert_query)
-                rows = []  # Clear the batch after insertion
-
-        # Insert remaining rows
-        if rows:
-            insert_query = f"INSERT INTO `{table_name}` ({columns_list}) VALUES {', '.join(rows)};"
-            cursor.execute(insert_query)
+        inserted = insert_dataframe(cursor, table_name, df, max_batch_bytes, date_formats)
 
         connection.commit()
         print(f"Data from `{file_path}` inserted into `{table_name}`.")
+        return inserted
+    except Exception as e:
+        print(f"Error processing `{file_path}`: {e}")
+        return None
+
+def upload_csv_bulk(file_path, connection, all_dataframes, column_types, date_formats=None, max_batch_bytes=MAX_BATCH_BYTES):
+    """
+    Bulk-load a CSV file into MySQL: create the table with only its primary key and insert the rows
+    in primary key order, in one transaction with unique and foreign key checks turned off, so InnoDB
+    appends to the clustered index instead of maintaining keys row by row.
+    Secondary indexes and foreign keys are left to create_indexes.
+    Returns the number of rows inserted, or None if the upload failed.
+    """
+    table_name = os.path.splitext(os.path.basename(file_path))[0]
+    df = all_dataframes[table_name]
+    primary_keys = primary_key_candidates(table_name)
+    key_columns = [col for col in df.columns if normalize_column_name(col) in primary_keys]
+    if key_columns:
+        df = df.sort_values(key_columns[0], kind="stable")
+    create_table_query = build_create_table_query(table_name, column_types, {})
+
+    cursor = connection.cursor()
+    try:
+        cursor.execute(create_table_query)
+        invalidate_result_cache(get_connection_database(connection), [table_name])
+        print(f"Table `{table_name}` created successfully.")
+
+        cursor.execute("SET unique_checks = 0, foreign_key_checks = 0;")
+        try:
+            inserted = insert_dataframe(cursor, table_name, df, max_batch_bytes, date_formats)
+            connection.commit()
+        finally:
+            # Pooled connections are reused, so the session settings must not leak
+            cursor.execute("SET unique_checks = 1, foreign_key_checks = 1;")
+        print(f"Data from `{file_path}` bulk-loaded into `{table_name}`.")
+        return inserted
+    except Exception as e:
+        print(f"Error processing `{file_path}`: {e}")
+        return None
+
+# Values pandas.read_csv treats as missing by default; LOAD DATA maps the same values to NULL
+CSV_NA_VALUES = [
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+]
+
+# Server/client errors meaning LOAD DATA LOCAL INFILE is not permitted
+LOCAL_INFILE_DISABLED_ERRORS = {1148, 2068, 3948}
+
+def reencode_to_utf8(file_path, encoding, chunk_size=1024 * 1024):
+    """
+    Copy a CSV into a temporary UTF-8 file and return the temporary path.
+    """
+    with open(file_path, "r", encoding=encoding, newline="") as source, \
+            tempfile.NamedTemporaryFile("w", encoding="utf-8", newline="", suffix=".csv", delete=False) as target:
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk:
+                break
+            target.write(chunk)
+    return target.name
+
+def detect_line_terminator(file_path):
+    """
+    Return the line terminator used by the header line of a file.
+    """
+    with open(file_path, "rb") as file:
+        first_line = file.readline()
+    return "\\r\\n" if first_line.endswith(b"\r\n") else "\\n"
+
+def mysql_value_expression(variable, column_type, date_format=None):
+    """
+    Build the expression LOAD DATA uses to convert a raw field into the column's type.
+    """
+    if column_type == "BOOLEAN":
+        return f"LOWER({variable}) = 'true'"
+    if date_format:
+        # MySQL spells minutes and seconds %i and %s
+        mysql_format = date_format.replace("%M", "%i").replace("%S", "%s")
+        expression = f"STR_TO_DATE({variable}, '{mysql_format}')"
+        if "%y" in date_format:
+            # Match parse_text_dates: two-digit years in the future belong to the previous century
+            expression = f"IF({expression} > NOW(), {expression} - INTERVAL 100 YEAR, {expression})"
+        return expression
+    return variable
+
+def load_csv_with_infile(file_path, connection, all_dataframes, foreign_keys, encoding="utf-8", column_types=None, date_formats=None):
+    """
+    Upload a CSV file into MySQL with LOAD DATA LOCAL INFILE.
+    Files read with a non UTF-8 encoding are re-encoded into a temporary UTF-8 copy first.
+    Falls back to parameterized batch inserts when local infile is disabled.
+    column_types and date_formats are inferred from the data unless given.
+    Returns the number of rows loaded, or None if the upload failed.
+    """
+    table_name = os.path.splitext(os.path.basename(file_path))[0]
+    df = all_dataframes[table_name]
+    if column_types is None:
+        inferrer = ColumnTypeInferrer().update(df)
+        column_types, date_formats = inferrer.column_types(), inferrer.date_formats()
+    date_formats = date_formats or {}
+    create_table_query = build_create_table_query(table_name, column_types, foreign_keys)
+
+    variables = [f"@c{i}" for i in range(len(df.columns))]
+    na_values = ", ".join(connection.escape(value) for value in CSV_NA_VALUES + NULL_MARKERS)
+    assignments = ", ".join(
+        f"`{normalize_column_name(col)}` = IF({var} IN ({na_values}), NULL, "
+        f"{mysql_value_expression(var, column_types[col], date_formats.get(col))})"
+        for col, var in zip(df.columns, variables)
+    )
+
+    cursor = connection.cursor()
+    try:
+        cursor.execute(create_table_query)
+        invalidate_result_cache(get_connection_database(connection), [table_name])
+        print(f"Table `{table_name}` created successfully.")
+
+        load_path = file_path
+        if encoding.lower().replace("-", "") not in ("utf8", "utf8sig"):
+            load_path = reencode_to_utf8(file_path, encoding)
+        try:
+            load_query = (
+                f"LOAD DATA LOCAL INFILE {connection.escape(os.path.abspath(load_path))} INTO TABLE `{table_name}` CHARACTER SET utf8mb4 "
+                f"FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' ESCAPED BY '' "
+                f"LINES TERMINATED BY '{detect_line_terminator(load_path)}' IGNORE 1 LINES "
+                f"({', '.join(variables)}) SET {assignments};"
+            )
+            cursor.execute(load_query)
+            loaded = cursor.rowcount
+        except pymysql.MySQLError as e:
+            if not e.args or e.args[0] not in LOCAL_INFILE_DISABLED_ERRORS:
+                raise
+            print(f"LOAD DATA LOCAL INFILE is disabled ({e}), falling back to batch inserts for `{table_name}`.")
+            loaded = insert_dataframe(cursor, table_name, df, date_formats=date_formats)
+        finally:
+            if load_path != file_path:
+                os.remove(load_path)
+
+        connection.commit()
+        print(f"Data from `{file_path}` loaded into `{table_name}`.")
+        return loaded
+    except Exception as e:
+        print(f"Error processing `{file_path}`: {e}")
+        return None
+
+# Default memory budget for streaming ingestion, in megabytes
+DEFAULT_MEMORY_BUDGET_MB = 256
+
+# Rows read up front to estimate the in-memory size of a parsed row
+SAMPLE_ROWS = 1000
+
+# Each parsed chunk is copied again into row tuples while it is inserted, so only part of
+# the memory budget goes to the DataFrame itself
+CHUNK_MEMORY_FACTOR = 3
+
+# Seconds between samples of the resident set size while a table is loaded
+RSS_SAMPLE_SECONDS = 0.02
+
+def current_rss_mb():
+    """
+    Return the current resident set size of this process in megabytes, or None where /proc is not available.
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            resident_pages = int(statm.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+class RssSampler:
+    """
+    Track the resident set size while one table is loaded, sampling it from a background thread.
+
+    peak_mb is the highest RSS seen during the load and growth_mb how far it rose above the RSS
+    at the start, so memory held by earlier loads does not count. The RSS is process-wide:
+    tables loaded at the same time by other upload workers are included.
+    """
+
+    def __init__(self, interval=RSS_SAMPLE_SECONDS):
+        self.interval = interval
+        self.start_mb = self.peak_mb = None
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def __enter__(self):
+        self.start_mb = self.peak_mb = current_rss_mb()
+        if self.start_mb is not None:
+            self.thread = threading.Thread(target=self._sample, daemon=True)
+            self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.thread is not None:
+            self.stopped.set()
+            self.thread.join()
+            self._record()
+        return False
+
+    @property
+    def growth_mb(self):
+        return None if self.start_mb is None else self.peak_mb - self.start_mb
+
+    def report(self):
+        return {"peak_rss_mb": self.peak_mb, "rss_growth_mb": self.growth_mb}
+
+    def _record(self):
+        rss = current_rss_mb()
+        if rss is not None:
+            self.peak_mb = max(self.peak_mb, rss)
+
+    def _sample(self):
+        while not self.stopped.wait(self.interval):
+            self._record()
+
+def scan_csv_file(file_path, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB):
+    """
+    First streaming pass: read a CSV chunk by chunk to infer its column types.
+    The chunk size is derived from the memory budget and the size of a sample of rows.
+    Returns (inferrer, encoding, chunk_rows).
+    """
+    encoding = detect_encoding(file_path)
+    sample = pd.read_csv(file_path, encoding=encoding, nrows=SAMPLE_ROWS)
+    bytes_per_row = max(1, sample.memory_usage(deep=True).sum() / max(1, len(sample)))
+    chunk_rows = max(1, int(memory_budget_mb * 1024 * 1024 / (bytes_per_row * CHUNK_MEMORY_FACTOR)))
+
+    inferrer = ColumnTypeInferrer().update(sample.head(0))
+    for chunk in pd.read_csv(file_path, encoding=encoding, chunksize=chunk_rows):
+        inferrer.update(chunk)
+    return inferrer, encoding, chunk_rows
+
+def upload_csv_streaming(file_path, connection, column_types, foreign_keys, encoding="utf-8", chunk_rows=10000, date_formats=None, stats=None):
+    """
+    Second streaming pass: create the table and upload a CSV file chunk by chunk.
+    If a ColumnStatsCollector is given as stats, it is updated with every chunk.
+    Returns the number of rows inserted, or None if the upload failed.
+    """
+    table_name = os.path.splitext(os.path.basename(file_path))[0]
+    create_table_query = build_create_table_query(table_name, column_types, foreign_keys)
+
+    cursor = connection.cursor()
+    try:
+        cursor.execute(create_table_query)
+        invalidate_result_cache(get_connection_database(connection), [table_name])
+        print(f"Table `{table_name}` created successfully.")
+
+        inserted = 0
+        for chunk in pd.read_csv(file_path, encoding=encoding, chunksize=chunk_rows):
+            inserted += insert_dataframe(cursor, table_name, chunk, date_formats=date_formats)
+            if stats is not None:
+                stats.update(chunk)
+            connection.commit()
+        print(f"Data from `{file_path}` inserted into `{table_name}`.")
+        return inserted
     except Exception as e:
         print(f"Error processing `{file_path}`: {e}")
+        return None
 
-def process_csv_folder(folder_path, connection):
+def align_key_column_types(table_column_types, foreign_keys):
+    """
+    Give each foreign key column and the key it references the same integer type, so that
+    compact per-table types do not break joins between them.
+    """
+    def find_column(table, key_column):
+        return next((col for col in table_column_types.get(table, {}) if normalize_column_name(col) == key_column), None)
+
+    integer_names = [type_name for type_name, _, _ in INTEGER_TYPES]
+    for table, references in foreign_keys.items():
+        for fk_col, referenced_table in references:
+            pair = [(table, find_column(table, fk_col)), (referenced_table, find_column(referenced_table, fk_col))]
+            if any(col is None for _, col in pair):
+                continue
+            types = [table_column_types[t][col] for t, col in pair]
+            if all(column_type in integer_names for column_type in types):
+                widest = max(types, key=integer_names.index)
+                for t, col in pair:
+                    table_column_types[t][col] = widest
+    return table_column_types
+
+# Table loaders available to process_csv_folder
+INGESTION_MODES = ["insert", "infile", "stream", "bulk", "incremental"]
+
+# Number of tables uploaded concurrently, each over its own connection
+DEFAULT_UPLOAD_WORKERS = 4
+
+def build_dependency_levels(tables, foreign_keys):
+    """
+    Group tables into topological levels of the foreign key graph.
+    Every table only references tables from earlier levels, so the tables of one level can be
+    uploaded concurrently. Tables caught in a reference cycle are placed in a final level.
+    """
+    dependencies = {
+        table: {referenced_table for _, referenced_table in foreign_keys.get(table, [])
+                if referenced_table in tables and referenced_table != table}
+        for table in tables
+    }
+    levels = []
+    done = set()
+    remaining = [table for table in tables]
+    while remaining:
+        level = [table for table in remaining if dependencies[table] <= done]
+        if not level:
+            print(f"Circular foreign key references between {', '.join(remaining)}; uploading them last.")
+            level = remaining
+        levels.append(level)
+        done.update(level)
+        remaining = [table for table in remaining if table not in done]
+    return levels
+
+def get_current_database(connection):
+    """
+    Return the name of the database a connection is using.
+    """
+    cursor = connection.cursor()
+    cursor.execute("SELECT DATABASE();")
+    return cursor.fetchone()[0]
+
+def upload_tables_by_level(tables, foreign_keys, load_table, connection, mode, table_sizes=None, max_workers=DEFAULT_UPLOAD_WORKERS):
+    """
+    Upload tables level by level in foreign key dependency order.
+    Tables of the same level are uploaded concurrently, each worker using its own pooled connection.
+    load_table(table, connection) uploads one table and returns its row count.
+    Returns a per-table load report.
+    """
+    table_sizes = table_sizes or {}
+    db_name = get_current_database(connection) if max_workers > 1 else None
+
+    def timed_load(table, worker_connection):
+        start = time.perf_counter()
+        with RssSampler() as rss:
+            rows = load_table(table, worker_connection)
+        return {"table": table, "mode": mode, "rows": rows, "seconds": time.perf_counter() - start, **rss.report()}
+
+    def load_with_own_connection(table):
+        with get_pool(db_name, local_infile=(mode == "infile")).connection() as worker_connection:
+            return timed_load(table, worker_connection)
+
+    load_report = []
+    for level in build_dependency_levels(tables, foreign_keys):
+        # Start the largest tables first so they do not end up alone at the tail of the level
+        level = sorted(level, key=lambda table: table_sizes.get(table, 0), reverse=True)
+        if max_workers <= 1 or len(level) == 1:
+            load_report.extend(timed_load(table, connection) for table in level)
+        else:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(level))) as executor:
+                load_report.extend(executor.map(load_with_own_connection, level))
+    # New tables are visible only after the cached schema catalog is reloaded
+    invalidate_schema_catalog()
+    invalidate_column_stats()
+    invalidate_translation_cache()
+    return load_report
+
+# Tables with fewer rows only get indexes on their foreign key columns
+MIN_INDEXED_ROWS = 1000
+
+# Most indexes per table on columns chosen from the column statistics
+MAX_STATS_INDEXES = 3
+
+# A column is a GROUP BY target if at least two of its values each cover this share of the rows
+# (the test sample queries use to pick GROUP BY columns)
+GROUP_BY_VALUE_SHARE = 0.25
+
+# A column is a selective WHERE target if its most frequent value covers at most this share of the rows
+WHERE_VALUE_SHARE = 0.1
+
+def index_name(prefix, table_name, column):
+    """
+    Name an index or constraint, within MySQL's 64 character limit.
+    """
+    return f"{prefix}_{table_name}_{column}"[:64]
+
+def choose_index_columns(table_name, column_types, foreign_keys, stats):
+    """
+    Choose the columns of a table that get a secondary index: its foreign key columns, which are
+    used by joins, and up to MAX_STATS_INDEXES columns that the statistics show to be GROUP BY
+    targets, or text and date columns that equality filters on a frequent value narrow down well.
+    Primary key and TEXT columns are skipped.
+    column_types and stats use MySQL column names. Returns the column names in index order.
+    """
+    primary_keys = primary_key_candidates(table_name)
+    indexable = [
+        column for column, column_type in column_types.items()
+        if column not in primary_keys and not column_type.startswith(("TEXT", "BLOB", "JSON"))
+    ]
+    index_columns = [column for column, _ in foreign_keys.get(table_name, []) if column in indexable]
+
+    row_count = stats["row_count"] if stats else 0
+    if row_count < MIN_INDEXED_ROWS:
+        return index_columns
+    stats_columns = []
+    for column in indexable:
+        column_stats = stats["columns"].get(column)
+        # Columns with a single value or a unique value per row are not filtered or grouped on
+        if column in index_columns or not column_stats or not 1 < column_stats["distinct_count"] < row_count:
+            continue
+        shares = [count / row_count for _, count in column_stats["top_values"]]
+        group_by_target = sum(share >= GROUP_BY_VALUE_SHARE for share in shares) > 1
+        # Sample queries filter text and date columns on one of their frequent values
+        where_target = not column_types[column].startswith(NUMERIC_TYPES) and shares[0] <= WHERE_VALUE_SHARE
+        if group_by_target or where_target:
+            stats_columns.append((column_stats["distinct_count"], column))
+    # Prefer the most selective columns
+    stats_columns.sort(reverse=True)
+    return index_columns + [column for _, column in stats_columns[:MAX_STATS_INDEXES]]
+
+def create_indexes(connection, table_column_types, foreign_keys, table_stats, referenced_tables=None):
+    """
+    Add secondary indexes and FOREIGN KEY constraints to uploaded tables, one ALTER TABLE per table.
+    Building them once after the bulk load is much cheaper than updating them row by row.
+    Foreign key checks are disabled meanwhile, so existing rows are not validated and rows that
+    reference missing keys do not fail the load. table_stats decides which tables were uploaded;
+    foreign keys may reference those or the referenced_tables that already exist.
+    Returns {table: seconds spent}.
+    """
+    referenced_tables = set(table_stats) | set(referenced_tables or ())
+    cursor = connection.cursor()
+    timings = {}
+    cursor.execute("SET foreign_key_checks = 0;")
+    try:
+        for table, stats in table_stats.items():
+            column_types = {normalize_column_name(col): col_type for col, col_type in table_column_types[table].items()}
+            index_columns = choose_index_columns(table, column_types, foreign_keys, stats)
+            index_clauses = [f"ADD INDEX `{index_name('idx', table, column)}` (`{column}`)" for column in index_columns]
+            foreign_key_clauses = [
+                f"ADD CONSTRAINT `{index_name('fk', table, column)}` FOREIGN KEY (`{column}`) "
+                f"REFERENCES `{referenced_table}` (`{column}`)"
+                for column, referenced_table in foreign_keys.get(table, [])
+                if referenced_table in referenced_tables and column in index_columns
+            ]
+            if not index_clauses:
+                continue
+            start = time.perf_counter()
+            try:
+                cursor.execute(f"ALTER TABLE `{table}` {', '.join(index_clauses + foreign_key_clauses)};")
+                print(f"Indexed `{table}` on {', '.join(index_columns)}.")
+            except pymysql.MySQLError as e:
+                # e.g. a key column whose type differs from the column it references; keep the indexes
+                print(f"Error adding foreign keys to `{table}`: {e}")
+                try:
+                    cursor.execute(f"ALTER TABLE `{table}` {', '.join(index_clauses)};")
+                    print(f"Indexed `{table}` on {', '.join(index_columns)} without foreign keys.")
+                except pymysql.MySQLError as e:
+                    print(f"Error indexing `{table}`: {e}")
+            timings[table] = time.perf_counter() - start
+    finally:
+        # Pooled connections are reused, so the session setting must not leak
+        cursor.execute("SET foreign_key_checks = 1;")
+    invalidate_schema_catalog()
+    return timings
+
+def add_index_times(load_report, index_timings):
+    """
+    Record the time spent creating each table's indexes in the load report.
+    """
+    for entry in load_report:
+        entry["index_seconds"] = index_timings.get(entry["table"])
+
+def print_load_report(load_report):
+    """
+    Print per-table encoding, load time, row counts, index build time, and the peak memory (RSS)
+    during each load with its growth over the RSS at the start of that load.
+    """
+    format_mb = lambda value: f"{value:.0f}" if value is not None else "-"
+    rows = [
+        [entry["table"], entry.get("encoding", "-"), entry["mode"], entry["rows"] if entry["rows"] is not None else "failed",
+         f"{entry['seconds']:.3f}", f"{entry['rows'] / entry['seconds']:,.0f}" if entry["rows"] and entry["seconds"] else "-",
+         f"{entry['index_seconds']:.3f}" if entry.get("index_seconds") is not None else "-",
+         format_mb(entry.get("peak_rss_mb")), format_mb(entry.get("rss_growth_mb"))]
+        for entry in load_report
+    ]
+    print(tabulate(rows, headers=["Table", "Encoding", "Mode", "Rows", "Seconds", "Rows/s", "Index seconds", "Peak RSS (MB)", "RSS growth (MB)"], tablefmt="outline"))
+
+def process_csv_folder_streaming(folder_path, connection, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, max_workers=DEFAULT_UPLOAD_WORKERS, add_indexes=True):
+    """
+    Stream all CSV files in a folder into MySQL with bounded memory.
+    A first pass scans each file in chunks to infer column types and key columns, a second pass
+    uploads it chunk by chunk. Note that each concurrent upload worker streams its own file,
+    so peak memory is about max_workers times the budget. Returns a per-table load report.
+    """
+    scanned = {}
+    for file_name in os.listdir(folder_path):
+        if file_name.endswith(".csv"):
+            table_name = os.path.splitext(file_name)[0]
+            scanned[table_name] = scan_csv_file(os.path.join(folder_path, file_name), memory_budget_mb)
+    # Streamed tables are not kept in memory, so earlier copies of them are stale
+    invalidate_dataframes(get_connection_database(connection), list(scanned))
+
+    # Key detection only looks at column names, so header-only frames are enough
+    foreign_keys = find_foreign_keys({
+        table: pd.DataFrame(columns=list(inferrer.columns)) for table, (inferrer, _, _) in scanned.items()
+    })
+    table_column_types = align_key_column_types(
+        {table: inferrer.column_types() for table, (inferrer, _, _) in scanned.items()}, foreign_keys
+    )
+
+    table_stats = {}
+
+    def load_table(table, table_connection):
+        inferrer, encoding, chunk_rows = scanned[table]
+        file_path = os.path.join(folder_path, f"{table}.csv")
+        stats = ColumnStatsCollector(table_column_types[table], inferrer.date_formats())
+        rows = upload_csv_streaming(file_path, table_connection, table_column_types[table], foreign_keys, encoding, chunk_rows, inferrer.date_formats(), stats)
+        if rows is not None:
+            table_stats[table] = stats.table_stats(normalize_column_name)
+        return rows
+
+    table_sizes = {table: os.path.getsize(os.path.join(folder_path, f"{table}.csv")) for table in scanned}
+    load_report = upload_tables_by_level(list(scanned), foreign_keys, load_table, connection, "stream", table_sizes, max_workers)
+    for entry in load_report:
+        entry["encoding"] = scanned[entry["table"]][1]
+    store_column_stats(connection, table_stats)
+    if add_indexes:
+        add_index_times(load_report, create_indexes(connection, table_column_types, foreign_keys, table_stats))
+
+    print_load_report(load_report)
+    return load_report
+
+def process_csv_folder(folder_path, connection, mode="insert", memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, max_workers=DEFAULT_UPLOAD_WORKERS, add_indexes=True):
     """
     Process all CSV files in a folder, dynamically detect schema, and handle foreign key relationships.
+    mode selects the table loader ("insert", "infile", "stream" or "bulk"; memory_budget_mb applies to "stream"),
+    or "incremental" to load only what changed since the previous load of the folder.
+    Tables are uploaded in foreign key dependency order with up to max_workers concurrent connections;
+    "bulk" loads without foreign key checks, so all tables are uploaded concurrently.
+    With add_indexes, foreign keys and secondary indexes are created after the load.
+    Returns a per-table load report.
     """
+    if mode == "stream":
+        return process_csv_folder_streaming(folder_path, connection, memory_budget_mb, max_workers, add_indexes)
+    if mode == "incremental":
+        from incremental_ingest import process_csv_folder_incremental
+        return process_csv_folder_incremental(folder_path, connection, add_indexes)
+
     all_dataframes = {}
-    foreign_keys = {}
+    encodings = {}
+    inferred_types = {}
+    date_formats_by_table = {}
 
-    # Read all CSV files and infer schema
+    # Read all CSV files and infer their column types, reusing the parsed-data cache when the files are unchanged
     for file_name in os.listdir(folder_path):
         if file_name.endswith(".csv"):
             file_path = os.path.join(folder_path, file_name)
             table_name = os.path.splitext(file_name)[0]
-            try:
-                df = pd.read_csv(file_path, encoding="utf-8")
-            except UnicodeDecodeError:
-                # print(f"UTF-8 decoding failed for {file_path}, trying ISO-8859-1.")
-                df = pd.read_csv(file_path, encoding="ISO-8859-1")
-            all_dataframes[table_name] = df
+            parsed = load_parsed_csv(file_path)
+            all_dataframes[table_name] = parsed["df"]
+            encodings[table_name] = parsed["encoding"]
+            inferred_types[table_name] = parsed["column_types"]
+            date_formats_by_table[table_name] = parsed["date_formats"]
 
     # Find foreign keys across all dataframes
     foreign_keys = find_foreign_keys(all_dataframes)
 
-    # Split tables into independent and dependent
-    independent_tables = [
-        table for table in all_dataframes if table not in foreign_keys
-    ]
-    dependent_tables = [
-        table for table in all_dataframes if table in foreign_keys
-    ]
+    # Key columns of related tables share a type
+    table_column_types = align_key_column_types(inferred_types, foreign_keys)
 
-    # Upload independent tables first
-    for table in independent_tables:
-        file_path = os.path.join(folder_path, f"{table}.csv")
-        upload_csv_to_mysql(file_path, connection, all_dataframes, foreign_keys)
+    # Upload referenced tables before the tables that depend on them, collecting column
+    # statistics from the DataFrames already in memory
+    table_stats = {}
 
-    # Upload dependent tables
-    for table in dependent_tables:
+    def load_table(table, table_connection):
         file_path = os.path.join(folder_path, f"{table}.csv")
-        upload_csv_to_mysql(file_path, connection, all_dataframes, foreign_keys)
-
+        column_types, date_formats = table_column_types[table], date_formats_by_table[table]
+        if mode == "infile":
+            rows = load_csv_with_infile(file_path, table_connection, all_dataframes, foreign_keys, encodings[table], column_types, date_formats)
+        elif mode == "bulk":
+            rows = upload_csv_bulk(file_path, table_connection, all_dataframes, column_types, date_formats)
+        else:
+            rows = upload_csv_to_mysql(file_path, table_connection, all_dataframes, foreign_keys, column_types=column_types, date_formats=date_formats)
+        if rows is not None:
+            stats = ColumnStatsCollector(column_types, date_formats).update(all_dataframes[table])
+            table_stats[table] = stats.table_stats(normalize_column_name)
+        return rows
+
+    table_sizes = {table: len(df) for table, df in all_dataframes.items()}
+    db_name = get_connection_database(connection)
+    invalidate_dataframes(db_name, list(all_dataframes))
+    # Bulk loads do not check foreign keys, so no table has to wait for the tables it references
+    level_foreign_keys = {} if mode == "bulk" else foreign_keys
+    load_report = upload_tables_by_level(list(all_dataframes), level_foreign_keys, load_table, connection, mode, table_sizes, max_workers)
+    for entry in load_report:
+        entry["encoding"] = encodings[entry["table"]]
+    store_column_stats(connection, table_stats)
+    # The loaded tables stay in memory, so generated queries can be answered without the server
+    store_dataframes(connection, {table: all_dataframes[table] for table in table_stats}, table_column_types, date_formats_by_table)
+    if add_indexes:
+        add_index_times(load_report, create_indexes(connection, table_column_types, foreign_keys, table_stats))
+
+    print_load_report(load_report)
+    return load_report
+
+
+# Rows printed per page and the most rows displayed for one query
+DEFAULT_PAGE_SIZE = int(os.environ.get("CHATDB_PAGE_SIZE", 25))
+DEFAULT_ROW_CAP = int(os.environ.get("CHATDB_ROW_CAP", 1000))
+
+def stop_streaming_query(connection, cursor):
+    """
+    Stop an unbuffered (SSCursor) query without reading the rest of its result.
+    The query is killed from a second connection, so only rows already in flight are discarded.
+    If the interrupted result leaves the connection unusable, the connection is closed.
+    Embedded databases (see backends) compute rows only as they are fetched, so closing the cursor is enough.
+    """
+    if getattr(connection, "embedded", False):
+        cursor.close()
+        return
+    try:
+        with get_pool().connection() as kill_connection:
+            kill_connection.cursor().execute("KILL QUERY %s", (connection.thread_id(),))
+    except pymysql.MySQLError as e:
+        print(f"Could not stop the query on the server: {e}")
+    try:
+        cursor.close()
+    except pymysql.MySQLError:
+        connection.close()
 
-def execute_query(connection, query):
+def execute_query(connection, query, page_size=DEFAULT_PAGE_SIZE, row_cap=DEFAULT_ROW_CAP, interactive=True):
     """
-    Executes a query and displays the results in a formatted table.
+    Executes a query and displays the results page by page as they arrive from the server.
+    Complete results are kept in the result cache, and repeated queries are answered from it.
+    Generated queries over tables loaded in this session are answered from the in-memory
+    tables (see dataframe_engine) when their result fits within row_cap.
 
     Args:
         connection: Database connection object.
         query (str): SQL query to execute.
+        page_size (int): Rows printed per page.
+        row_cap (int): Most rows displayed; the rest of the result is not read.
+        interactive (bool): Ask before each further page, so the user can stop early.
     """
     try:
-        cursor = connection.cursor()
-        cursor.execute(query)
-        results = cursor.fetchall()
-        columns = [desc[0] for desc in cursor.description]
-
         print("Query: ", query)
-
-        print("\nQuery Results:")
-        print(tabulate(results, headers=columns, tablefmt="outline"))
+        start = time.perf_counter()
+        cache = get_result_cache()
+        db_name = get_connection_database(connection)
+        cached = cache.get(db_name, query)
+        cursor = None
+        answered = None if cached is not None else execute_on_dataframes(db_name, query, max_rows=row_cap)
+        if answered is not None:
+            cache.put(db_name, query, answered["columns"], answered["rows"], (time.perf_counter() - start) * 1000)
+        if cached is not None or answered is not None:
+            columns = (cached or answered)["columns"]
+            cached_rows = iter((cached or answered)["rows"])
+            fetch = lambda size: list(islice(cached_rows, size))
+        else:
+            cursor = connection.cursor(pymysql.cursors.SSCursor)
+            cursor.execute(query)
+            columns = [desc[0] for desc in cursor.description]
+            fetch = cursor.fetchmany
+
+        # Time spent waiting for the server, excluding the time the user looks at a page
+        page = fetch(min(page_size, row_cap))
+        server_seconds = time.perf_counter() - start
+        if answered is not None:
+            source = f"from the in-memory tables in {server_seconds * 1000:.0f} ms"
+        else:
+            source = "from the result cache" if cursor is None else f"first row after {server_seconds * 1000:.0f} ms"
+        print(f"\nQuery Results ({source}):")
+        if not page:
+            print(tabulate([], headers=columns, tablefmt="outline"))
+        rows, shown, stopped = [], 0, False
+        while page:
+            print(tabulate(page, headers=columns, tablefmt="outline"))
+            rows.extend(page)
+            shown += len(page)
+            if shown >= row_cap:
+                stopped = bool(fetch(1))
+                if stopped:
+                    print(f"Stopped at the row cap of {row_cap} rows.")
+                break
+            fetch_start = time.perf_counter()
+            page = fetch(min(page_size, row_cap - shown))
+            server_seconds += time.perf_counter() - fetch_start
+            if page and interactive and input("Press Enter for the next page, or 'q' to stop: ").strip().lower() == "q":
+                stopped = True
+                break
+        print(f"{shown} rows shown in {time.perf_counter() - start:.2f}s.")
+
+        if cached is not None:
+            print(f"Served from the result cache, saving about {cached['elapsed_ms']:.0f} ms.")
+        elif cursor is None:
+            # Answered from the in-memory tables, and already cached
+            pass
+        elif stopped:
+            stop_streaming_query(connection, cursor)
+        else:
+            cursor.close()
+            cache.put(db_name, query, columns, rows, server_seconds * 1000)
     except Exception as e:
-        print(f"Error executing query: {e}")
\ No newline at end of file
+        print(f"Error executing query: {e}")
@@ -0,0 +1,61 @@
+import threading
+from functools import lru_cache
+
+# NLTK data packages ChatDB uses and the paths nltk.data.find looks them up under.
+# Tokenization runs with preserve_line=True, so the punkt sentence splitter is not needed.
+NLTK_RESOURCES = {
+    "stopwords": "corpora/stopwords",
+    "wordnet": "corpora/wordnet",
+}
+
+_available = set()
+_available_lock = threading.Lock()
+
+
+# Function to make sure an NLTK data package is installed
+def ensure_nltk_resource(name):
+    """
+    Look the package up in the local NLTK data directories and download it only if it is missing.
+    Each package is checked at most once per process, without touching the network when present.
+    """
+    with _available_lock:
+        if name in _available:
+            return
+        import nltk
+        try:
+            nltk.data.find(NLTK_RESOURCES[name])
+        except LookupError:
+            nltk.download(name, quiet=True)
+        _available.add(name)
+
+
+@lru_cache(maxsize=None)
+def get_lemmatizer():
+    """
+    Return the WordNet lemmatizer, loading WordNet on first use.
+    """
+    ensure_nltk_resource("wordnet")
+    from nltk.stem import WordNetLemmatizer
+    return WordNetLemmatizer()
+
+
+@lru_cache(maxsize=None)
+def get_stop_words():
+    """
+    Return the English stop words, loading them on first use.
+    """
+    ensure_nltk_resource("stopwords")
+    from nltk.corpus import stopwords
+    return frozenset(stopwords.words("english"))
+
+
+# Lemmatize a word, caching results since questions and table names reuse the same words
+@lru_cache(maxsize=4096)
+def lemmatize(word):
+    return get_lemmatizer().lemmatize(word)
+
+
+# Split a question into word tokens
+def word_tokenize(text):
+    from nltk.tokenize import word_tokenize as nltk_word_tokenize
+    return nltk_word_tokenize(text, language="english", preserve_line=True)
@@ -1,5 +1,14 @@
 import random
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
+from decimal import Decimal
+from backends import get_connection_pool
+from schema_catalog import get_connection_database, get_schema_catalog
+from result_cache import get_result_cache
+from dataframe_engine import execute_on_dataframes
+from column_stats import get_column_stats, get_stats_for_column
 
 # Wrap identifiers with backticks to handle spaces or special characters in SQL queries
 def wrap_identifier(identifier):
@@ -9,14 +18,67 @@ def wrap_identifier(identifier):
 def clean_identifier(identifier):
     return identifier.replace("`", "")
 
+# Largest LIMIT and OFFSET added to sample queries that return many rows
+MAX_SAMPLE_LIMIT = 20
+MAX_SAMPLE_OFFSET = 20
+
+# Candidate queries built per request, and the number of sample queries wanted from them
+SAMPLE_CANDIDATES = 10
+SAMPLE_QUOTA = 5
+
+# Keywords the example queries should cover, one query each
+SAMPLE_KEYWORDS = ["group by", "where", "order by", "join"]
+
+# Candidates built and probed at once against a MySQL server, each on its own pooled connection.
+# Embedded databases answer probes in process in a few milliseconds, so threads only add contention there.
+DEFAULT_GENERATION_WORKERS = 4
+
+# Seconds after which generation returns the queries found so far
+DEFAULT_GENERATION_DEADLINE_SECONDS = 10
+
+# Count the rows of a query without fetching more than cap of them
+def probe_row_count(connection, query, cap):
+    """
+    Return the number of rows the query returns, counting at most cap rows.
+    Choosing a LIMIT and OFFSET only needs to know whether the count exceeds a few dozen,
+    so the server stops early and only cap rows are transferred.
+    Probes repeat whenever the same sample query is drawn again, so their results are cached.
+    Tables loaded in this session answer the probe in process (see dataframe_engine), without a
+    round trip; queries the engine does not cover go to the database.
+    """
+    probe_query = f"{query} LIMIT {cap}"
+    cache = get_result_cache()
+    db_name = get_connection_database(connection)
+    cached = cache.get(db_name, probe_query)
+    if cached is not None:
+        return len(cached["rows"])
+    start = time.perf_counter()
+    answered = execute_on_dataframes(db_name, probe_query)
+    if answered is not None:
+        columns, rows = answered["columns"], answered["rows"]
+    else:
+        cursor = connection.cursor()
+        cursor.execute(probe_query)
+        rows = cursor.fetchall()
+        columns = [desc[0] for desc in cursor.description]
+    cache.put(db_name, probe_query, columns, rows, (time.perf_counter() - start) * 1000)
+    return len(rows)
+
+# Group MySQL types into families so that e.g. SMALLINT and INT columns count as the same type
+def type_family(col_type):
+    base = col_type.split("(")[0].lower()
+    if "int" in base:
+        return "integer"
+    if base in ("decimal", "float", "double"):
+        return "real"
+    return base
+
 # Extract columns by type (categorical and numeric)
 def extract_columns_by_type(connection, table_name):
-    cursor = connection.cursor()
-    cursor.execute(f"DESCRIBE {wrap_identifier(table_name)};")
-    columns = cursor.fetchall()
+    column_types = get_schema_catalog(connection).column_types(table_name)
     categorized = {"numeric": [], "categorical": []}
-    for col_name, col_type, *_ in columns:
-        if "int" in col_type or "float" in col_type:
+    for col_name, col_type in column_types.items():
+        if type_family(col_type) in ("integer", "real"):
             categorized["numeric"].append(wrap_identifier(col_name))
         else:
             categorized["categorical"].append(wrap_identifier(col_name))
@@ -24,17 +86,25 @@ def extract_columns_by_type(connection, table_name):
 
 # Check for evenly distributed group-by candidates
 def is_evenly_distributed(connection, table_name, column_name):
-    cursor = connection.cursor()
-    query = f"""
-        SELECT {column_name}, COUNT(*) AS value_count
-        FROM {wrap_identifier(table_name)}
-        GROUP BY {column_name}
-    """
-    cursor.execute(query)
-    results = cursor.fetchall()
+    stats = get_stats_for_column(connection, table_name, clean_identifier(column_name))
+    if stats is not None:
+        # Only the most frequent values (and NULL) can reach the threshold, so the stored top values suffice
+        value_counts = [count for _, count in stats["top_values"]] + [stats["null_count"]]
+        total_rows = stats["row_count"]
+    else:
+        cursor = connection.cursor()
+        query = f"""
+            SELECT {column_name}, COUNT(*) AS value_count
+            FROM {wrap_identifier(table_name)}
+            GROUP BY {column_name}
+        """
+        cursor.execute(query)
+        value_counts = [row[1] for row in cursor.fetchall()]
+        total_rows = sum(value_counts)
 
-    total_rows = sum(row[1] for row in results)
-    distribution_ratios = [row[1] / total_rows for row in results]
+    if not total_rows:
+        return False
+    distribution_ratios = [count / total_rows for count in value_counts]
 
     evenly_distributed_threshold = 0.25
     evenly_distributed = [ratio for ratio in distribution_ratios if ratio >= evenly_distributed_threshold]
@@ -57,9 +127,15 @@ def add_where_clause(query, connection, table_name, columns, description):
     }
     if columns["numeric"]:
         col = random.choice(columns["numeric"])
-        cursor = connection.cursor()
-        cursor.execute(f"SELECT MIN({col}), MAX({col}) FROM {wrap_identifier(table_name)}")
-        min_val, max_val = cursor.fetchone()
+        stats = get_stats_for_column(connection, table_name, clean_identifier(col))
+        if stats is not None:
+            min_val, max_val = stats["min"], stats["max"]
+        else:
+            cursor = connection.cursor()
+            cursor.execute(f"SELECT MIN({col}), MAX({col}) FROM {wrap_identifier(table_name)}")
+            min_val, max_val = cursor.fetchone()
+        if isinstance(min_val, Decimal) or isinstance(max_val, Decimal):
+            min_val, max_val = float(min_val), float(max_val)
         if min_val is not None and max_val is not None:
             if isinstance(min_val, int) and isinstance(max_val, int):
                 value = random.randint(min_val, max_val)  # Use randint for integers
@@ -75,9 +151,13 @@ def add_where_clause(query, connection, table_name, columns, description):
             description += f" where {clean_identifier(col)} is{operator_mapping[operator]} {value}"
     elif columns["categorical"]:
         col = random.choice(columns["categorical"])
-        cursor = connection.cursor()
-        cursor.execute(f"SELECT DISTINCT {col} FROM {wrap_identifier(table_name)} LIMIT 10")
-        distinct_values = [row[0] for row in cursor.fetchall()]
+        stats = get_stats_for_column(connection, table_name, clean_identifier(col))
+        if stats is not None:
+            distinct_values = [value for value, _ in stats["top_values"]]
+        else:
+            cursor = connection.cursor()
+            cursor.execute(f"SELECT DISTINCT {col} FROM {wrap_identifier(table_name)} LIMIT 10")
+            distinct_values = [row[0] for row in cursor.fetchall()]
         if distinct_values:
             value = random.choice(distinct_values)
             operator = random.choice(["=", "!="])
@@ -158,14 +238,10 @@ def add_join_clause(connection, query, table1, related_tables, select_columns, d
         related_table, common_columns = random.choice(list(related_tables[table1].items()))
         col1, col2 = random.choice(common_columns)
 
-        # Fetch columns for table1
-        cursor = connection.cursor()
-        cursor.execute(f"DESCRIBE {wrap_identifier(table1)};")
-        table1_columns = [col[0] for col in cursor.fetchall()]
-
-        # Fetch columns for related_table
-        cursor.execute(f"DESCRIBE {wrap_identifier(related_table)};")
-        related_table_columns = [col[0] for col in cursor.fetchall()]
+        # Fetch columns for both tables from the schema catalog
+        catalog = get_schema_catalog(connection)
+        table1_columns = catalog.columns(table1)
+        related_table_columns = catalog.columns(related_table)
 
         # Alias columns from table1, excluding the join column
         table1_columns_with_alias = [
@@ -235,20 +311,20 @@ def construct_dynamic_query(connection, table_name, columns, related_tables, max
     else:
         description = f"{start}{desc_column}{sentence}"
 
-    # Execute the query to validate and check row count
+    # Probe the query to validate it and check the row count; counts above probe_cap
+    # lead to the same LIMIT/OFFSET choices, so no more rows are fetched
+    probe_cap = max(max_rows_threshold, MAX_SAMPLE_LIMIT + MAX_SAMPLE_OFFSET) + 1
+    row_count = None
     try:
-        cursor = connection.cursor()
-        cursor.execute(query)
-        results = cursor.fetchall()
-        row_count = len(results)
+        row_count = probe_row_count(connection, query, probe_cap)
 
         # Check for aggregate functions
         has_aggregate = any(agg in query.lower() for agg in ['min(', 'max(', 'avg(', 'sum(', 'count(', ])
 
         # If too many rows and no aggregate functions, add LIMIT and OFFSET
         if row_count > max_rows_threshold:
-            limit = random.randint(1, 20)
-            offset = random.randint(0, max(0, min(row_count - limit, 20)))
+            limit = random.randint(1, MAX_SAMPLE_LIMIT)
+            offset = random.randint(0, max(0, min(row_count - limit, MAX_SAMPLE_OFFSET)))
             query += f" LIMIT {limit}"
             description += f" limiting results to {limit}"
             if not has_aggregate:
@@ -259,79 +335,134 @@ def construct_dynamic_query(connection, table_name, columns, related_tables, max
         print(f"Error executing query: {query}")
         print(f"Error: {e}")
 
-    return description.strip().capitalize()+'.', query.rstrip(";") + ";"
+    return description.strip().capitalize()+'.', query.rstrip(";") + ";", row_count
 
-def generate_sample_queries(connection):
-    cursor = connection.cursor()
-    cursor.execute("SHOW TABLES;")
-    tables = [table[0] for table in cursor.fetchall()]
-    related_tables = find_related_tables_with_common_columns(connection, tables)
-    row_counts = get_table_row_counts(connection)  # Fetch row counts for all tables
-
-    queries = set()
-    for _ in range(10):  # Try generating 3 queries per table
-        # Select a table with weighted probability based on row counts
-        table_name = weighted_table_selection(row_counts, tables)
-        # print(table_name)
-        columns = extract_columns_by_type(connection, table_name)
-
-        description, query = construct_dynamic_query(connection, table_name, columns, related_tables)
-        if description and query:
-            try:
-                cursor.execute(query)
-                results = cursor.fetchall()
-                if results:  # Only add if results are returned
-                    queries.add((description.strip(), query))
-            except Exception as e:
-                print(f"Error executing query: {query}")
-                print(f"Error: {e}")
+# Build candidate queries, concurrently when there are several workers
+def generate_candidates(connection, build, enough, max_workers, deadline_seconds):
+    """
+    Call build(connection, stop) up to SAMPLE_CANDIDATES times and return the results that are not None,
+    in the order they complete.
+
+    max_workers defaults to DEFAULT_GENERATION_WORKERS on MySQL and 1 on embedded databases.
+    With more than one worker, candidates are built concurrently, each on a connection from the
+    pool of the caller's database (see backends.get_connection_pool). Generation returns as soon as
+    enough(results) is true or deadline_seconds have passed: candidates not yet started are cancelled
+    and stop is set, so running ones give up before their next attempt.
+    """
+    if max_workers is None:
+        max_workers = 1 if getattr(connection, "embedded", False) else DEFAULT_GENERATION_WORKERS
+    stop = threading.Event()
+    results = []
+    deadline = time.monotonic() + deadline_seconds
+    if max_workers <= 1:
+        for _ in range(SAMPLE_CANDIDATES):
+            if enough(results) or time.monotonic() > deadline:
+                break
+            result = build(connection, stop)
+            if result is not None:
+                results.append(result)
+        return results
 
-    unique_queries = list(queries)
-    random.shuffle(unique_queries)
+    pool = get_connection_pool(connection)
 
-    # Return up to 5 unique queries
+    def build_with_own_connection():
+        if stop.is_set():
+            return None
+        with pool.connection() as worker_connection:
+            return build(worker_connection, stop)
 
-    # Keywords to ensure inclusion
-    keywords = ["group by", "where", "order by", "join"]
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    futures = [executor.submit(build_with_own_connection) for _ in range(SAMPLE_CANDIDATES)]
+    try:
+        for future in as_completed(futures, timeout=deadline_seconds):
+            result = future.result()
+            if result is not None:
+                results.append(result)
+            if enough(results):
+                break
+    except FuturesTimeoutError:
+        print(f"Stopped generating queries after {deadline_seconds}s with {len(results)} found.")
+    finally:
+        stop.set()
+        # Running candidates finish their current probe in the background and return their connections
+        executor.shutdown(wait=False, cancel_futures=True)
+    return results
+
+# Pick the example queries: one per keyword where possible, then any others up to the quota
+def select_sample_queries(unique_queries):
+    unique_queries = list(unique_queries)
     selected_queries = []
 
     # Add one query for each keyword if available
-    for keyword in keywords:
+    for keyword in SAMPLE_KEYWORDS:
         for description, query in unique_queries:
             if keyword in query.lower():
                 selected_queries.append((description, query))
                 unique_queries.remove((description, query))  # Avoid duplicate inclusion
                 break
 
-    # Fill up to 5 queries with remaining unique queries
-    while len(selected_queries) < 5 and unique_queries:
+    # Fill up to the quota with remaining unique queries
+    while len(selected_queries) < SAMPLE_QUOTA and unique_queries:
         selected_queries.append(unique_queries.pop(0))
 
     return selected_queries
 
+# Check whether the example queries found so far cover every keyword and fill the quota
+def covers_sample_keywords(queries):
+    selected_queries = select_sample_queries(set(queries))
+    return len(selected_queries) >= SAMPLE_QUOTA and all(
+        any(keyword in query.lower() for _, query in selected_queries) for keyword in SAMPLE_KEYWORDS
+    )
+
+def generate_sample_queries(connection, max_workers=None, deadline_seconds=DEFAULT_GENERATION_DEADLINE_SECONDS):
+    """
+    Generate up to SAMPLE_QUOTA example queries, covering each of SAMPLE_KEYWORDS where possible.
+    Candidates are built and probed by max_workers workers (see generate_candidates), and generation stops as soon as the
+    keywords are covered and the quota is met, or after deadline_seconds.
+    """
+    tables = get_schema_catalog(connection).table_names()
+    related_tables = find_related_tables_with_common_columns(connection, tables)
+    row_counts = get_table_row_counts(connection)  # Fetch row counts for all tables
+
+    def build(worker_connection, stop):
+        # Select a table with weighted probability based on row counts
+        table_name = weighted_table_selection(row_counts, tables)
+        columns = extract_columns_by_type(worker_connection, table_name)
+
+        description, query, row_count = construct_dynamic_query(worker_connection, table_name, columns, related_tables)
+        if description and query and row_count:  # Only add if the probe returned results
+            return description.strip(), query
+        return None
+
+    queries = set(generate_candidates(connection, build, covers_sample_keywords, max_workers, deadline_seconds))
+    unique_queries = list(queries)
+    random.shuffle(unique_queries)
+
+    # Return up to SAMPLE_QUOTA unique queries
+    return select_sample_queries(unique_queries)
+
 
 def find_related_tables_with_common_columns(connection, tables):
     related_tables = {}
-    cursor = connection.cursor()
+    catalog = get_schema_catalog(connection)
+    table_columns = {table: catalog.column_types(table) for table in tables}
 
     for table1 in tables:
         # print(table1)
         related_tables[table1] = {}
-        cursor.execute(f"DESCRIBE {wrap_identifier(table1)};")
-        columns1 = {col[0]: col[1] for col in cursor.fetchall()}
+        columns1 = table_columns[table1]
 
         for table2 in tables:
             if table1 == table2:
                 continue
 
-            cursor.execute(f"DESCRIBE {wrap_identifier(table2)};")
-            columns2 = {col[0]: col[1] for col in cursor.fetchall()}
+            columns2 = table_columns[table2]
 
             common_columns = [
                 (col1, col2)
                 for col1, type1 in columns1.items()
                 for col2, type2 in columns2.items()
-                if col1 == col2 and type1.split("(")[0] == type2.split("(")[0]
+                if col1 == col2 and type_family(type1) == type_family(type2)
             ]
 
             if common_columns:
@@ -340,7 +471,7 @@ def find_related_tables_with_common_columns(connection, tables):
     return related_tables
 
 
-def construct_dynamic_query_with_keyword(connection, table_name, columns, related_tables, keyword, max_attempts=10, max_rows_threshold=20):
+def construct_dynamic_query_with_keyword(connection, table_name, columns, related_tables, keyword, max_attempts=10, max_rows_threshold=20, stop=None):
     """
     Construct a dynamic SQL query ensuring the specified keyword is included, following correct SQL order.
     Retries if the keyword is not included in the query.
@@ -352,12 +483,14 @@ def construct_dynamic_query_with_keyword(connection, table_name, columns, relate
         related_tables (dict): Mapping of related tables and common columns.
         keyword (str): The SQL keyword to enforce in the query.
         max_attempts (int): Maximum attempts to ensure the keyword is included.
+        stop (threading.Event): Give up before the next attempt once it is set.
 
     Returns:
-        tuple or None: Description of the query and the query itself, or None if unsuccessful.
+        tuple or None: Description of the query, the query itself and its probed row count
+        (capped), or None if unsuccessful.
     """
     attempt = 0
-    while attempt < max_attempts:
+    while attempt < max_attempts and not (stop and stop.is_set()):
         select_columns = set(random.sample(
             columns['numeric'] + columns['categorical'],
             min(3, len(columns['numeric'] + columns['categorical']))
@@ -399,18 +532,16 @@ def construct_dynamic_query_with_keyword(connection, table_name, columns, relate
             description = f"{start}{desc_column}{sentence}"
 
         try:
-            cursor = connection.cursor()
-            cursor.execute(query)
-            results = cursor.fetchall()
-            row_count = len(results)
+            probe_cap = max(max_rows_threshold, MAX_SAMPLE_LIMIT + MAX_SAMPLE_OFFSET) + 1
+            row_count = probe_row_count(connection, query, probe_cap)
 
             # Check for aggregate functions
             has_aggregate = any(agg in query.lower() for agg in ['min(', 'max(', 'avg(', 'sum(', 'count(', 'order by'])
 
             # If too many rows and no aggregate functions, add LIMIT and OFFSET
             if row_count > max_rows_threshold:
-                limit = random.randint(1, 20)
-                offset = random.randint(0, max(0, min(row_count - limit, 20)))
+                limit = random.randint(1, MAX_SAMPLE_LIMIT)
+                offset = random.randint(0, max(0, min(row_count - limit, MAX_SAMPLE_OFFSET)))
                 query += f" LIMIT {limit}"
                 description += f" limiting results to {limit}"
                 if not has_aggregate:
@@ -419,7 +550,7 @@ def construct_dynamic_query_with_keyword(connection, table_name, columns, relate
 
             # Check if the keyword is included in the query
             if keyword.lower() in query.lower():
-                return description.strip().capitalize()+'.', query.rstrip(";") + ";"
+                return description.strip().capitalize()+'.', query.rstrip(";") + ";", row_count
 
         except Exception as e:
             print(f"Error executing query: {query}")
@@ -436,11 +567,14 @@ def get_table_row_counts(connection):
     Fetch the row counts for all tables in the database.
     """
     cursor = connection.cursor()
-    cursor.execute("SHOW TABLES;")
-    tables = [table[0] for table in cursor.fetchall()]
-    
+    tables = get_schema_catalog(connection).table_names()
+    table_stats = get_column_stats(connection)
+
     row_counts = {}
     for table in tables:
+        if table in table_stats:
+            row_counts[table] = table_stats[table]["row_count"]
+            continue
         try:
             cursor.execute(f"SELECT COUNT(*) AS count FROM {wrap_identifier(table)};")
             results = cursor.fetchall()
@@ -468,41 +602,38 @@ def weighted_table_selection(row_counts, tables, threshold=1000):
     return selected_table
 
 
-def generate_sample_queries_with_keyword(connection, keyword, max_attempts=10, threshold=1000):
+def generate_sample_queries_with_keyword(connection, keyword, max_attempts=10, threshold=1000,
+                                         max_workers=None, deadline_seconds=DEFAULT_GENERATION_DEADLINE_SECONDS):
     """
     Generate random queries that include the specified keyword, maintaining proper SQL keyword order.
     Prioritize tables with fewer rows (<threshold).
+    Candidates are built and probed by max_workers workers (see generate_candidates), and generation stops once SAMPLE_QUOTA
+    distinct queries are found, or after deadline_seconds.
     """
     # Fetch all tables and their row counts
-    cursor = connection.cursor()
-    cursor.execute("SHOW TABLES;")
-    tables = [table[0] for table in cursor.fetchall()]
+    tables = get_schema_catalog(connection).table_names()
     row_counts = get_table_row_counts(connection)  # Fetch row counts for all tables
     related_tables = find_related_tables_with_common_columns(connection, tables)
 
-    queries = set()
-    for _ in range(10):  # Attempt generating multiple queries per table
+    def build(worker_connection, stop):
         # Select a table with weighted probability based on row counts
         table_name = weighted_table_selection(row_counts, tables, threshold)
-        # print(table_name)
-        columns = extract_columns_by_type(connection, table_name)
+        columns = extract_columns_by_type(worker_connection, table_name)
 
         # Construct query ensuring the keyword is included
-        resp = construct_dynamic_query_with_keyword(connection, table_name, columns, related_tables, keyword, max_attempts)
+        resp = construct_dynamic_query_with_keyword(worker_connection, table_name, columns, related_tables, keyword, max_attempts, stop=stop)
         if resp:
-            description, query = resp
-            try:
-                cursor.execute(query)
-                results = cursor.fetchall()
-                if results:  # Only add if results are returned
-                    queries.add((description.strip(), query))
-            except Exception as e:
-                print(f"Error executing query: {query}")
-                print(f"Error: {e}")
+            description, query, row_count = resp
+            if row_count:  # Only add if the probe returned results
+                return description.strip(), query
+        return None
+
+    queries = set(generate_candidates(
+        connection, build, lambda found: len(set(found)) >= SAMPLE_QUOTA, max_workers, deadline_seconds
+    ))
 
     # Shuffle and return unique queries
     unique_queries = list(queries)
     random.shuffle(unique_queries)
 
     return unique_queries
-
@@ -1,20 +1,22 @@
 import pymysql
-from difflib import get_close_matches
-import nltk
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
 import re
-from nltk.stem import WordNetLemmatizer
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 import os
-
-# Download NLTK data files (ensure this runs only once)
-nltk.download('punkt')
-nltk.download('stopwords')
-nltk.download('wordnet')
-
-# Initialize NLTK components
-lemmatizer = WordNetLemmatizer()
-stop_words = set(stopwords.words('english'))
+from db_connection import DEFAULT_DB_NAME, connect
+from backends import get_backend
+from schema_catalog import get_connection_database, get_schema_catalog
+from schema_matcher import get_schema_matcher
+from mysql_functions import DEFAULT_ROW_CAP, stop_streaming_query
+# NLTK data and components are loaded on first use
+from nlp_resources import get_stop_words, lemmatize, word_tokenize
+from translation_cache import get_translation_cache, schema_fingerprint
+from result_cache import get_result_cache
+from dataframe_engine import execute_on_dataframes
+
+# Worker threads used by interpret_batch
+DEFAULT_BATCH_WORKERS = 4
 
 # Natural language to SQL operator mapping
 NL_TO_SQL_OPERATOR = {
@@ -46,6 +48,50 @@ NL_TO_SQL_AGGREGATION = {
     "number of": "COUNT",
 }
 
+# All operator phrases as one pattern. Longer phrases come first, so "less than or equal"
+# is kept whole instead of being split after "less than"
+OPERATOR_PHRASE_PATTERN = re.compile(
+    r"\b(?:" + "|".join(re.escape(phrase) for phrase in sorted(NL_TO_SQL_OPERATOR, key=len, reverse=True)) + r")\b",
+    flags=re.IGNORECASE,
+)
+
+# Build a regex matching any of the phrases, factored into a character trie
+def trie_pattern(phrases):
+    """
+    Build a regular expression that matches any of the phrases, preferring the longest.
+    Phrases sharing a prefix share one branch, so the regex engine walks each prefix once
+    instead of trying every phrase in turn.
+    """
+    trie = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def node_pattern(node):
+        branches = [re.escape(char) + node_pattern(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        pattern = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if "" in node:
+            return f"(?:{pattern})?"
+        return pattern
+
+    return node_pattern(trie)
+
+# Compile the column phrase matcher once per set of schema columns
+@lru_cache(maxsize=16)
+def column_phrase_matcher(columns):
+    """
+    Return (pattern, phrases) where pattern finds column names written with spaces
+    (e.g. "race id" for race_id) and phrases maps each such phrase back to its column.
+    """
+    phrases = {column.replace("_", " "): column for column in columns if "_" in column}
+    if not phrases:
+        return None, phrases
+    return re.compile(trie_pattern(phrases)), phrases
+
 # Wrap identifiers with backticks
 def wrap_identifier(identifier):
     return f"`{identifier}`"
@@ -57,27 +103,12 @@ def clean_identifier(identifier):
 
 # Connect to the database
 def connect_to_database(db_name="dsci551"):
-    connection = pymysql.connect(
-        host="localhost",
-        user="root",
-        password="harshita@97",  # Replace with your MySQL root password
-        database=db_name,
-        cursorclass=pymysql.cursors.DictCursor
-    )
+    connection = connect(db_name, cursorclass=pymysql.cursors.DictCursor)
     return connection
 
 # Extract database schema
 def get_database_schema(connection):
-    cursor = connection.cursor()
-    cursor.execute("SHOW TABLES;")
-    tables = [table[0] for table in cursor.fetchall()]
-    schema = {}
-    for table in tables:
-        cursor.execute(f"DESCRIBE {wrap_identifier(table)};")
-        columns = [row[0] for row in cursor.fetchall()]  
-        # Access the first element of each tuple
-        schema[table] = columns
-    return schema
+    return get_schema_catalog(connection).schema()
 
 def preprocess_query(query, schema):
     """
@@ -85,18 +116,15 @@ def preprocess_query(query, schema):
     and maintain proper case for quoted strings while removing enclosing quotes after tokenization.
     """
     modified_query = query
-    all_columns = [col for cols in schema.values() for col in cols]
+    all_columns = {col for cols in schema.values() for col in cols}
 
     # Ensure column names are preserved and not modified
-    for column in all_columns:
-        column_with_spaces = column.replace("_", " ")  # Reverse schema format for comparison
-        if column_with_spaces in query:
-            query = query.replace(column_with_spaces, column)
+    column_pattern, column_phrases = column_phrase_matcher(tuple(sorted(all_columns)))
+    if column_pattern is not None:
+        query = column_pattern.sub(lambda match: column_phrases[match.group(0)], query)
 
     # Preprocess to keep multi-word keywords as a single token
-    for phrase in NL_TO_SQL_OPERATOR.keys():
-        # Replace spaces in multi-word keywords with underscores temporarily
-        query = re.sub(rf'\b{re.escape(phrase)}\b', phrase.replace(" ", "_"), query, flags=re.IGNORECASE)
+    query = OPERATOR_PHRASE_PATTERN.sub(lambda match: match.group(0).lower().replace(" ", "_"), query)
 
     # Handle quoted strings as single tokens
     quoted_strings = re.findall(r'"(.*?)"', query)
@@ -107,7 +135,8 @@ def preprocess_query(query, schema):
         query = query.replace(f'"{quoted}"', placeholder)
 
     # Tokenize and lemmatize the query
-    tokens = word_tokenize(query, language='english', preserve_line=True)
+    tokens = word_tokenize(query)
+    stop_words = get_stop_words()
     filtered_tokens = []
     for token in tokens:
         if token in quoted_replacements:
@@ -115,7 +144,7 @@ def preprocess_query(query, schema):
             filtered_tokens.append(quoted_replacements[token])
         else:
             # Lowercase other tokens and lemmatize
-            token_lower = lemmatizer.lemmatize(token.lower())
+            token_lower = lemmatize(token.lower())
             if token_lower not in stop_words or token_lower in all_columns:
                 filtered_tokens.append(token_lower)
 
@@ -129,19 +158,13 @@ def preprocess_query(query, schema):
 
 
 
-# Fuzzy match using difflib
-def fuzzy_match_difflib(token, items, cutoff=0.7):
-    matches = get_close_matches(token, items, n=1, cutoff=cutoff)
-    return matches[0] if matches else None
-
 # Map tokens to schema
 def map_tokens_to_schema(tokens, schema):
     mapped = {"tables": [],"all_columns": {}, "columns": {}, "operations": [], "conditions": []}
-    all_tables = list(schema.keys())
+    matcher = get_schema_matcher(schema)
 
     # Match tables
-    for token in tokens:
-        matched_table = fuzzy_match_difflib(token, all_tables)
+    for matched_table in matcher.match_tables(tokens):
         if matched_table and matched_table not in mapped["tables"]:
             mapped["tables"].append(matched_table)
     
@@ -153,8 +176,7 @@ def map_tokens_to_schema(tokens, schema):
         for table in mapped["tables"]:
             mapped["all_columns"][table] = schema[table]
             mapped["columns"][table] = []
-            for token in filtered_tokens:
-                matched_column = fuzzy_match_difflib(token, schema[table])
+            for matched_column in matcher.match_columns(filtered_tokens, table):
                 # print('matched_column', matched_column)
                 if matched_column and matched_column not in mapped["columns"][table]:
                     mapped["columns"][table].append(matched_column)
@@ -162,7 +184,7 @@ def map_tokens_to_schema(tokens, schema):
             # all_columns.extend(schema[table])
 
         # for token in tokens:
-        #     matched_column = fuzzy_match_difflib(token, all_columns)
+        #     matched_column = matcher.match_column(token)
         #     if matched_column and matched_column not in mapped["columns"]:
         #         mapped["columns"].append(matched_column)
 
@@ -203,13 +225,11 @@ def detect_join(query, tokens):
     query_lower = query.lower()
     return any(token in join_keywords for token in tokens)  or any(word in query_lower for word in join_keywords)
 
-lemmatizer = WordNetLemmatizer()
-
 def get_singular_table_name(table_name):
     """
     Get the singular form of the table name from the CSV file name.
     """
-    singular_name = lemmatizer.lemmatize(table_name.lower())  # Convert to singular
+    singular_name = lemmatize(table_name.lower())  # Convert to singular
     return singular_name
 
 def find_related_tables(connection, schema):
@@ -283,11 +303,11 @@ def find_related_tables(connection, schema):
 # Detect GROUP BY context
 def detect_group_by(tokens, schema):
     group_by_keywords = ["group", "by", 'grouped']
-    all_columns = [col for cols in schema.values() for col in cols]
-    
+    matcher = get_schema_matcher(schema)
+
     for i, token in enumerate(tokens):
         if token in group_by_keywords and i + 1 < len(tokens):
-            column = fuzzy_match_difflib(tokens[i + 1], all_columns)
+            column = matcher.match_column(tokens[i + 1])
             if column:
                 return column
     return None
@@ -298,9 +318,7 @@ def detect_aggregation(tokens, schema):
         if token in NL_TO_SQL_AGGREGATION:
             agg_func = NL_TO_SQL_AGGREGATION[token]
             # Look for the column following the aggregation term
-            all_columns = [col for cols in schema.values() for col in cols]
-                
-            agg_column = fuzzy_match_difflib(tokens[i + 1], all_columns) if i + 1 < len(tokens) else None
+            agg_column = get_schema_matcher(schema).match_column(tokens[i + 1]) if i + 1 < len(tokens) else None
             if agg_column:
                 return agg_func, agg_column
     return None, None
@@ -323,13 +341,13 @@ def detect_limit_and_sort(query, tokens, schema):
     sort_column = None
     sort_order = None
 
-    all_columns = [col for cols in schema.values() for col in cols]
+    matcher = get_schema_matcher(schema)
 
     for i in range(len(tokens) - 1):
         # Check for 'order by' pattern
         if tokens[i] in ["order", "ordered", "sort", "sorted"]:
             # Look for a column name after 'order by'
-            sort_column = fuzzy_match_difflib(tokens[i + 1], all_columns)
+            sort_column = matcher.match_column(tokens[i + 1])
             # Check for sorting direction (asc/desc)
             sort_order = "ASC"
             if i + 2 < len(tokens): 
@@ -474,27 +492,53 @@ def generate_sql_query(
     # print(f"Generated SQL Query: {query}")
     return query
 
-# Execute the generated SQL query
-def execute_sql_query(query, connection):
-    cursor = connection.cursor()
+# Execute the generated SQL query, reading at most row_cap rows of the result
+# Complete results are kept in the result cache and repeated queries are answered from it,
+# or from the in-memory tables when the query has the generated shape
+def execute_sql_query(query, connection, row_cap=DEFAULT_ROW_CAP):
+    cache = get_result_cache()
     try:
+        db_name = get_connection_database(connection)
+        cached = cache.get(db_name, query)
+        if cached is not None:
+            return True, cached["rows"][:row_cap]
+        start = time.perf_counter()
+        answered = execute_on_dataframes(db_name, query, max_rows=row_cap)
+        if answered is not None:
+            cache.put(db_name, query, answered["columns"], answered["rows"], (time.perf_counter() - start) * 1000)
+            return True, answered["rows"]
+        cursor = connection.cursor(pymysql.cursors.SSCursor)
         cursor.execute(query)
-        results = cursor.fetchall()
+        columns = [desc[0] for desc in cursor.description]
+        results = cursor.fetchmany(row_cap)
+        if cursor.fetchone() is not None:
+            stop_streaming_query(connection, cursor)
+        else:
+            cursor.close()
+            cache.put(db_name, query, columns, results, (time.perf_counter() - start) * 1000)
         return True, results
     except pymysql.Error as e:
         return False, f"Error executing query: {e}"
 
-# Interpret user query
-def interpret_user_query(query, connection):
-    schema = get_database_schema(connection)
-    related_tables = find_related_tables(connection, schema)
+# Translate a user question into SQL without touching the database
+def translate_user_query(query, schema, related_tables):
+    """
+    Translate a natural language question into SQL for the given schema.
+    Returns the SQL query, or an error message starting with "Error" if none could be built.
+    Questions that preprocess to the same tokens are translated once per schema.
+    """
     query, tokens = preprocess_query(query, schema)
+    join = detect_join(query, tokens)
+    cache = get_translation_cache()
+    fingerprint = schema_fingerprint(schema)
+    sql_query = cache.get(fingerprint, tokens, join)
+    if sql_query is not None:
+        return sql_query
     # print(tokens)
     # print(related_tables)
     mapped = map_tokens_to_schema(tokens, schema)
     # print("mapped")
     # print(mapped)
-    join = detect_join(query, tokens)
     limit, offset = detect_limit_and_offset(tokens)
     sort_column, sort_order = detect_limit_and_sort(query, tokens, schema)  # Updated to get sort_column and sort_order
     group_by = detect_group_by(tokens, schema)
@@ -503,7 +547,15 @@ def interpret_user_query(query, connection):
 
     # print('join', join, ' limit', limit, ' offset', offset, ' sort_column', sort_column, ' sort_order', sort_order, ' group by', group_by, ' conditions', conditions, ' aggregation', aggregation)
 
-    sql_query = generate_sql_query(connection, query, mapped, [], limit, offset, sort_order, join, related_tables, conditions, group_by, aggregation, schema, sort_column)
+    sql_query = generate_sql_query(None, query, mapped, [], limit, offset, sort_order, join, related_tables, conditions, group_by, aggregation, schema, sort_column)
+    cache.put(fingerprint, tokens, join, sql_query)
+    return sql_query
+
+# Interpret user query
+def interpret_user_query(query, connection):
+    schema = get_database_schema(connection)
+    related_tables = find_related_tables(connection, schema)
+    sql_query = translate_user_query(query, schema, related_tables)
     # print(sql_query)
     if "Error" in sql_query:
         return sql_query, False, "Could not generate a valid query. Please rephrase your request."
@@ -517,3 +569,45 @@ def interpret_user_query(query, connection):
     else:
         return sql_query, False, results_or_error
 
+# Interpret many user queries
+def interpret_batch(questions, db_name=DEFAULT_DB_NAME, execute=False, max_workers=DEFAULT_BATCH_WORKERS, row_cap=DEFAULT_ROW_CAP, backend=None):
+    """
+    Interpret a list of questions against one database and yield one record per question, in input order.
+
+    The schema, related tables and schema matcher are loaded once and shared by every worker.
+    With execute, each query is also run (reading at most row_cap rows) on the worker's own pooled
+    connection. Translation is CPU-bound and largely serialized by the GIL, so extra workers mostly
+    pay off when queries are executed. backend names the database engine (see backends.get_backend).
+
+    Each record holds the question, the SQL (or None), ok, error, translate_ms and, when executing,
+    execute_ms, row_count and rows.
+    """
+    pool = get_backend(backend).get_pool(db_name)
+    with pool.connection() as connection:
+        schema = get_database_schema(connection)
+        related_tables = find_related_tables(connection, schema)
+
+    def interpret(question):
+        record = {"question": question, "sql": None, "ok": False, "error": None}
+        start = time.perf_counter()
+        sql_query = translate_user_query(question, schema, related_tables)
+        record["translate_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        if "Error" in sql_query:
+            record["error"] = sql_query
+            return record
+        record["sql"], record["ok"] = sql_query, True
+
+        if execute:
+            start = time.perf_counter()
+            with pool.connection() as worker_connection:
+                success, results_or_error = execute_sql_query(sql_query, worker_connection, row_cap)
+            record["execute_ms"] = round((time.perf_counter() - start) * 1000, 3)
+            if success:
+                record["row_count"] = len(results_or_error)
+                record["rows"] = [list(row) for row in results_or_error]
+            else:
+                record["ok"], record["error"] = False, results_or_error
+        return record
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        yield from executor.map(interpret, questions)
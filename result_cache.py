@@ -0,0 +1,175 @@
+import os
+import re
+import sys
+import threading
+from collections import OrderedDict
+
+# Memory the cached results may use, in megabytes
+DEFAULT_RESULT_CACHE_MB = 64
+
+# Queries whose result can change without any table changing are never cached
+NONDETERMINISTIC_PATTERN = re.compile(
+    r"\b(RAND|NOW|UUID|UUID_SHORT|SYSDATE|CURDATE|CURTIME|UNIX_TIMESTAMP|CURRENT_DATE|CURRENT_TIME|"
+    r"CURRENT_TIMESTAMP|LOCALTIME|LOCALTIMESTAMP|LAST_INSERT_ID|CONNECTION_ID|FOUND_ROWS|SLEEP)\b",
+    re.IGNORECASE,
+)
+
+# Tables named after FROM (including comma-separated lists) or JOIN
+TABLE_REFERENCE_PATTERN = re.compile(r"\b(?:FROM|JOIN)\s+(`?\w+`?(?:\s*,\s*`?\w+`?)*)", re.IGNORECASE)
+
+
+# Function to normalize SQL text for use as a cache key
+def normalize_sql(query):
+    """
+    Collapse whitespace and drop the trailing semicolon, so formatting differences do not matter.
+    Case is kept because it is significant inside string literals.
+    """
+    return re.sub(r"\s+", " ", query).strip().rstrip(";").strip()
+
+
+# Function to find the tables a query reads
+def referenced_tables(query):
+    """
+    Return the set of table names following FROM or JOIN in a query.
+    """
+    tables = set()
+    for match in TABLE_REFERENCE_PATTERN.finditer(query):
+        tables.update(name.strip().strip("`") for name in match.group(1).split(","))
+    return tables
+
+
+# Function to check whether a query's result may be cached
+def is_cacheable(query):
+    return query.upper().startswith("SELECT ") and not NONDETERMINISTIC_PATTERN.search(query)
+
+
+def estimate_result_bytes(columns, rows):
+    """
+    Estimate the memory held by a result: the row tuples and their values.
+    """
+    size = sys.getsizeof(rows) + sum(sys.getsizeof(column) for column in columns)
+    for row in rows:
+        size += sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row)
+    return size
+
+
+class ResultCache:
+    """
+    LRU cache of complete query results, keyed by database and normalized SQL.
+
+    Each entry remembers the tables its query reads, so reloading or dropping a table
+    invalidates exactly the results that depend on it. Entries are evicted least recently
+    used first once their estimated size exceeds budget_bytes. hits, misses and saved_ms
+    (the execution time of the original queries that hits did not repeat) are tracked.
+    """
+
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self.used_bytes = 0
+        self.entries = OrderedDict()
+        self.table_keys = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.saved_ms = 0.0
+
+    def get(self, db_name, query):
+        """
+        Return the cached {"columns", "rows", "elapsed_ms"} of a query, or None.
+        """
+        key = (db_name, normalize_sql(query))
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            self.saved_ms += entry["elapsed_ms"]
+            return entry
+
+    def put(self, db_name, query, columns, rows, elapsed_ms):
+        """
+        Cache the complete result of a query that took elapsed_ms to run.
+        """
+        query = normalize_sql(query)
+        if not is_cacheable(query):
+            return
+        size = estimate_result_bytes(columns, rows)
+        if size > self.budget_bytes:
+            return
+        key = (db_name, query)
+        entry = {"columns": list(columns), "rows": list(rows), "elapsed_ms": elapsed_ms,
+                 "tables": referenced_tables(query), "bytes": size}
+        with self.lock:
+            self._remove(key)
+            self.entries[key] = entry
+            self.used_bytes += size
+            for table in entry["tables"]:
+                self.table_keys.setdefault((db_name, table), set()).add(key)
+            while self.used_bytes > self.budget_bytes:
+                self._remove(next(iter(self.entries)))
+
+    def invalidate(self, db_name=None, tables=None):
+        """
+        Drop the results that read any of tables in db_name, every result of db_name if no
+        tables are given, or everything if db_name is None as well.
+        """
+        with self.lock:
+            if db_name is None:
+                keys = list(self.entries)
+            elif tables is None:
+                keys = [key for key in self.entries if key[0] == db_name]
+            else:
+                keys = set()
+                for table in tables:
+                    keys.update(self.table_keys.get((db_name, table), ()))
+            for key in keys:
+                self._remove(key)
+
+    def report(self):
+        """
+        Return a one-line summary of the cache's effectiveness.
+        """
+        with self.lock:
+            lookups = self.hits + self.misses
+            hit_rate = self.hits / lookups if lookups else 0
+            return (f"Result cache: {self.hits}/{lookups} hits ({hit_rate:.0%}), {self.saved_ms:,.0f} ms saved, "
+                    f"{len(self.entries)} results in {self.used_bytes / 1024 / 1024:.1f} MB")
+
+    def _remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        self.used_bytes -= entry["bytes"]
+        for table in entry["tables"]:
+            keys = self.table_keys.get((key[0], table))
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.table_keys[(key[0], table)]
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+# Function to get the shared result cache
+def get_result_cache():
+    """
+    Return the process-wide result cache, sized by CHATDB_RESULT_CACHE_MB (0 disables caching).
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            budget_mb = float(os.environ.get("CHATDB_RESULT_CACHE_MB", DEFAULT_RESULT_CACHE_MB))
+            _cache = ResultCache(int(budget_mb * 1024 * 1024))
+        return _cache
+
+
+# Function to drop cached results
+def invalidate_result_cache(db_name=None, tables=None):
+    """
+    Forget the cached results that read the given tables of db_name (see ResultCache.invalidate).
+    """
+    get_result_cache().invalidate(db_name, tables)
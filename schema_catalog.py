@@ -0,0 +1,114 @@
+import threading
+
+import pymysql
+
+# Prefix of ChatDB's own metadata tables, which are hidden from the catalog
+METADATA_TABLE_PREFIX = "_chatdb_"
+
+# Every table and column of the current database, read in one round trip
+CATALOG_QUERY = """
+    SELECT TABLE_NAME, COLUMN_NAME, COLUMN_TYPE, COLUMN_KEY
+    FROM information_schema.COLUMNS
+    WHERE TABLE_SCHEMA = %s AND TABLE_NAME NOT LIKE %s
+    ORDER BY TABLE_NAME, ORDINAL_POSITION
+"""
+
+
+class SchemaCatalog:
+    """
+    In-process snapshot of one database's tables and columns.
+
+    tables maps each table name to its columns as (name, MySQL type, key) tuples in
+    column order, the same information DESCRIBE returns. version increases every time the
+    catalog of a database is reloaded, so callers can tell whether their derived data is stale.
+    """
+
+    def __init__(self, db_name, tables, version):
+        self.db_name = db_name
+        self.tables = tables
+        self.version = version
+
+    def table_names(self):
+        return list(self.tables)
+
+    def columns(self, table_name):
+        """
+        Return the column names of a table in column order.
+        """
+        return [column for column, _, _ in self.tables.get(table_name, [])]
+
+    def column_types(self, table_name):
+        """
+        Return {column: MySQL type} for a table.
+        """
+        return {column: column_type for column, column_type, _ in self.tables.get(table_name, [])}
+
+    def schema(self):
+        """
+        Return {table: [columns]} for every table.
+        """
+        return {table: self.columns(table) for table in self.tables}
+
+
+_catalogs = {}
+_versions = {}
+_catalogs_lock = threading.Lock()
+
+
+# Function to get the name of the database a connection is using
+def get_connection_database(connection):
+    """
+    Return the connection's database, asking the server only when it was not given at connect time.
+    """
+    db_name = connection.db
+    if db_name is None:
+        cursor = connection.cursor(pymysql.cursors.Cursor)
+        cursor.execute("SELECT DATABASE();")
+        db_name = cursor.fetchone()[0]
+    return db_name.decode() if isinstance(db_name, bytes) else db_name
+
+
+# Function to load the schema catalog from information_schema
+def load_schema_catalog(connection, db_name):
+    """
+    Read every table and column of db_name with a single information_schema query.
+    Embedded databases (see backends) read their own catalog.
+    """
+    if getattr(connection, "embedded", False):
+        tables = connection.catalog_tables()
+    else:
+        cursor = connection.cursor(pymysql.cursors.Cursor)
+        cursor.execute(CATALOG_QUERY, (db_name, METADATA_TABLE_PREFIX.replace("_", "\\_") + "%"))
+        tables = {}
+        for table_name, column_name, column_type, column_key in cursor.fetchall():
+            tables.setdefault(table_name, []).append((column_name, column_type, column_key))
+    with _catalogs_lock:
+        _versions[db_name] = _versions.get(db_name, 0) + 1
+        catalog = SchemaCatalog(db_name, tables, _versions[db_name])
+        _catalogs[db_name] = catalog
+    return catalog
+
+
+# Function to get the cached schema catalog
+def get_schema_catalog(connection):
+    """
+    Return the cached catalog of the connection's database, loading it on first use.
+    """
+    db_name = get_connection_database(connection)
+    with _catalogs_lock:
+        catalog = _catalogs.get(db_name)
+    if catalog is None:
+        catalog = load_schema_catalog(connection, db_name)
+    return catalog
+
+
+# Function to drop cached schema catalogs
+def invalidate_schema_catalog(db_name=None):
+    """
+    Forget the cached catalog of db_name (or of every database) after tables change.
+    """
+    with _catalogs_lock:
+        if db_name is None:
+            _catalogs.clear()
+        else:
+            _catalogs.pop(db_name, None)
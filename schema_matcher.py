@@ -0,0 +1,128 @@
+from collections import Counter
+from functools import lru_cache
+
+import numpy as np
+from rapidfuzz import fuzz, process
+
+# Lowest similarity (0-100) accepted as a match; equivalent to difflib's 0.7 cutoff
+SCHEMA_MATCH_CUTOFF = 70
+
+# Choice lists longer than this are narrowed with the character index before scoring
+PREFILTER_MIN_CHOICES = 200
+
+
+class ChoiceIndex:
+    """
+    One list of names (tables, or columns) prepared for fuzzy matching: an exact-match
+    dictionary, the names' lengths and, for long lists, a character index so that only names
+    that can still reach the cutoff are scored.
+    """
+
+    def __init__(self, choices):
+        self.choices = list(dict.fromkeys(choices))
+        self.positions = {choice: i for i, choice in enumerate(self.choices)}
+        self.lengths = np.array([len(choice) for choice in self.choices])
+        # {character: (positions of the names containing it, how often each contains it)}
+        self.char_index = {}
+        if len(self.choices) > PREFILTER_MIN_CHOICES:
+            char_counts = {}
+            for i, choice in enumerate(self.choices):
+                for char, count in Counter(choice).items():
+                    char_counts.setdefault(char, []).append((i, count))
+            self.char_index = {
+                char: (np.array([i for i, _ in entries], dtype=np.int64), np.array([count for _, count in entries]))
+                for char, entries in char_counts.items()
+            }
+
+    def candidates(self, token, cutoff):
+        """
+        Return the positions of names that can still reach the cutoff.
+        fuzz.ratio is 200 * (longest common subsequence) / (sum of lengths), and the longest common
+        subsequence is at most the number of characters the two strings share (counted with
+        repetition), so no name this leaves out can reach the cutoff.
+        """
+        if not self.char_index:
+            return None
+        shared = np.zeros(len(self.choices), dtype=np.int64)
+        for char, token_count in Counter(token).items():
+            if char in self.char_index:
+                positions, counts = self.char_index[char]
+                shared[positions] += np.minimum(counts, token_count)
+        return np.flatnonzero(200 * shared >= cutoff * (self.lengths + len(token)))
+
+    def match(self, token, cutoff=SCHEMA_MATCH_CUTOFF):
+        """
+        Return the most similar name, or None if none reaches the cutoff.
+        """
+        if token in self.positions:
+            return token
+        candidates = self.candidates(token, cutoff)
+        if candidates is None:
+            choices = self.choices
+        else:
+            choices = [self.choices[i] for i in candidates]
+        best = process.extractOne(token, choices, scorer=fuzz.ratio, score_cutoff=cutoff)
+        return best[0] if best else None
+
+    def match_many(self, tokens, cutoff=SCHEMA_MATCH_CUTOFF):
+        """
+        Return the best match (or None) for each token, scoring all tokens in one batch.
+        """
+        if not tokens or not self.choices:
+            return [None] * len(tokens)
+        if self.char_index:
+            return [self.match(token, cutoff) for token in tokens]
+        scores = process.cdist(tokens, self.choices, scorer=fuzz.ratio, score_cutoff=cutoff)
+        best = scores.argmax(axis=1)
+        return [
+            token if token in self.positions else (self.choices[j] if scores[i, j] > 0 else None)
+            for i, (token, j) in enumerate(zip(tokens, best))
+        ]
+
+
+class SchemaMatcher:
+    """
+    Fuzzy matcher for the tables and columns of one schema, shared by all detectors.
+    Indexes are built once per schema and repeated lookups of a token are cached.
+    """
+
+    def __init__(self, schema):
+        self.tables = ChoiceIndex(schema)
+        self.columns = ChoiceIndex(col for cols in schema.values() for col in cols)
+        self.table_columns = {table: ChoiceIndex(cols) for table, cols in schema.items()}
+        self.cache = {}
+
+    def match_table(self, token):
+        return self._cached(("table", token), self.tables, token)
+
+    def match_column(self, token, table=None):
+        """
+        Match a token against the columns of one table, or of every table if none is given.
+        """
+        index = self.columns if table is None else self.table_columns[table]
+        return self._cached(("column", table, token), index, token)
+
+    def match_tables(self, tokens):
+        return self.tables.match_many(tokens)
+
+    def match_columns(self, tokens, table=None):
+        index = self.columns if table is None else self.table_columns[table]
+        return index.match_many(tokens)
+
+    def _cached(self, key, index, token):
+        if key not in self.cache:
+            self.cache[key] = index.match(token)
+        return self.cache[key]
+
+
+@lru_cache(maxsize=8)
+def _schema_matcher(schema_items):
+    return SchemaMatcher({table: list(columns) for table, columns in schema_items})
+
+
+# Function to get the matcher of a schema
+def get_schema_matcher(schema):
+    """
+    Return the SchemaMatcher of a {table: [columns]} schema, building it only when the schema changed.
+    """
+    return _schema_matcher(tuple((table, tuple(columns)) for table, columns in schema.items()))
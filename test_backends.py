@@ -0,0 +1,36 @@
+import sqlite3
+
+import pytest
+
+from backends import translate_sql
+
+
+def test_backticks_are_requoted_for_duckdb_only():
+    assert translate_sql("SELECT `a b` FROM `t`") == 'SELECT "a b" FROM "t"'
+    assert translate_sql("SELECT `a b` FROM `t`", requote_identifiers=False) == "SELECT `a b` FROM `t`"
+
+
+def test_unknown_backtick_column_is_an_error_on_sqlite():
+    connection = sqlite3.connect(":memory:")
+    connection.execute("CREATE TABLE t (a INTEGER)")
+    connection.execute("INSERT INTO t VALUES (1)")
+    with pytest.raises(sqlite3.OperationalError, match="no such column"):
+        connection.execute(translate_sql("SELECT SUM(`nosuch`) FROM `t`", requote_identifiers=False))
+
+
+@pytest.mark.parametrize("mysql_literal,value", [
+    (r"'a\\'", "a\\"),
+    (r"'it\'s'", "it's"),
+    (r"'it''s'", "it's"),
+    (r"'a\\\'b'", "a\\'b"),
+    (r"'line\nbreak'", "line\nbreak"),
+    (r"'100\%'", "100\\%"),
+])
+def test_string_escapes(mysql_literal, value):
+    connection = sqlite3.connect(":memory:")
+    assert connection.execute(translate_sql(f"SELECT {mysql_literal} AS v, 1")).fetchall() == [(value, 1)]
+
+
+def test_placeholders_and_rand():
+    assert translate_sql("SELECT * FROM t WHERE a LIKE '%%s' AND b = %s ORDER BY RAND()", True) == \
+        "SELECT * FROM t WHERE a LIKE '%%s' AND b = ? ORDER BY RANDOM()"
@@ -0,0 +1,153 @@
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from dataframe_engine import Unsupported, execute_plan, hash_join, parse_query, prepare_column, top_positions
+
+SCORES = pd.DataFrame({
+    "name": ["b", "A", "c", None, "a"],
+    "team": ["x", "y", None, "x", None],
+    "points": [3, None, 5, 1, 2],
+    "price": [1.25, 2.5, None, 4.75, 0.5],
+})
+SCORE_TYPES = {"name": "VARCHAR(1)", "team": "VARCHAR(1)", "points": "TINYINT", "price": "DECIMAL(3,2)"}
+
+
+def prepare(df, column_types):
+    # prepare_table without the primary key order, which needs the WordNet data for table names
+    columns = {column: prepare_column(df[column], column_types[column]) for column in df.columns}
+    return {"columns": columns, "names": list(df.columns), "rows": len(df)}
+
+
+def run(query, **frames):
+    tables = {table: prepare(df, column_types) for table, (df, column_types) in frames.items()}
+    plan = parse_query(query)
+    assert plan is not None
+    return execute_plan(plan, tables)["rows"]
+
+
+def scores(query):
+    return run(query, scores=(SCORES, SCORE_TYPES))
+
+
+def test_nulls_never_match_a_comparison():
+    assert scores("SELECT name FROM scores WHERE points != 3") == [("c",), (None,), ("a",)]
+    assert scores("SELECT points FROM scores WHERE team = 'X'") == [(3,), (1,)]
+    assert scores("SELECT name FROM scores WHERE team != 'x'") == [("A",)]
+
+
+def test_nulls_form_one_group():
+    assert scores("SELECT team, COUNT(*), COUNT(points) FROM scores GROUP BY team") == \
+        [("x", 2, 2), ("y", 1, 0), (None, 2, 2)]
+
+
+def test_nulls_sort_first_ascending_and_last_descending():
+    assert scores("SELECT points FROM scores ORDER BY points") == [(None,), (1,), (2,), (3,), (5,)]
+    assert scores("SELECT points FROM scores ORDER BY points DESC") == [(5,), (3,), (2,), (1,), (None,)]
+    assert scores("SELECT name FROM scores ORDER BY name") == [(None,), ("A",), ("a",), ("b",), ("c",)]
+
+
+def test_sum_and_avg_result_types():
+    row = scores("SELECT SUM(points), AVG(points), SUM(price), AVG(price), MAX(price) FROM scores")[0]
+    assert row == (Decimal("11"), Decimal("2.7500"), Decimal("9.00"), Decimal("2.250000"), Decimal("4.75"))
+    assert [value.as_tuple().exponent for value in row] == [0, -4, -2, -6, -2]
+
+
+def test_sum_of_a_group_without_values_is_null():
+    assert scores("SELECT team, SUM(points), AVG(price) FROM scores GROUP BY team ORDER BY team") == \
+        [(None, Decimal("7"), Decimal("0.500000")), ("x", Decimal("4"), Decimal("3.000000")), ("y", None, Decimal("2.500000"))]
+
+
+def test_avg_rounds_half_up_like_mysql():
+    # 1/32 = 0.03125 is exactly half-way at scale 4; float formatting would round it to 0.0312
+    halves = pd.DataFrame({"n": [1] + [0] * 31, "m": [-1] + [0] * 31, "d": ["0.01"] + ["0"] * 31})
+    assert run("SELECT AVG(n), AVG(m), AVG(d) FROM halves",
+               halves=(halves, {"n": "TINYINT", "m": "TINYINT", "d": "DECIMAL(3,2)"})) == \
+        [(Decimal("0.0313"), Decimal("-0.0313"), Decimal("0.000313"))]
+
+
+def test_sums_are_exact():
+    large = pd.DataFrame({"n": [2 ** 62] * 3})
+    assert run("SELECT SUM(n) FROM large", large=(large, {"n": "BIGINT"})) == [(Decimal(3 * 2 ** 62),)]
+    tenths = pd.DataFrame({"d": [0.1] * 10 + [0.2] * 10 + [None] * 10})
+    assert run("SELECT SUM(d) FROM tenths", tenths=(tenths, {"d": "DECIMAL(2,1)"})) == [(Decimal("3.0"),)]
+
+
+def test_order_by_an_exact_sum():
+    prices = pd.DataFrame({"g": ["a", "b", "a", "c"], "p": [0.1, 0.25, 0.2, 0.3]})
+    assert run("SELECT g, SUM(p) FROM prices GROUP BY g ORDER BY SUM(p) DESC",
+               prices=(prices, {"g": "VARCHAR(1)", "p": "DECIMAL(3,2)"})) == \
+        [("a", Decimal("0.30")), ("c", Decimal("0.30")), ("b", Decimal("0.25"))]
+
+
+@pytest.mark.parametrize("limit,offset", [(2, 0), (2, 1), (3, 4), (1, 9), (0, 3), (20, 5)])
+def test_top_positions_keeps_ties_in_input_order(limit, offset):
+    key = np.array([1, 0, 1, 0, 1, 2, 0, 1, 2, 1], dtype=np.float64)
+    for descending in (False, True):
+        expected = np.argsort(-key if descending else key, kind="stable")[offset:offset + limit]
+        assert top_positions(key, descending, limit, offset)[:limit].tolist() == expected.tolist()
+
+
+def test_hash_join_pairs_every_duplicate_key():
+    left_keys = np.array([1, 2, 2, 3, 2], dtype=np.float64)
+    right_keys = np.array([2, 5, 1, 2], dtype=np.float64)
+    left, right = hash_join(left_keys, right_keys)
+    pairs = sorted(zip(left.tolist(), right.tolist()))
+    expected = sorted((i, j) for i, a in enumerate(left_keys) for j, b in enumerate(right_keys) if a == b)
+    assert pairs == expected
+    assert left.tolist() == sorted(left.tolist())
+
+
+@pytest.mark.parametrize("limit", range(9))
+def test_hash_join_with_a_limit_builds_the_first_pairs(limit):
+    left_keys = np.array([1, 2, 2, 3, 2], dtype=np.float64)
+    right_keys = np.array([2, 5, 1, 2], dtype=np.float64)
+    left, right = hash_join(left_keys, right_keys)
+    limited_left, limited_right = hash_join(left_keys, right_keys, limit)
+    assert limited_left.tolist() == left[:limit].tolist()
+    assert limited_right.tolist() == right[:limit].tolist()
+
+
+def test_join_matches_text_case_insensitively():
+    teams = pd.DataFrame({"code": ["X", "x", "z"], "city": ["Paris", "Rome", "Oslo"]})
+    rows = run("SELECT name, city FROM scores JOIN teams ON scores.team = teams.code",
+               scores=(SCORES, SCORE_TYPES), teams=(teams, {"code": "VARCHAR(1)", "city": "VARCHAR(5)"}))
+    assert sorted(rows, key=str) == sorted([("b", "Paris"), ("b", "Rome"), (None, "Paris"), (None, "Rome")], key=str)
+
+
+def test_limit_with_offset_forms():
+    assert scores("SELECT points FROM scores ORDER BY points LIMIT 1, 2") == [(1,), (2,)]
+    assert scores("SELECT points FROM scores ORDER BY points LIMIT 2 OFFSET 1") == [(1,), (2,)]
+    assert scores("SELECT name FROM scores LIMIT 3, 5") == [(None,), ("a",)]
+
+
+@pytest.mark.parametrize("query", [
+    "SELECT name, COUNT(*) FROM scores GROUP BY team",
+    "SELECT name, SUM(points) FROM scores",
+    "SELECT team, COUNT(*) FROM scores GROUP BY team ORDER BY points",
+])
+def test_only_full_group_by_rejects_columns_outside_the_group(query):
+    with pytest.raises(Unsupported):
+        scores(query)
+
+
+@pytest.mark.parametrize("query", [
+    "SELECT name FROM accents WHERE name = 'Perez'",
+    "SELECT name FROM accents GROUP BY name",
+    "SELECT name FROM accents ORDER BY name",
+    "SELECT code FROM accents WHERE code > 'a'",
+    "SELECT MIN(code) FROM accents",
+    "SELECT code FROM accents WHERE code = 'é'",
+])
+def test_text_outside_the_modelled_collation_is_unsupported(query):
+    accents = pd.DataFrame({"name": ["Pérez", "Perez"], "code": ["a-b", "a_b"]})
+    with pytest.raises(Unsupported):
+        run(query, accents=(accents, {"name": "VARCHAR(5)", "code": "VARCHAR(3)"}))
+
+
+def test_punctuation_is_compared_for_equality():
+    codes = pd.DataFrame({"code": ["a-b", "A-B", "a_b"]})
+    assert run("SELECT code, COUNT(*) FROM codes WHERE code = 'a-B' GROUP BY code",
+               codes=(codes, {"code": "VARCHAR(3)"})) == [("a-b", 2)]
@@ -0,0 +1,111 @@
+import hashlib
+import os
+
+from incremental_ingest import classify_file, hash_file, is_line_boundary
+
+
+def write(path, content):
+    path.write_bytes(content)
+    return str(path)
+
+
+def fingerprint_of(file_path):
+    stat = os.stat(file_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "content_hash": hash_file(file_path)[0]}
+
+
+def touch_later(file_path, fingerprint):
+    os.utime(file_path, ns=(fingerprint["mtime_ns"] + 10**9, fingerprint["mtime_ns"] + 10**9))
+
+
+def test_hash_file_prefix(tmp_path):
+    file_path = write(tmp_path / "t.csv", b"a,b\n1,2\n3,4\n")
+    content_hash, prefix_hash = hash_file(file_path, 8)
+    assert content_hash == hashlib.sha256(b"a,b\n1,2\n3,4\n").hexdigest()
+    assert prefix_hash == hashlib.sha256(b"a,b\n1,2\n").hexdigest()
+
+
+def test_hash_file_empty_prefix(tmp_path):
+    file_path = write(tmp_path / "t.csv", b"a,b\n1,2\n")
+    assert hash_file(file_path, 0) == (hashlib.sha256(b"a,b\n1,2\n").hexdigest(), hashlib.sha256(b"").hexdigest())
+
+
+def test_hash_file_prefix_beyond_end(tmp_path):
+    file_path = write(tmp_path / "t.csv", b"a,b\n")
+    assert hash_file(file_path, 100)[1] is None
+
+
+def test_new_file(tmp_path):
+    file_path = write(tmp_path / "t.csv", b"a,b\n1,2\n")
+    assert classify_file(file_path, None) == ("new", hashlib.sha256(b"a,b\n1,2\n").hexdigest())
+
+
+def test_unchanged_file_is_not_read(tmp_path):
+    file_path = write(tmp_path / "t.csv", b"a,b\n1,2\n")
+    fingerprint = dict(fingerprint_of(file_path), content_hash="stored")
+    assert classify_file(file_path, fingerprint) == ("unchanged", "stored")
+
+
+def test_touched_file_with_same_content_is_unchanged(tmp_path):
+    file_path = write(tmp_path / "t.csv", b"a,b\n1,2\n")
+    fingerprint = fingerprint_of(file_path)
+    touch_later(file_path, fingerprint)
+    assert classify_file(file_path, fingerprint) == ("unchanged", fingerprint["content_hash"])
+
+
+def test_append(tmp_path):
+    file_path = write(tmp_path / "t.csv", b"a,b\n1,2\n")
+    fingerprint = fingerprint_of(file_path)
+    write(tmp_path / "t.csv", b"a,b\n1,2\n3,4\n")
+    assert classify_file(file_path, fingerprint)[0] == "append"
+
+
+def test_append_after_last_line_without_line_break(tmp_path):
+    file_path = write(tmp_path / "t.csv", b"a,b\n1,2")
+    fingerprint = fingerprint_of(file_path)
+    write(tmp_path / "t.csv", b"a,b\n1,2\n3,4\n")
+    assert is_line_boundary(file_path, fingerprint["size"])
+    assert classify_file(file_path, fingerprint)[0] == "append"
+    write(tmp_path / "t.csv", b"a,b\n1,2\r\n3,4\r\n")
+    assert classify_file(file_path, fingerprint)[0] == "append"
+
+
+def test_extending_the_last_line_is_a_change(tmp_path):
+    # "1,2" becoming "1,25" edits an existing row
+    file_path = write(tmp_path / "t.csv", b"a,b\n1,2")
+    fingerprint = fingerprint_of(file_path)
+    write(tmp_path / "t.csv", b"a,b\n1,25\n")
+    assert not is_line_boundary(file_path, fingerprint["size"])
+    assert classify_file(file_path, fingerprint)[0] == "changed"
+
+
+def test_edit_in_place_with_same_size(tmp_path):
+    file_path = write(tmp_path / "t.csv", b"a,b\n1,2\n3,4\n")
+    fingerprint = fingerprint_of(file_path)
+    write(tmp_path / "t.csv", b"a,b\n1,2\n3,5\n")
+    touch_later(file_path, fingerprint)
+    assert os.path.getsize(file_path) == fingerprint["size"]
+    assert classify_file(file_path, fingerprint) == ("changed", hashlib.sha256(b"a,b\n1,2\n3,5\n").hexdigest())
+
+
+def test_edit_before_appended_rows_is_a_change(tmp_path):
+    file_path = write(tmp_path / "t.csv", b"a,b\n1,2\n")
+    fingerprint = fingerprint_of(file_path)
+    write(tmp_path / "t.csv", b"a,b\n9,2\n3,4\n")
+    assert classify_file(file_path, fingerprint)[0] == "changed"
+
+
+def test_truncation(tmp_path):
+    file_path = write(tmp_path / "t.csv", b"a,b\n1,2\n3,4\n")
+    fingerprint = fingerprint_of(file_path)
+    write(tmp_path / "t.csv", b"a,b\n1,2\n")
+    assert classify_file(file_path, fingerprint)[0] == "changed"
+
+
+def test_append_to_empty_file(tmp_path):
+    file_path = write(tmp_path / "t.csv", b"")
+    fingerprint = fingerprint_of(file_path)
+    assert fingerprint["size"] == 0
+    write(tmp_path / "t.csv", b"a,b\n1,2\n")
+    assert is_line_boundary(file_path, 0)
+    assert classify_file(file_path, fingerprint)[0] == "append"
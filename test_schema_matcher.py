@@ -0,0 +1,34 @@
+import random
+
+from rapidfuzz import fuzz, process
+
+from schema_matcher import ChoiceIndex, PREFILTER_MIN_CHOICES, SCHEMA_MATCH_CUTOFF
+
+
+def full_scan(token, choices):
+    best = process.extractOne(token, choices, scorer=fuzz.ratio, score_cutoff=SCHEMA_MATCH_CUTOFF)
+    return best[0] if best else None
+
+
+def test_prefilter_keeps_matches_without_shared_bigrams():
+    # "abcd" and "axbxcxd" share no two-character sequence but score 73
+    index = ChoiceIndex(["axbxcxd"] + [f"zz{i}" for i in range(PREFILTER_MIN_CHOICES)])
+    assert index.char_index
+    assert index.match("abcd") == "axbxcxd"
+
+
+def test_prefiltered_match_equals_full_scan():
+    rng = random.Random(0)
+    alphabet = "abcdefgh_"
+    names = sorted({"".join(rng.choices(alphabet, k=rng.randint(3, 14))) for _ in range(1000)})
+    index = ChoiceIndex(names)
+    assert index.char_index
+    for _ in range(1000):
+        token = "".join(rng.choices(alphabet, k=rng.randint(1, 12)))
+        assert index.match(token) == full_scan(token, index.choices)
+
+
+def test_match_many_equals_match():
+    index = ChoiceIndex(["driverid", "raceid", "constructorid", "points", "position"])
+    tokens = ["driverId", "race", "point", "nothing", "raceid"]
+    assert index.match_many(tokens) == [index.match(token) for token in tokens]
@@ -0,0 +1,111 @@
+import datetime
+
+import pandas as pd
+import pytest
+
+from type_inference import ColumnTypeInferrer, INTEGER_TYPES, integer_type, parse_text_dates
+
+
+def infer_chunks(*chunks):
+    inferrer = ColumnTypeInferrer()
+    for chunk in chunks:
+        inferrer.update(pd.DataFrame({"value": chunk}))
+    return inferrer
+
+
+@pytest.mark.parametrize("type_name,low,high", INTEGER_TYPES)
+def test_integer_boundaries(type_name, low, high):
+    assert integer_type(low, high) == type_name
+
+
+@pytest.mark.parametrize("index", range(len(INTEGER_TYPES) - 1))
+def test_integer_widens_past_boundary_in_later_chunk(index):
+    type_name, low, high = INTEGER_TYPES[index]
+    wider = INTEGER_TYPES[index + 1][0]
+    assert infer_chunks([0, high]).column_types()["value"] == type_name
+    assert infer_chunks([0, high], [high + 1]).column_types()["value"] == wider
+    assert infer_chunks([low, 0], [low - 1]).column_types()["value"] == wider
+
+
+def test_integer_beyond_bigint_is_decimal():
+    assert infer_chunks([0], [str(2**63)]).column_types()["value"] == "DECIMAL(19,0)"
+
+
+def test_integer_with_missing_values_stays_integer():
+    assert infer_chunks([1.0, None, 120.0]).column_types()["value"] == "TINYINT"
+
+
+def test_decimal_precision_and_scale_merge_across_chunks():
+    # Scale from the first chunk, integer digits from the second
+    assert infer_chunks([1.25, 3.5]).column_types()["value"] == "DECIMAL(3,2)"
+    assert infer_chunks([1.25, 3.5], [12345.5]).column_types()["value"] == "DECIMAL(7,2)"
+    assert infer_chunks([12345.5], [0.125]).column_types()["value"] == "DECIMAL(8,3)"
+
+
+def test_integer_and_decimal_chunks_merge_to_decimal():
+    assert infer_chunks([1000], [0.5]).column_types()["value"] == "DECIMAL(5,1)"
+
+
+def test_decimal_beyond_precision_is_double():
+    assert infer_chunks([1234567890123.5], [0.000001]).column_types()["value"] == "DOUBLE"
+
+
+def test_bool_and_int_chunks_merge_to_int():
+    assert infer_chunks([True, False]).column_types()["value"] == "BOOLEAN"
+    assert infer_chunks([True, False], [5, 300]).column_types()["value"] == "SMALLINT"
+    assert infer_chunks([5, 300], [True]).column_types()["value"] == "SMALLINT"
+
+
+def test_bool_and_text_chunks_merge_to_text():
+    assert infer_chunks([True], ["yes"]).column_types()["value"] == "VARCHAR(5)"
+
+
+def test_leading_zeros_stay_text():
+    assert infer_chunks(["007", "012"]).column_types()["value"] == "VARCHAR(3)"
+
+
+def test_null_markers_are_ignored():
+    assert infer_chunks(["\\N", "NULL", "42"]).column_types()["value"] == "TINYINT"
+
+
+def test_day_first_wins_when_both_orders_parse():
+    inferrer = infer_chunks(["05/04/2009", "03/02/2010"])
+    assert inferrer.column_types()["value"] == "DATE"
+    assert inferrer.date_formats()["value"] == "%d/%m/%Y"
+
+
+def test_later_chunk_rules_out_day_first():
+    inferrer = infer_chunks(["05/04/2009"], ["12/31/2010"])
+    assert inferrer.column_types()["value"] == "DATE"
+    assert inferrer.date_formats()["value"] == "%m/%d/%Y"
+
+
+def test_date_formats_without_common_format_become_text():
+    inferrer = infer_chunks(["31/12/2010"], ["12/31/2010"])
+    assert inferrer.column_types()["value"] == "VARCHAR(10)"
+    assert inferrer.date_formats() == {}
+
+
+def test_iso_dates_need_no_conversion():
+    inferrer = infer_chunks(["2009-03-29", "2010-04-05"])
+    assert inferrer.column_types()["value"] == "DATE"
+    assert inferrer.date_formats() == {}
+
+
+def test_two_digit_years_like_races_date():
+    # db3 races.date: day-first with two-digit years from 1950 to 2024
+    inferrer = infer_chunks(["29/03/09", "13/05/50", "01/12/24"])
+    assert inferrer.date_formats()["value"] == "%d/%m/%y"
+    parsed = parse_text_dates(pd.Series(["29/03/09", "13/05/50", "01/12/24"]), "%d/%m/%y")
+    assert list(parsed.dt.date) == [datetime.date(2009, 3, 29), datetime.date(1950, 5, 13), datetime.date(2024, 12, 1)]
+
+
+def test_two_digit_years_in_the_future_move_back_a_century():
+    next_year = (pd.Timestamp.now().year + 1) % 100
+    parsed = parse_text_dates(pd.Series([f"01/01/{next_year:02d}"]), "%d/%m/%y")
+    assert parsed.dt.year[0] == pd.Timestamp.now().year + 1 - 100
+
+
+def test_unparseable_dates_become_nat():
+    parsed = parse_text_dates(pd.Series(["29/02/23", "01/01/20"]), "%d/%m/%y")
+    assert parsed.isna().tolist() == [True, False]
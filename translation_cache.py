@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+# Most translations kept in memory; the least recently used are evicted first
+DEFAULT_TRANSLATION_CACHE_SIZE = 2048
+
+
+@lru_cache(maxsize=8)
+def _schema_fingerprint(schema_items):
+    return hashlib.sha1(json.dumps(schema_items).encode()).hexdigest()
+
+
+# Function to compute the fingerprint of a schema
+def schema_fingerprint(schema):
+    """
+    Return a short hash of a {table: [columns]} schema. Translations depend only on the schema
+    (related tables are derived from it), so the hash identifies when cached SQL is still valid.
+    """
+    return _schema_fingerprint(tuple((table, tuple(columns)) for table, columns in schema.items()))
+
+
+class TranslationCache:
+    """
+    LRU cache from (schema fingerprint, preprocessed tokens, join flag) to generated SQL.
+
+    If path is given, entries are read from that JSON file on first use and written back by save(),
+    so repeated questions are answered without translation across runs as well.
+    """
+
+    def __init__(self, size=DEFAULT_TRANSLATION_CACHE_SIZE, path=None):
+        self.size = size
+        self.path = path
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.loaded = path is None
+        self.dirty = False
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, fingerprint, tokens, join):
+        key = (fingerprint, tuple(tokens), join)
+        with self.lock:
+            self._load()
+            sql_query = self.entries.get(key)
+            if sql_query is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return sql_query
+
+    def put(self, fingerprint, tokens, join, sql_query):
+        key = (fingerprint, tuple(tokens), join)
+        with self.lock:
+            self._load()
+            self.entries[key] = sql_query
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+            self.dirty = True
+
+    def clear(self):
+        with self.lock:
+            self.loaded = True
+            self.dirty = True
+            self.entries.clear()
+
+    def save(self):
+        """
+        Write the entries to path, replacing the file atomically. Does nothing without a path or changes.
+        """
+        with self.lock:
+            if self.path is None or not self.dirty:
+                return
+            entries = [[fingerprint, list(tokens), join, sql_query]
+                       for (fingerprint, tokens, join), sql_query in self.entries.items()]
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as cache_file:
+                json.dump(entries, cache_file)
+            os.replace(temp_path, self.path)
+            self.dirty = False
+
+    def _load(self):
+        if self.loaded:
+            return
+        self.loaded = True
+        try:
+            with open(self.path, encoding="utf-8") as cache_file:
+                entries = json.load(cache_file)
+        except (OSError, ValueError):
+            return
+        for fingerprint, tokens, join, sql_query in entries[-self.size:]:
+            self.entries[(fingerprint, tuple(tokens), join)] = sql_query
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+# Function to get the shared translation cache
+def get_translation_cache():
+    """
+    Return the process-wide translation cache. Its size comes from CHATDB_TRANSLATION_CACHE_SIZE,
+    and it is persisted to the file named by CHATDB_TRANSLATION_CACHE if that is set.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            size = int(os.environ.get("CHATDB_TRANSLATION_CACHE_SIZE", DEFAULT_TRANSLATION_CACHE_SIZE))
+            _cache = TranslationCache(size, os.environ.get("CHATDB_TRANSLATION_CACHE") or None)
+        return _cache
+
+
+# Function to drop cached translations
+def invalidate_translation_cache():
+    """
+    Forget every cached translation after tables change.
+    """
+    get_translation_cache().clear()
+
+
+# Function to persist cached translations
+def save_translation_cache():
+    """
+    Write the cache to disk if persistence is enabled, e.g. before exiting.
+    """
+    with _cache_lock:
+        cache = _cache
+    if cache is not None:
+        cache.save()
@@ -0,0 +1,230 @@
+import numpy as np
+import pandas as pd
+
+# Text values that mean "missing" in the source CSVs ("\N" is MySQL's own NULL marker)
+NULL_MARKERS = ["NULL", "\\N"]
+
+# Longest text stored as VARCHAR; longer text becomes TEXT
+MAX_VARCHAR_LENGTH = 255
+
+# Most decimal places and total digits stored in a DECIMAL column
+MAX_DECIMAL_SCALE = 6
+MAX_DECIMAL_PRECISION = 18
+
+# Integer types from narrowest to widest with their signed ranges
+INTEGER_TYPES = [
+    ("TINYINT", -2**7, 2**7 - 1),
+    ("SMALLINT", -2**15, 2**15 - 1),
+    ("MEDIUMINT", -2**23, 2**23 - 1),
+    ("INT", -2**31, 2**31 - 1),
+    ("BIGINT", -2**63, 2**63 - 1),
+]
+
+# Text date formats in order of preference; day-first wins when both orders parse
+DATE_FORMATS = ["%Y-%m-%d", "%d/%m/%Y", "%m/%d/%Y", "%d/%m/%y", "%m/%d/%y"]
+DATETIME_FORMATS = ["%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S"]
+
+# Formats MySQL reads directly from text; columns in other formats are converted on insert
+NATIVE_DATE_FORMATS = {"%Y-%m-%d", "%Y-%m-%d %H:%M:%S"}
+
+# Cheap shape checks run before any value is parsed
+NUMBER_PATTERN = r"[+-]?\d+(\.\d+)?"
+LEADING_ZERO_PATTERN = r"[+-]?0\d"
+DATE_PATTERN = r"\d{1,4}[-/]\d{1,2}[-/]\d{1,4}([ T]\d{2}:\d{2}:\d{2})?"
+TIME_PATTERN = r"-?\d{1,3}:\d{2}:\d{2}"
+
+# Values checked against a pattern before the whole column is
+PATTERN_SAMPLE_SIZE = 100
+
+# Numeric kinds from narrowest to widest; a column mixing them takes the widest
+NUMERIC_KINDS = ["bool", "int", "decimal", "float"]
+
+
+def integer_type(min_value, max_value):
+    """
+    Return the narrowest MySQL integer type holding the range, or a DECIMAL beyond BIGINT.
+    """
+    for type_name, low, high in INTEGER_TYPES:
+        if low <= min_value and max_value <= high:
+            return type_name
+    digits = len(str(max(abs(min_value), abs(max_value))))
+    return f"DECIMAL({digits},0)"
+
+
+def all_match(values, pattern):
+    """
+    Return whether every string in the series fully matches the pattern.
+    A small head sample is checked first so that free text is rejected cheaply.
+    """
+    return values.iloc[:PATTERN_SAMPLE_SIZE].str.fullmatch(pattern).all() and values.str.fullmatch(pattern).all()
+
+
+def parse_text_dates(series, date_format):
+    """
+    Parse a text column with a known date format; unparseable values become NaT.
+    Two-digit years that would land in the future are moved back a century.
+    """
+    parsed = pd.to_datetime(series, format=date_format, errors="coerce")
+    if "%y" in date_format:
+        parsed = parsed.where(~(parsed > pd.Timestamp.now()), parsed - pd.DateOffset(years=100))
+    return parsed
+
+
+class ColumnTypeInferrer:
+    """
+    Infer compact MySQL column types incrementally from DataFrame chunks.
+
+    Each update() call only keeps per-column summaries (kind, value range, decimal scale,
+    longest text, candidate date formats), so a file can be scanned chunk by chunk.
+    """
+
+    def __init__(self):
+        self.columns = {}
+
+    def update(self, df):
+        for column in df.columns:
+            state = self.columns.setdefault(column, {
+                "kind": None, "min": None, "max": None, "scale": 0, "max_length": 0, "formats": None,
+            })
+            chunk = self._inspect(df[column], state)
+            if chunk is not None:
+                self._merge(state, chunk)
+        return self
+
+    def column_types(self):
+        """
+        Return {column: MySQL type} for every column seen so far.
+        """
+        return {column: self._column_type(state) for column, state in self.columns.items()}
+
+    def date_formats(self):
+        """
+        Return {column: format} for text date columns MySQL cannot read directly.
+        """
+        return {
+            column: state["formats"][0] for column, state in self.columns.items()
+            if state["kind"] in ("date", "datetime") and state["formats"] and state["formats"][0] not in NATIVE_DATE_FORMATS
+        }
+
+    def _inspect(self, series, state):
+        null_mask = series.isna()
+        if not pd.api.types.is_numeric_dtype(series.dtype):
+            null_mask |= series.isin(NULL_MARKERS)
+        values = series[~null_mask]
+        if values.empty:
+            return None
+
+        dtype = values.dtype
+        if pd.api.types.is_bool_dtype(dtype):
+            return {"kind": "bool", "max_length": 5}
+        if pd.api.types.is_integer_dtype(dtype):
+            return self._integer_summary(int(values.min()), int(values.max()))
+        if pd.api.types.is_float_dtype(dtype):
+            return self._float_summary(values.to_numpy(dtype=np.float64))
+        if pd.api.types.is_datetime64_any_dtype(dtype):
+            kind = "date" if (values.dt.normalize() == values).all() else "datetime"
+            return {"kind": kind, "max_length": 19}
+
+        inferred = pd.api.types.infer_dtype(values, skipna=True)
+        if inferred == "boolean":
+            return {"kind": "bool", "max_length": 5}
+        if inferred != "string":
+            values = values.astype(str)
+        # Every check below holds for all values exactly when it holds for the distinct ones
+        values = pd.Series(values.unique())
+        max_length = int(values.str.len().max())
+        if state["kind"] == "string":
+            # Once a column is text, only its length can still change
+            return {"kind": "string", "max_length": max_length}
+
+        if all_match(values, NUMBER_PATTERN) and not values.str.match(LEADING_ZERO_PATTERN).any():
+            numbers = pd.to_numeric(values)
+            if pd.api.types.is_integer_dtype(numbers.dtype):
+                summary = self._integer_summary(int(numbers.min()), int(numbers.max()))
+            else:
+                summary = self._float_summary(numbers.to_numpy(dtype=np.float64))
+            summary["max_length"] = max_length
+            return summary
+
+        if all_match(values, DATE_PATTERN):
+            candidates = state["formats"] if state["formats"] is not None else DATE_FORMATS + DATETIME_FORMATS
+            formats = [
+                date_format for date_format in candidates
+                if pd.to_datetime(values, format=date_format, errors="coerce").notna().all()
+            ]
+            if formats:
+                kind = "date" if formats[0] in DATE_FORMATS else "datetime"
+                return {"kind": kind, "formats": formats, "max_length": max_length}
+
+        if all_match(values, TIME_PATTERN):
+            return {"kind": "time", "max_length": max_length}
+        return {"kind": "string", "max_length": max_length}
+
+    def _integer_summary(self, min_value, max_value):
+        return {
+            "kind": "int", "min": min_value, "max": max_value,
+            "max_length": max(len(str(min_value)), len(str(max_value))),
+        }
+
+    def _float_summary(self, values):
+        if not np.isfinite(values).all():
+            return {"kind": "float", "max_length": 24}
+        min_value, max_value = float(values.min()), float(values.max())
+        # Integer-valued floats are integer columns that pandas widened because of missing values
+        if (values == np.rint(values)).all() and INTEGER_TYPES[-1][1] <= min_value and max_value <= INTEGER_TYPES[-1][2]:
+            return self._integer_summary(int(min_value), int(max_value))
+        for scale in range(1, MAX_DECIMAL_SCALE + 1):
+            scaled = values * 10 ** scale
+            if (np.abs(scaled - np.rint(scaled)) <= 1e-6 + np.abs(scaled) * 1e-12).all():
+                digits = len(str(int(max(abs(min_value), abs(max_value)))))
+                # Sign, digits, decimal point and decimals
+                return {"kind": "decimal", "min": min_value, "max": max_value, "scale": scale, "max_length": digits + scale + 2}
+        return {"kind": "float", "max_length": 24}
+
+    def _merge(self, state, chunk):
+        kind, chunk_kind = state["kind"], chunk["kind"]
+        if kind is None or kind == chunk_kind:
+            merged_kind = chunk_kind
+        elif kind in NUMERIC_KINDS and chunk_kind in NUMERIC_KINDS:
+            merged_kind = max(kind, chunk_kind, key=NUMERIC_KINDS.index)
+        else:
+            merged_kind = "string"
+
+        if chunk.get("min") is not None:
+            state["min"] = chunk["min"] if state["min"] is None else min(state["min"], chunk["min"])
+            state["max"] = chunk["max"] if state["max"] is None else max(state["max"], chunk["max"])
+        state["scale"] = max(state["scale"], chunk.get("scale", 0))
+        state["max_length"] = max(state["max_length"], chunk["max_length"])
+
+        if merged_kind in ("date", "datetime"):
+            state["formats"] = chunk["formats"] if state["formats"] is None else [
+                date_format for date_format in state["formats"] if date_format in chunk["formats"]
+            ]
+            if not state["formats"]:
+                merged_kind = "string"
+        state["kind"] = merged_kind
+
+    def _column_type(self, state):
+        kind = state["kind"]
+        if kind == "bool":
+            return "BOOLEAN"
+        if kind == "int":
+            return integer_type(state["min"], state["max"])
+        if kind == "decimal":
+            digits = len(str(int(max(abs(state["min"]), abs(state["max"])))))
+            precision = digits + state["scale"]
+            if precision <= MAX_DECIMAL_PRECISION:
+                return f"DECIMAL({precision},{state['scale']})"
+            return "DOUBLE"
+        if kind == "float":
+            return "DOUBLE"
+        if kind == "date":
+            return "DATE"
+        if kind == "datetime":
+            return "DATETIME"
+        if kind == "time":
+            return "TIME"
+        max_length = state["max_length"]
+        if max_length > MAX_VARCHAR_LENGTH:
+            return "TEXT"
+        return f"VARCHAR({max_length if max_length > 0 else 255})"